@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from flask import g, request
+from sqlalchemy import func, select
+from bloom import BloomFilter
+from caching import TTLCache
+from models import db, User
+
+# Detached, immutable view of a user that is safe to share between requests
+CachedUser = namedtuple('CachedUser', ['user_id', 'name', 'email', 'neighborhood', 'latitude', 'longitude'])
+
+
+def normalize_email(email):
+    """Canonical form used for storage, lookups and the unique index."""
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+class CredentialCache:
+    """Answers ``email -> (user_id, password_hash)`` without touching the database.
+
+    Known emails live in a bounded TTL LRU. Unknown emails are rejected by a
+    Bloom filter built from the ``users`` table on first use, so credential
+    stuffing with made-up addresses never reaches the database. Users
+    registered by other worker processes are picked up by an incremental
+    top-up (``user_id`` above the last one seen) at most every
+    ``EMAIL_FILTER_REFRESH`` seconds.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._watermark = 0
+        self._refreshed_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CREDENTIAL_CACHE_SIZE', 10000)
+        app.config.setdefault('CREDENTIAL_CACHE_TTL', 300)
+        app.config.setdefault('EMAIL_FILTER_CAPACITY', 1000000)
+        app.config.setdefault('EMAIL_FILTER_REFRESH', 5)
+
+        self.capacity = int(app.config['EMAIL_FILTER_CAPACITY'])
+        self.refresh_interval = float(app.config['EMAIL_FILTER_REFRESH'])
+        self._cache = TTLCache(int(app.config['CREDENTIAL_CACHE_SIZE']), float(app.config['CREDENTIAL_CACHE_TTL']))
+        self._filter = None
+        app.extensions['credential_cache'] = self
+
+    def _load_since(self, bloom, watermark):
+        rows = db.session.execute(
+            select(User.user_id, User.email)
+            .where(User.user_id > watermark)
+            .execution_options(yield_per=10000)
+        )
+        for user_id, email in rows:
+            bloom.add(normalize_email(email))
+            watermark = max(watermark, user_id)
+        return watermark
+
+    def rebuild(self):
+        """Rebuild the negative-lookup filter from every row in ``users``."""
+        bloom = BloomFilter(self.capacity)
+        watermark = self._load_since(bloom, 0)
+        with self._lock:
+            self._filter, self._watermark = bloom, watermark
+            self._refreshed_at = time.monotonic()
+
+    def might_exist(self, email):
+        """False only if ``email`` (normalized) certainly belongs to no user; may query ``users`` to refresh."""
+        if self._filter is None:
+            self.rebuild()
+        if email in self._filter:
+            return True
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return False
+        with self._lock:
+            self._watermark = self._load_since(self._filter, self._watermark)
+            self._refreshed_at = time.monotonic()
+        return email in self._filter
+
+    def cached(self, email):
+        """Return the cached ``(user_id, password_hash)`` for ``email`` without touching the database."""
+        return self._cache.get(normalize_email(email))
+
+    def lookup(self, email):
+        """Return ``(user_id, password_hash)`` for ``email``, or None if there is no such user."""
+        email = normalize_email(email)
+        cached = self._cache.get(email)
+        if cached is not None:
+            return cached
+        if not self.might_exist(email):
+            return None
+
+        user = User.query.filter(func.lower(User.email) == email).first()
+        if user is None:
+            return None
+        return self.remember(user)
+
+    def remember(self, user):
+        entry = (user.user_id, user.password)
+        email = normalize_email(user.email)
+        self._cache.set(email, entry)
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(email)
+        return entry
+
+    def forget(self, email):
+        """Drop a cached entry; call whenever a user's email or password changes."""
+        self._cache.pop(normalize_email(email))
+
+
+class IdentityCache:
+    """Resolves JWT ``sub`` claims to ``CachedUser`` snapshots.
+
+    Lookups are memoised for the current request in ``g`` and across requests
+    in a process-level TTL LRU, so an authenticated request normally runs no
+    user-table queries. Hits and misses are counted per endpoint.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: [0, 0])
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 10000)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 300)
+
+        self._cache = TTLCache(int(app.config['IDENTITY_CACHE_SIZE']), float(app.config['IDENTITY_CACHE_TTL']))
+        app.extensions['identity_cache'] = self
+
+    def _count(self, hit, endpoint=None):
+        with self._lock:
+            self._counters[endpoint or request.endpoint or 'unknown'][0 if hit else 1] += 1
+
+    def cached(self, sub, endpoint):
+        """Return the cached CachedUser for a JWT subject, or None, counting the lookup for ``endpoint``."""
+        user = self._cache.get(str(sub))
+        self._count(user is not None, endpoint)
+        return user
+
+    def remember(self, row):
+        user = CachedUser(row.user_id, row.name, row.email, row.neighborhood, row.latitude, row.longitude)
+        self._cache.set(str(row.user_id), user)
+        return user
+
+    def load(self, sub):
+        """Return the CachedUser for a JWT subject, or None if the user no longer exists."""
+        key = str(sub)
+        resolved = g.setdefault('_identity_cache', {})
+        if key in resolved:
+            return resolved[key]
+
+        user = self._cache.get(key)
+        self._count(user is not None)
+        if user is None:
+            row = db.session.get(User, int(key))
+            if row is None:
+                return None
+            user = self.remember(row)
+
+        resolved[key] = user
+        return user
+
+    def evict(self, user_id):
+        """Drop a cached user; call whenever a user's profile changes."""
+        self._cache.pop(str(user_id))
+
+    def stats(self):
+        with self._lock:
+            counters = {endpoint: list(counts) for endpoint, counts in self._counters.items()}
+        return {
+            endpoint: {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+            } for endpoint, (hits, misses) in counters.items()
+        }
+
+
+credentials = CredentialCache()
+identities = IdentityCache()
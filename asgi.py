@@ -0,0 +1,100 @@
+"""ASGI entry point: ``uvicorn asgi:application``.
+
+The hot auth, event and post routes (``routes.async_api``) run as native
+coroutines on the asyncio database engine; every other request is handed
+to the Flask app on a thread pool, so the sync WSGI deployment
+(``app:app``) and this one serve the same API.
+"""
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map
+
+from asyncdb import adb
+from passwords import HasherBusy
+
+
+class ASGIApplication:
+    def __init__(self, flask_app, rules, wsgi_threads):
+        from a2wsgi import WSGIMiddleware
+
+        self.flask_app = flask_app
+        # Copies: a Rule can only be bound to one Map, and ``rules`` is shared by every app built in the process
+        self.url_map = Map([rule.empty() for rule in rules])
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http':
+            try:
+                handler, view_args = self.url_map.bind('localhost').match(scope['path'], method=scope['method'])
+            except HTTPException:
+                # Not an async route (or a 404/405/redirect): let Flask answer it exactly as under WSGI
+                pass
+            else:
+                return await self._handle(handler, view_args, scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await adb.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, handler, view_args, scope, receive, send):
+        from routes.async_api import AsyncRequest, JSONError
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        request = AsyncRequest(scope, body)
+
+        with self.flask_app.app_context():
+            try:
+                rv = await handler(request, **view_args)
+            except JSONError as e:
+                rv = (e.body, e.status, e.headers)
+            except HasherBusy:
+                # Password hashing pool is saturated; ask the client to back off
+                rv = ({'message': 'Too many authentication requests, please retry shortly'}, 429, {'Retry-After': '1'})
+            except Exception as e:
+                self.flask_app.logger.exception('Unhandled error on %s %s', request.method, request.path)
+                rv = ({"error": str(e)}, 500)
+            response = self.flask_app.make_response(rv)
+            if 'Origin' in request.headers:
+                # Same answer flask-cors gives the WSGI routes
+                response.headers.setdefault('Access-Control-Allow-Origin', '*')
+            payload = response.get_data() if request.method != 'HEAD' else b''
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+
+def create_asgi_app(flask_app=None):
+    """Wrap a Flask app (by default ``app.app``) for an ASGI server."""
+    if flask_app is None:
+        from app import app as flask_app
+    from routes.async_api import rules
+
+    flask_app.config.setdefault('ASGI_WSGI_THREADS', 10)
+    adb.init_app(flask_app)
+    return ASGIApplication(flask_app, rules, int(flask_app.config['ASGI_WSGI_THREADS']))
+
+
+def __getattr__(name):
+    # `asgi:application` is built on first access, so importing this module for create_asgi_app builds no app
+    if name == 'application':
+        global application
+        application = create_asgi_app()
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,81 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from engines import engine_profile
+
+# asyncio driver for each database the sync app supports
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_url(url):
+    """Return ``url`` with its driver swapped for the asyncio driver of the same database."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No asyncio driver configured for {backend} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """SQLAlchemy asyncio engine and sessions for the ASGI handlers.
+
+    Points at the same database as ``db`` (``ASYNC_DATABASE_URL`` overrides
+    it) and uses the same models, so the sync and async code paths can
+    serve one deployment side by side. The engine is created on first use;
+    the asyncio drivers (``aiosqlite``, ``asyncpg``) are only needed then.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._engine = None
+        self._sessionmaker = None
+        self.url = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from models import db
+
+        app.config.setdefault('ASYNC_DATABASE_URL', None)
+        app.config.setdefault('ASYNC_POOL_SIZE', 10)
+
+        url = app.config['ASYNC_DATABASE_URL']
+        if url is None:
+            # The sync engine's URL has relative SQLite paths already resolved against the instance folder
+            with app.app_context():
+                url = db.engine.url
+        self.url = async_database_url(url)
+        self.pool_size = int(app.config['ASYNC_POOL_SIZE'])
+        app.extensions['async_database'] = self
+
+    @property
+    def engine(self):
+        return self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+                options = {} if self.url.get_backend_name() == 'sqlite' else {'pool_size': self.pool_size}
+                self._engine = create_async_engine(self.url, **options)
+                if self.url.get_backend_name() == 'sqlite':
+                    # Same PRAGMAs as the sync engine; aiosqlite connections are not sqlite3.Connection instances
+                    event.listen(self._engine.sync_engine, 'connect',
+                                 lambda dbapi_connection, record: engine_profile.configure_sqlite(dbapi_connection))
+                self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False)
+            return self._engine
+
+    def session(self):
+        """A new ``AsyncSession``; use it as ``async with adb.session() as session:``."""
+        self._start()
+        return self._sessionmaker()
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+
+
+adb = AsyncDatabase()
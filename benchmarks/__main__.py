@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark every API route.')
+    parser.add_argument('--size', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--driver', choices=['client', 'wsgi', 'all'], default='all')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads for the WSGI driver.')
+    parser.add_argument('--scenarios', help='Comma-separated scenario names (default: all).')
+    parser.add_argument('--requests', type=int, help='Override the number of requests sent per scenario.')
+    parser.add_argument('--database', help='SQLite file to seed, or reuse if it already exists.')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='Disable the response cache so read routes always reach the database.')
+    parser.add_argument('--startup-runs', type=int, default=10,
+                        help='Fresh processes started to time create_app() and the first request (0 to skip).')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed throughput/p99 regression (fraction).')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the new baseline.')
+    parser.add_argument('--output', help='Also write the results as JSON to this file.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='bench-'), f'{args.size}.db')
+    reuse = os.path.exists(database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    # Keep bcrypt cheap unless asked otherwise so the routes, not the hash cost, are measured
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+    if args.no_response_cache:
+        os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+    # config.Config reads the environment when first imported, so import it only now
+    from app import create_app
+    app = create_app()
+    from models import db, User
+    from benchmarks.harness import DRIVERS, compare, measure
+    from benchmarks.scenarios import AREA, RSS_CEILINGS, SCENARIOS, SIZES, Context
+    from benchmarks.startup import measure_startup, report
+    from seed import seed_volume
+
+    with app.app_context():
+        # Also adds tables introduced since a reused database was seeded
+        db.create_all()
+        if not reuse:
+            seed_volume(**SIZES[args.size], test_data=True, area=AREA, log=lambda message: print(f'  {message}'))
+        last_user = db.session.query(db.func.max(User.user_id)).scalar()
+        engine = db.engine
+    ctx = Context(app, 1, last_user)
+    # The export scenarios stream as the first seeded user
+    app.config['EXPORT_CLIENT_IDS'] = {str(ctx.first_user)}
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    drivers = list(DRIVERS) if args.driver == 'all' else [args.driver]
+
+    results = {}
+    for driver_name in drivers:
+        driver = DRIVERS[driver_name](app, concurrency=args.concurrency)
+        try:
+            for name in names:
+                factory, count, warmup = SCENARIOS[name]
+                key = f'{args.size}/{driver_name}/{name}'
+                count = args.requests or count
+                results[key] = measure(driver, engine, factory(ctx, count + warmup), warmup=warmup)
+                r = results[key]
+                print(f"{key:<45} {r['throughput']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}ms  "
+                      f"p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  "
+                      f"{r['queries_per_request']:>6.2f} q/req  {r['errors']} errors  {r['rejected']} rejected")
+        finally:
+            driver.close()
+
+    # Cold start is measured for full runs only; it does not depend on which scenarios were picked
+    if args.startup_runs and not args.scenarios:
+        startup = measure_startup(args.startup_runs)
+        report(startup)
+        results.update(startup)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline updated: {args.baseline}')
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, RSS_CEILINGS)
+    regressions += [error for error in (check() for check in ctx.checks) if error]
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""The same scenarios served by the threaded WSGI server and by uvicorn with the ``asgi`` entry point.
+
+First sends every native async route (``routes.async_api``), with its
+error paths, to both servers side by side and fails unless they answer
+alike: same status and the same JSON apart from new ids and tokens. Then
+runs each scenario against one server, then the other, over the same
+number of concurrent keep-alive connections and prints the two side by
+side. ``--check`` stops after the comparison. Needs ``uvicorn``,
+``a2wsgi`` and the asyncio database driver (``aiosqlite``).
+
+    python -m benchmarks.asgi --concurrency 32 --scenarios events_view_deep_page,login
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.harness import HTTPDriver, Request
+
+DEFAULT_SCENARIOS = 'events_view_first_page,events_view_deep_page,login,mixed_login_events'
+# Response values that differ between two otherwise identical writes or logins
+VOLATILE = {'access_token', 'event_id', 'post_id'}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.asgi', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--database', help='SQLite file to seed, or reuse if it already exists.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client connections.')
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS, help='Comma-separated scenario names.')
+    parser.add_argument('--requests', type=int, help='Override the number of requests sent per scenario.')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='Disable the response cache so read routes always reach the database.')
+    parser.add_argument('--check', action='store_true', help='Only compare the two servers\' responses.')
+    return parser.parse_args(argv)
+
+
+class ASGIServerDriver(HTTPDriver):
+    """Serves an ASGI application with uvicorn on a background thread."""
+
+    name = 'asgi'
+
+    def __init__(self, application, concurrency=8):
+        import uvicorn
+
+        # asyncio only sets TCP_NODELAY on accepted sockets whose proto is TCP; without it every keep-alive
+        # response after the first waits ~40ms for a delayed ACK
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.bind(('127.0.0.1', 0))
+        self.server = uvicorn.Server(uvicorn.Config(application, log_level='warning', access_log=False,
+                                                    lifespan='on', backlog=4096))
+        self.thread = threading.Thread(target=self.server.run, kwargs={'sockets': [sock]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        super().__init__(sock.getsockname()[1], concurrency)
+
+    def close(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def parity_requests(ctx, server, run):
+    """One request per native async route and error path; ``server`` and ``run`` keep new accounts unique."""
+    from sqlalchemy import func, select
+    from benchmarks.scenarios import PASSWORD
+    from models import db, Event
+
+    with ctx.app.app_context():
+        event_id = db.session.scalar(select(func.min(Event.event_id)))
+    headers = ctx.auth(ctx.first_user)
+    email = f'parity-{run}-{server}@example.test'
+    event = {'title': 'Parity event', 'description': 'Created by benchmarks.asgi', 'date': '2030-01-01',
+             'location': 'Bench Park'}
+    return [
+        Request('POST', '/login', {'email': f'user{ctx.first_user}@example.test', 'password': PASSWORD}),
+        Request('POST', '/login', {'email': f'user{ctx.first_user}@example.test', 'password': 'wrong'}),
+        Request('POST', '/login', {}),
+        Request('POST', '/login', {'email': f'user{ctx.first_user}@example.test'}),
+        Request('POST', '/login', [1]),
+        Request('POST', '/login', body=b'email=nobody'),
+        Request('POST', '/register', {'name': 'Parity', 'email': email, 'password': PASSWORD}),
+        Request('POST', '/register', {'name': 'Parity', 'email': email, 'password': PASSWORD}),
+        Request('POST', '/register', {'name': 'Parity', 'email': f'other-{email}'}),
+        Request('POST', '/register', {'name': 'Parity', 'email': f'other-{email}', 'password': PASSWORD,
+                                      'neighborhood': 5}),
+        Request('POST', '/register', {'name': 'Parity', 'email': f'hood-{email}', 'password': PASSWORD,
+                                      'neighborhood': ' Parity Green '}),
+        Request('POST', '/register', {'name': 'Parity', 'email': f'other-{email}', 'password': PASSWORD,
+                                      'latitude': 'north', 'longitude': 0}),
+        Request('POST', '/login', {'email': email, 'password': PASSWORD}),
+        Request('POST', '/events/create', event, headers),
+        Request('POST', '/events/create', {**event, 'date': 5}, headers),
+        Request('POST', '/events/create', {'title': 'Parity event'}, headers),
+        Request('POST', '/events/create', event),
+        Request('POST', '/posts', {'content': 'Parity post'}, headers),
+        Request('POST', '/posts', {'content': 5}, headers),
+        Request('POST', '/posts', {}, headers),
+        Request('GET', '/events/view?limit=5'),
+        Request('GET', '/events/view?limit=5&fields=id,title'),
+        Request('GET', '/events/view?fields=id,bogus'),
+        Request('GET', '/events/view?cursor=garbage'),
+        Request('GET', f'/events/{event_id}'),
+        Request('GET', f'/events/{event_id}?fields=id,organizer'),
+        Request('GET', '/events/999999999'),
+        # Not a native route: handed to the Flask app through a2wsgi
+        Request('GET', '/feed?limit=5', headers=headers),
+    ]
+
+
+def comparable(body):
+    """A response body as JSON with ``VOLATILE`` values masked, or the raw bytes if it is not JSON."""
+    def mask(value):
+        if isinstance(value, dict):
+            return {k: type(v).__name__ if k in VOLATILE else mask(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [mask(v) for v in value]
+        return value
+    try:
+        return mask(json.loads(body))
+    except ValueError:
+        return body
+
+
+def check_parity(ctx, wsgi, asgi):
+    """Send ``parity_requests`` to both drivers in lockstep; returns the number of mismatches."""
+    run = uuid.uuid4().hex[:8]
+    mismatches = 0
+    pairs = zip(parity_requests(ctx, 'wsgi', run), parity_requests(ctx, 'asgi', run))
+    for wsgi_request, asgi_request in pairs:
+        expected, actual = wsgi.fetch(wsgi_request), asgi.fetch(asgi_request)
+        if expected[0] != actual[0] or comparable(expected[1]) != comparable(actual[1]):
+            mismatches += 1
+            print(f"MISMATCH {wsgi_request.method} {wsgi_request.path}: wsgi {expected[0]} {expected[1][:200]!r}, "
+                  f"asgi {actual[0]} {actual[1][:200]!r}")
+    return mismatches
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='bench-asgi-'), f'{args.size}.db')
+    reuse = os.path.exists(database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+    if args.no_response_cache:
+        os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+    # config.Config reads the environment when first imported, so import it only now
+    from app import create_app
+    app = create_app()
+    from asgi import create_asgi_app
+    from asyncdb import adb
+    from models import db, User
+    from benchmarks.harness import WSGIServerDriver, measure
+    from benchmarks.scenarios import SCENARIOS, SIZES, Context
+    from seed import seed_volume
+
+    with app.app_context():
+        db.create_all()
+        if not reuse:
+            seed_volume(**SIZES[args.size], test_data=True, log=lambda message: print(f'  {message}'))
+        last_user = db.session.query(db.func.max(User.user_id)).scalar()
+        engine = db.engine
+    ctx = Context(app, 1, last_user)
+    application = create_asgi_app(app)
+
+    wsgi, asgi = WSGIServerDriver(app, concurrency=1), ASGIServerDriver(application, concurrency=1)
+    try:
+        mismatches = check_parity(ctx, wsgi, asgi)
+    finally:
+        wsgi.close()
+        asgi.close()
+    print(f"parity: {mismatches} of {len(parity_requests(ctx, 'wsgi', ''))} native route responses differ")
+    if mismatches or args.check:
+        return 1 if mismatches else 0
+
+    servers = (
+        ('wsgi', lambda: WSGIServerDriver(app, concurrency=args.concurrency), engine),
+        ('asgi', lambda: ASGIServerDriver(application, concurrency=args.concurrency), adb.engine.sync_engine),
+    )
+    for name in args.scenarios.split(','):
+        factory, count, warmup = SCENARIOS[name]
+        count = args.requests or count
+        for server_name, start, server_engine in servers:
+            driver = start()
+            try:
+                r = measure(driver, server_engine, factory(ctx, count + warmup), warmup=warmup)
+            finally:
+                driver.close()
+            print(f"{name:<28} {server_name:<5} {r['throughput']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}ms  "
+                  f"p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  {r['queries_per_request']:>6.2f} q/req  "
+                  f"{r['errors']} errors  {r['rejected']} rejected")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import http.client
+import json
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    json: object = None
+    headers: dict = field(default_factory=dict)
+    # Raw body (CSV, NDJSON ...) sent instead of ``json``; set its Content-Type in ``headers``
+    body: bytes = None
+
+
+# The app's periodic refresh threads; their statements belong to no request
+MAINTENANCE_THREADS = frozenset({'revocation-refresh', 'trending-refresh'})
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine while attached, except by ``MAINTENANCE_THREADS``."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _on_execute(self, *args):
+        if threading.current_thread().name in MAINTENANCE_THREADS:
+            return
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def anon_rss_mb():
+    """Anonymous resident memory in MB, or ``None`` where /proc is unavailable.
+
+    Pages of SQLite's memory-mapped database file count towards VmRSS, so a
+    full table scan would look like growth; heap memory is what a leak or a
+    buffered export shows up in.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class PeakRSS:
+    """Tracks how far memory rises above its starting point while attached.
+
+    Anonymous RSS is sampled every ``interval`` seconds on Linux; elsewhere
+    the process's lifetime peak RSS is used, which only shows growth beyond
+    every earlier run.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.growth_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, anon_rss_mb())
+
+    def __enter__(self):
+        self._start = anon_rss_mb()
+        if self._start is None:
+            self._start = max_rss_mb()
+        else:
+            self._peak = self._start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is None:
+            peak = max_rss_mb()
+        else:
+            self._stop.set()
+            self._thread.join()
+            peak = max(self._peak, anon_rss_mb())
+        self.growth_mb = round(max(0.0, peak - self._start), 1)
+
+
+class TestClientDriver:
+    """Sends requests in-process through Flask's test client, one at a time."""
+
+    name = 'client'
+
+    def __init__(self, app, concurrency=1):
+        self.client = app.test_client()
+
+    def send(self, request):
+        # Streamed bodies are consumed chunk by chunk and dropped, so only the app's own memory is measured
+        response = self.client.open(request.path, method=request.method, json=request.json, data=request.body,
+                                    headers=request.headers, buffered=False)
+        for _ in response.iter_encoded():
+            pass
+        response.close()
+        return response.status_code
+
+    def run(self, requests):
+        latencies, statuses = [], []
+        for request in requests:
+            started = time.perf_counter()
+            statuses.append(self.send(request))
+            latencies.append(time.perf_counter() - started)
+        return latencies, statuses
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class HTTPDriver:
+    """Drives a server listening on ``self.port`` over keep-alive HTTP from ``concurrency`` client threads."""
+
+    def __init__(self, port, concurrency):
+        self.port = port
+        self.concurrency = concurrency
+        self._local = threading.local()
+
+    def _connection(self):
+        if not hasattr(self._local, 'conn'):
+            self._local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        return self._local.conn
+
+    def _request(self, request):
+        body = request.body
+        headers = dict(request.headers)
+        if request.json is not None:
+            body = json.dumps(request.json)
+            headers['Content-Type'] = 'application/json'
+        conn = self._connection()
+        conn.request(request.method, request.path, body=body, headers=headers)
+        return conn.getresponse()
+
+    def send(self, request):
+        response = self._request(request)
+        # Read and drop: a large export must not be held in memory by the client
+        while response.read(65536):
+            pass
+        return response.status
+
+    def fetch(self, request):
+        """Send ``request``; returns ``(status, body)``."""
+        response = self._request(request)
+        return response.status, response.read()
+
+    def _timed(self, request):
+        started = time.perf_counter()
+        status = self.send(request)
+        return time.perf_counter() - started, status
+
+    def run(self, requests):
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            results = list(pool.map(self._timed, requests))
+        return [latency for latency, _ in results], [status for _, status in results]
+
+
+class WSGIServerDriver(HTTPDriver):
+    """Serves the app on a local threaded WSGI server."""
+
+    name = 'wsgi'
+
+    def __init__(self, app, concurrency=8):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        super().__init__(self.server.server_port, concurrency)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+DRIVERS = {driver.name: driver for driver in (TestClientDriver, WSGIServerDriver)}
+
+
+def measure(driver, engine, requests, warmup=3):
+    """Run ``requests`` through ``driver`` and summarise latency, throughput and queries."""
+    for request in requests[:warmup]:
+        driver.send(request)
+    requests = requests[warmup:]
+
+    with PeakRSS() as rss, QueryCounter(engine) as queries:
+        started = time.perf_counter()
+        latencies, statuses = driver.run(requests)
+        elapsed = time.perf_counter() - started
+
+    count = len(latencies)
+    return {
+        'requests': count,
+        # 429s are deliberate load shedding, so they are reported apart from errors
+        'errors': sum(status >= 400 and status != 429 for status in statuses),
+        'rejected': statuses.count(429),
+        'throughput': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_request': round(queries.count / count, 3) if count else 0.0,
+        'rss_growth_mb': rss.growth_mb,
+    }
+
+
+def compare(results, baseline, threshold, rss_ceilings=None):
+    """Return human-readable regressions of ``results`` against ``baseline``.
+
+    Throughput may drop and p99 may rise by at most ``threshold`` (a fraction);
+    queries per request may not rise at all. ``rss_ceilings`` maps scenario
+    names to a fixed limit on ``rss_growth_mb``, checked with or without a
+    baseline.
+    """
+    regressions = []
+    for key, current in results.items():
+        ceiling = (rss_ceilings or {}).get(key.rsplit('/', 1)[-1])
+        if ceiling is not None and current.get('rss_growth_mb', 0) > ceiling:
+            regressions.append(f"{key}: RSS grew {current['rss_growth_mb']}MB > ceiling {ceiling}MB")
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if current['throughput'] < previous['throughput'] * (1 - threshold):
+            regressions.append(f"{key}: throughput {current['throughput']} < baseline {previous['throughput']}")
+        if current['p99_ms'] > previous['p99_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p99 {current['p99_ms']}ms > baseline {previous['p99_ms']}ms")
+        if current['queries_per_request'] > previous['queries_per_request'] + 0.01:
+            regressions.append(
+                f"{key}: {current['queries_per_request']} queries/request > baseline {previous['queries_per_request']}"
+            )
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{key}: {current['errors']} errors > baseline {previous.get('errors', 0)}")
+    return regressions
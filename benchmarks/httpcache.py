@@ -0,0 +1,142 @@
+"""Response-cache hit ratios, bytes saved and cross-worker invalidation for each backend.
+
+For every ``--backends`` entry (``memory``, ``file`` and ``local-redis``,
+a local Redis-compatible stand-in) the app polls three ``/events/view``
+pages through the test client, revalidating every other poll with
+``If-None-Match``. Every ``--write-every`` polls a second worker process,
+sharing the database and ``RESPONSE_CACHE_URL``, creates an event on one
+of those pages; polls that still miss it afterwards are counted as
+stale. Reported: throughput, hit rate and the bytes saved by 304s. Only
+``memory://`` is expected to serve stale pages, as its entries are per
+process; the run exits non-zero if a shared backend does.
+
+    python -m benchmarks.httpcache --events 20000 --requests 2000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PAGE_SIZE = 100
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.httpcache', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--backends', default='memory,file,local-redis',
+                        help='Comma-separated backends: memory, file and local-redis.')
+    parser.add_argument('--events', type=int, default=20000, help='Seeded events.')
+    parser.add_argument('--requests', type=int, default=2000, help='Polls per backend.')
+    parser.add_argument('--write-every', type=int, default=50, help='Polls between writes by the other worker.')
+    return parser.parse_args(argv)
+
+
+def other_worker(config, user_id, location, connection):
+    """Create an event at ``location`` for every title received over ``connection``, as another worker would."""
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app(config)
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    client = app.test_client()
+    while (title := connection.recv()) is not None:
+        response = client.post('/events/create', headers=headers, json={
+            'title': title, 'description': 'Created by the other worker', 'date': '2030-01-01', 'location': location})
+        connection.send(response.status_code)
+
+
+def run(config, user_id, location, requests, write_every):
+    from app import create_app
+    from httpcache import responses
+
+    app = create_app(config)
+    responses.clear()
+    before = responses.stats()
+    context = multiprocessing.get_context('spawn')
+    connection, child = context.Pipe()
+    worker = context.Process(target=other_worker, args=(config, user_id, location, child), name='httpcache-worker')
+    worker.start()
+    # The last page only lists the other worker's events
+    pages = ['/events/view', f'/events/view?limit={PAGE_SIZE}', f'/events/view?location={location}&limit={PAGE_SIZE}']
+
+    client = app.test_client()
+    etags, seen, writes, stale, elapsed = {}, None, 0, 0, 0.0
+    for i in range(requests):
+        if i and i % write_every == 0:
+            connection.send(f'Cache benchmark event {writes}')
+            if connection.recv() != 201:
+                raise RuntimeError('the other worker failed to create an event')
+            writes += 1
+        path = pages[i % len(pages)]
+        headers = {'If-None-Match': etags[path]} if path in etags and i % 2 else {}
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        body = response.get_json() if response.status_code == 200 else None
+        elapsed += time.perf_counter() - started
+        if response.status_code == 200:
+            etags[path] = response.headers['ETag']
+        if path == pages[-1]:
+            seen = len(body['events']) if body is not None else seen
+            stale += seen != min(writes, PAGE_SIZE)
+    connection.send(None)
+    worker.join()
+
+    after = responses.stats()
+    counts = {outcome: sum(stats.get(outcome, 0) for stats in after.values())
+              - sum(stats.get(outcome, 0) for stats in before.values())
+              for outcome in ('hits', 'misses', 'not_modified', 'bytes_saved')}
+    served = counts['hits'] + counts['misses'] + counts['not_modified']
+    return {
+        'throughput': requests / elapsed,
+        'hit_rate': (counts['hits'] + counts['not_modified']) / served if served else 0.0,
+        'not_modified': counts['not_modified'],
+        'bytes_saved': counts['bytes_saved'],
+        'writes': writes,
+        'stale': stale,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-httpcache-')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    from app import create_app
+    from localredis import LocalRedis
+    from models import db, User
+    from seed import seed_volume
+
+    database = f"sqlite:///{os.path.join(workdir, 'events.db')}"
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database, 'RESPONSE_CACHE_ENABLED': False})
+    with app.app_context():
+        db.create_all()
+        seed_volume(users=1000, events=args.events, test_data=True, log=lambda message: None)
+        user_id = db.session.query(db.func.min(User.user_id)).scalar()
+    print(f"{args.events} events, {args.requests} polls per backend, a write every {args.write_every}")
+
+    urls = {'memory': lambda: 'memory://',
+            'file': lambda: f"file://{os.path.join(workdir, 'cache')}",
+            'local-redis': lambda: LocalRedis().serve().url}
+    failed = False
+    for name in args.backends.split(','):
+        config = {'SQLALCHEMY_DATABASE_URI': database, 'RESPONSE_CACHE_ENABLED': True,
+                  'RESPONSE_CACHE_URL': urls[name]()}
+        r = run(config, user_id, f'Cache Hall {name}', args.requests, args.write_every)
+        shared = name != 'memory'
+        failed = failed or (shared and r['stale'] > 0)
+        print(f"{name:<12} {r['throughput']:>9.1f} req/s  hit rate {r['hit_rate']:>6.1%}  "
+              f"{r['not_modified']:>5} 304s  {r['bytes_saved'] / 1024:>9.0f} KiB saved  "
+              f"{r['stale']} stale polls after {r['writes']} writes by the other worker"
+              f"{'' if shared or not r['stale'] else ' (expected: per-process entries)'}")
+    shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        print('FAILED: a shared backend served pages that missed the other worker\'s writes')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Importing a season of events: one ``POST /events/create`` per event against ``POST /events/batch``.
+
+Each path imports the same ``--events`` events into its own copy of a
+seeded database over the threaded WSGI server and reports the wall time,
+events per second and SQL statements per event. The batch path is run
+once per upload format (JSON array, NDJSON, CSV), ``bulk.MAX_ITEMS``
+events per request.
+
+    python -m benchmarks.imports --events 10000 --concurrency 8
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.imports', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--events', type=int, default=10000, help='Events imported by each path.')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Client connections for the one-request-per-event path.')
+    return parser.parse_args(argv)
+
+
+def season(count):
+    return [{'title': f'Imported event {i}', 'description': 'A season of neighbourhood events',
+             'date': f'2030-{i % 12 + 1:02d}-{i % 28 + 1:02d}', 'location': f'Park {i % 50}'}
+            for i in range(count)]
+
+
+def encode(events, fmt):
+    """Return ``(body, content_type)`` for an upload of ``events``."""
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(event) + '\n' for event in events).encode(), 'application/x-ndjson'
+    if fmt == 'csv':
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=list(events[0]))
+        writer.writeheader()
+        writer.writerows(events)
+        return out.getvalue().encode(), 'text/csv'
+    return json.dumps(events).encode(), 'application/json'
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-imports-')
+    template = os.path.join(workdir, 'template.db')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    import bulk
+    from app import create_app
+    from models import db, Event
+    from benchmarks.harness import QueryCounter, Request, WSGIServerDriver
+    from benchmarks.scenarios import SIZES, Context
+    from seed import seed_volume
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{template}', 'DATABASE_PROFILE': 'default'})
+    with app.app_context():
+        db.create_all()
+        seed_volume(**SIZES[args.size], test_data=True, log=lambda message: print(f'  {message}'))
+        db.engine.dispose()
+
+    events = season(args.events)
+    paths = [('per-request', args.concurrency, None)] + [(f'batch {fmt}', 1, fmt) for fmt in ('json', 'ndjson', 'csv')]
+    for name, concurrency, fmt in paths:
+        database = os.path.join(workdir, f"{name.replace(' ', '-')}.db")
+        shutil.copyfile(template, database)
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+        headers = Context(app, 1, 1).auth(1)
+        if fmt is None:
+            requests = [Request('POST', '/events/create', event, headers) for event in events]
+        else:
+            requests = []
+            for start in range(0, len(events), bulk.MAX_ITEMS):
+                body, content_type = encode(events[start:start + bulk.MAX_ITEMS], fmt)
+                requests.append(Request('POST', '/events/batch', headers={**headers, 'Content-Type': content_type},
+                                        body=body))
+
+        with app.app_context():
+            engine = db.engine
+            before = db.session.scalar(db.select(db.func.count()).select_from(Event))
+        driver = WSGIServerDriver(app, concurrency=concurrency)
+        try:
+            with QueryCounter(engine) as queries:
+                started = time.perf_counter()
+                _, statuses = driver.run(requests)
+                elapsed = time.perf_counter() - started
+        finally:
+            driver.close()
+        with app.app_context():
+            imported = db.session.scalar(db.select(db.func.count()).select_from(Event)) - before
+            db.session.remove()
+        engine.dispose()
+
+        print(f"{name:<12} {imported:>6} events in {elapsed:>7.2f}s  {imported / elapsed:>9.1f} events/s  "
+              f"{len(requests):>6} requests  {queries.count / max(imported, 1):>5.2f} statements/event  "
+              f"{sum(status >= 400 for status in statuses)} failed requests")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Radius queries against a million geolocated events.
+
+Seeds ``--events`` events (and a few users) spread uniformly over
+``--area``, then times ``GET /events/nearby`` around random points of it at
+each radius: the proximity query alone (``geo.nearby``) and the whole
+request through the test client, with the response cache off. Reuse the
+seeded database across runs with ``--database``.
+
+    python -m benchmarks.nearby --events 1000000 --radius 1,5,25 --database /tmp/bench-geo.db
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Great Britain, roughly: a million events is ~3 per square kilometre
+DEFAULT_AREA = '50.0,-5.5,55.8,1.8'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.nearby', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--area', default=DEFAULT_AREA, help='south,west,north,east of the seeded events.')
+    parser.add_argument('--radius', default='1,5,25', help='Comma-separated radii in km.')
+    parser.add_argument('--queries', type=int, default=500, help='Queries per radius.')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--database', help='SQLite file to seed, or reuse if it already exists.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    area = tuple(float(value) for value in args.area.split(','))
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='bench-nearby-'), 'nearby.db')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    import geo
+    from app import create_app
+    from models import db
+    from benchmarks.harness import percentile
+    from seed import seed_volume
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'RESPONSE_CACHE_ENABLED': False})
+    with app.app_context():
+        db.create_all()
+        if not db.session.execute(db.text("SELECT count(*) FROM events_geo")).scalar():
+            started = time.perf_counter()
+            seed_volume(users=1000, events=args.events, test_data=True, area=area,
+                        log=lambda message: print(f'  {message}'))
+            print(f'Seeded in {time.perf_counter() - started:.1f}s')
+        indexed = db.session.execute(db.text("SELECT count(*) FROM events_geo")).scalar()
+    print(f'{indexed} geolocated events')
+
+    rng = random.Random(0)
+    south, west, north, east = area
+    client = app.test_client()
+    for radius in (float(r) for r in args.radius.split(',')):
+        points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(args.queries)]
+        query_times, request_times, found = [], [], 0
+        with app.app_context():
+            for lat, lng in points:
+                started = time.perf_counter()
+                found += len(geo.nearby(lat, lng, radius, limit=args.limit))
+                query_times.append(time.perf_counter() - started)
+        for lat, lng in points:
+            started = time.perf_counter()
+            response = client.get(f'/events/nearby?lat={lat}&lng={lng}&radius_km={radius}&limit={args.limit}')
+            response.get_data()
+            request_times.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        print(f"radius {radius:>5.1f} km  {found / len(points):>6.1f} events/query  "
+              f"query p50 {percentile(query_times, 50) * 1000:>6.2f}ms  p99 {percentile(query_times, 99) * 1000:>6.2f}ms  "
+              f"request p50 {percentile(request_times, 50) * 1000:>6.2f}ms  "
+              f"p99 {percentile(request_times, 99) * 1000:>6.2f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""New-event emails: sent inside ``create_event`` against queued for ``flask jobs`` workers.
+
+Seeds one neighbourhood of ``--subscribers`` users and runs a local SMTP
+stand-in that accepts (and counts) every message. Reported:
+
+* ``POST /events/create`` latency with notifications off, queued
+  (``MAIL_NOTIFICATIONS``), and sent inline: the obvious implementation,
+  one ``mail.send`` per neighbour before the response;
+* delivery: one event's emails through ``--processes`` worker processes,
+  with the SMTP connections they opened and any duplicates;
+* retries: the stand-in drops the first connections part-way through a
+  batch, and every neighbour must still get exactly one email;
+* dead-lettering: with the SMTP server down, jobs exhaust their attempts,
+  then ``requeue_dead`` delivers them once it is back.
+
+    python -m benchmarks.notifications --subscribers 10000 --processes 1,2,4
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """A minimal local SMTP server that accepts every message and counts recipients and connections.
+
+    The first ``drop_connections`` connections are closed without a reply
+    after ``drop_after`` messages; with ``down`` every connection is.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.drop_connections, self.drop_after, self.down = 0, 0, False
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.recipients = Counter()
+
+    def delivered(self):
+        with self.lock:
+            return sum(self.recipients.values())
+
+    def serve(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            dropping = server.down or server.connections <= server.drop_connections
+        if server.down:
+            return
+        self.reply('220 localhost SMTP stand-in')
+        accepted, envelope = 0, []
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('MAIL FROM'):
+                envelope = []
+                self.reply('250 OK')
+            elif command.startswith('RCPT TO'):
+                envelope.append(line.decode().strip()[8:].strip('<> '))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                if dropping and accepted >= server.drop_after:
+                    return
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                with server.lock:
+                    server.recipients.update(envelope)
+                accepted += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.notifications', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subscribers', type=int, default=10000, help='Users in the organizer\'s neighbourhood.')
+    parser.add_argument('--requests', type=int, default=200, help='Events created per queued / off run.')
+    parser.add_argument('--inline-requests', type=int, default=3, help='Events created with inline sending.')
+    parser.add_argument('--processes', default='1,2,4', help='Comma-separated worker process counts.')
+    parser.add_argument('--batch-size', type=int, default=500, help='NOTIFY_BATCH_SIZE.')
+    return parser.parse_args(argv)
+
+
+def work(config, ready, stop):
+    """Worker process: the same loop as ``flask jobs work``, until ``stop`` is set."""
+    from app import create_app
+    from jobs import jobs
+
+    app = create_app(config)
+    app.logger.disabled = True
+    ready.release()
+    jobs.work(stop=stop)
+
+
+def deliver(config, processes, smtp, expected, timeout=600):
+    """Start ``processes`` workers, queue one event's notification and time until ``expected`` emails arrive.
+
+    Stops waiting early once no job is left to run, e.g. when one was dead-lettered.
+    """
+    from jobs import jobs
+
+    context = multiprocessing.get_context('spawn')
+    ready, stop = context.Semaphore(0), context.Event()
+    workers = [context.Process(target=work, args=(config, ready, stop)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+    smtp.reset()
+    started = time.perf_counter()
+    jobs.enqueue('notify_new_events', {"event_ids": [1], "neighborhood": "Neighbourhood 1", "organizer_id": 1})
+    while smtp.delivered() < expected and time.perf_counter() - started < timeout and jobs.pending():
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    # Let any straggling retry land, so duplicates are counted too
+    while jobs.pending() and time.perf_counter() - started < timeout:
+        time.sleep(0.05)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return elapsed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-notifications-')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from jobs import jobs
+    from models import db, User
+    from seed import seed_volume
+    from benchmarks.harness import Request, TestClientDriver, measure
+
+    smtp = SMTPStandIn().serve()
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'JOB_QUEUE_DATABASE': os.path.join(workdir, 'jobs.db'),
+        'RESPONSE_CACHE_ENABLED': False,
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': smtp.port,
+        'NOTIFY_BATCH_SIZE': args.batch_size,
+        'JOB_POLL_INTERVAL': 0.05,
+        'JOB_BACKOFF_BASE': 0.2,
+        'JOB_MAX_ATTEMPTS': 3,
+    }
+    app = create_app(config)
+    # Retries and dead letters are expected here; their logging would drown the report
+    app.logger.disabled = True
+    with app.app_context():
+        db.create_all()
+        seed_volume(users=args.subscribers + 1, neighborhoods=1, test_data=True, log=lambda message: None)
+        token = create_access_token(identity='1')
+        db_engine = db.engine
+    headers = {'Authorization': f'Bearer {token}'}
+    body = {"title": "Street party", "description": "Bring a chair.", "date": "2030-06-01", "location": "The green"}
+    print(f"{args.subscribers} neighbours, batches of {args.batch_size}, SMTP stand-in on port {smtp.port}")
+
+    def create_events(count, label):
+        driver = TestClientDriver(app)
+        r = measure(driver, db_engine, [Request('POST', '/events/create', body, headers)] * (count + 3))
+        driver.close()
+        print(f"create {label:<8} p50 {r['p50_ms']:>9.3f}ms  p99 {r['p99_ms']:>9.3f}ms  "
+              f"{r['queries_per_request']:>5.2f} q/req  {r['errors']} failed")
+
+    app.config['MAIL_NOTIFICATIONS'] = False
+    create_events(args.requests, 'off')
+    app.config['MAIL_NOTIFICATIONS'] = True
+    create_events(args.requests, 'queued')
+    with jobs.engine.begin() as connection:
+        connection.exec_driver_sql('DELETE FROM jobs')
+    app.config['MAIL_NOTIFICATIONS'] = False
+
+    # The obvious implementation: every neighbour mailed before the response is sent
+    from flask_mail import Message
+    from notifications import mailer
+    with app.app_context():
+        recipients = db.session.execute(
+            db.select(User.email, User.name).where(User.neighborhood == 'Neighbourhood 1', User.user_id != 1)).all()
+    smtp.reset()
+    client, latencies = app.test_client(), []
+    for _ in range(args.inline_requests):
+        started = time.perf_counter()
+        client.post('/events/create', json=body, headers=headers)
+        with app.app_context():
+            mail = mailer()
+            for email, name in recipients:
+                mail.send(Message("New event", recipients=[email], body=f"Hi {name}"))
+        latencies.append(time.perf_counter() - started)
+    print(f"create inline   p50 {sorted(latencies)[len(latencies) // 2] * 1000:>9.1f}ms  "
+          f"({smtp.connections // args.inline_requests} SMTP connections per event)")
+
+    failures = []
+
+    def check(label):
+        # Every neighbour exactly once, whatever went wrong on the way
+        duplicates = smtp.delivered() - len(smtp.recipients)
+        if len(smtp.recipients) != args.subscribers or duplicates:
+            failures.append(f"{label}: {len(smtp.recipients)}/{args.subscribers} reached, {duplicates} duplicates")
+
+    for processes in (int(n) for n in args.processes.split(',')):
+        elapsed = deliver(config, processes, smtp, args.subscribers)
+        print(f"deliver {processes} proc  {elapsed:>6.2f}s  {smtp.delivered() / elapsed:>8.0f} emails/s  "
+              f"{smtp.connections} SMTP connections  {smtp.delivered() - len(smtp.recipients)} duplicates  "
+              f"{len(smtp.recipients)}/{args.subscribers} reached")
+        check(f"deliver {processes} proc")
+
+    smtp.drop_connections, smtp.drop_after = 5, args.batch_size // 3
+    elapsed = deliver(config, 2, smtp, args.subscribers)
+    print(f"retries         {elapsed:>6.2f}s  first {smtp.drop_connections} connections dropped after "
+          f"{smtp.drop_after} emails: {smtp.connections} connections  "
+          f"{smtp.delivered() - len(smtp.recipients)} duplicates  {len(smtp.recipients)}/{args.subscribers} reached")
+    check('retries')
+    smtp.drop_connections = 0
+
+    smtp.down = True
+    smtp.reset()
+    with app.app_context():
+        jobs.enqueue('notify_new_events', {"event_ids": [1], "neighborhood": "Neighbourhood 1", "organizer_id": 1})
+        started = time.perf_counter()
+        jobs.work(burst=True)
+        elapsed = time.perf_counter() - started
+        dead = jobs.stats()['dead']
+        smtp.down = False
+        smtp.reset()
+        requeued = jobs.requeue_dead()
+        jobs.work(burst=True)
+    print(f"dead letters    SMTP down: {dead} batch jobs dead after {app.config['JOB_MAX_ATTEMPTS']} attempts "
+          f"in {elapsed:.2f}s; requeued {requeued}, then {len(smtp.recipients)}/{args.subscribers} reached")
+    check('dead letters')
+
+    smtp.shutdown()
+    db_engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"FAILED {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,470 @@
+import uuid
+from dataclasses import dataclass, field
+
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+
+from benchmarks.harness import Request
+import trending
+from models import db, Activity, Comment, ConversationParticipant, Event, Message, Post, RSVP, User
+from pagination import encode_cursor
+from seed import WORDS, seed_thread
+
+# Synthetic volumes generated with seed.seed_volume() for each dataset size
+SIZES = {
+    'small': {'users': 1000, 'events': 5000, 'posts': 20000, 'conversations': 1000, 'messages': 10000},
+    'medium': {'users': 10000, 'events': 100000, 'posts': 500000, 'conversations': 100000, 'messages': 1000000},
+    'large': {'users': 100000, 'events': 1000000, 'posts': 10000000, 'conversations': 1000000, 'messages': 10000000},
+}
+
+# Seeded users and events get coordinates within this box (south, west, north, east): Greater London
+AREA = (51.28, -0.51, 51.69, 0.33)
+PASSWORD = 'password123'
+THREAD_SIZE = 50000
+# Exports stream rows, so memory must stay flat however many they send (500k posts at --size medium)
+EXPORT_RSS_CEILING_MB = 64
+SCENARIOS = {}
+# Fixed limits on a scenario's rss_growth_mb, enforced by harness.compare
+RSS_CEILINGS = {}
+
+
+@dataclass
+class Context:
+    app: object
+    first_user: int
+    last_user: int
+    # Post-run consistency checks queued by scenarios; each returns an error message or None
+    checks: list = field(default_factory=list)
+    # (post_id, first_comment, last_comment) of the shared THREAD_SIZE-comment thread, seeded on first use
+    thread: tuple = None
+
+    def auth(self, user_id):
+        with self.app.app_context():
+            token = create_access_token(identity=str(user_id))
+        return {'Authorization': f'Bearer {token}'}
+
+    def user(self, i):
+        return self.first_user + i % (self.last_user - self.first_user + 1)
+
+    def comment_thread(self):
+        if self.thread is None:
+            with self.app.app_context():
+                post_id = db.session.scalar(select(func.min(Post.post_id)))
+                # Reuse a thread left in the database by an earlier run
+                existing = db.session.execute(
+                    select(func.min(Comment.comment_id), func.max(Comment.comment_id)).where(Comment.post_id == post_id)
+                ).first()
+                if existing[0] is not None and existing[1] - existing[0] + 1 >= THREAD_SIZE:
+                    self.thread = (post_id, *existing)
+                else:
+                    self.thread = (post_id, *seed_thread(post_id, THREAD_SIZE, self.first_user, self.last_user,
+                                                         log=lambda message: print(f'  {message}')))
+        return self.thread
+
+
+def scenario(name, count, warmup=3, rss_ceiling_mb=None):
+    """Register ``factory(ctx, n)``, which returns the requests a scenario sends.
+
+    With ``rss_ceiling_mb`` the run fails if the process's peak RSS grows by
+    more than that while the scenario runs.
+    """
+    def register(factory):
+        SCENARIOS[name] = (factory, count, warmup)
+        if rss_ceiling_mb is not None:
+            RSS_CEILINGS[name] = rss_ceiling_mb
+        return factory
+    return register
+
+
+def uncached(path, n):
+    """``n`` GETs of ``path`` that each miss the response cache, told apart by a query parameter the route ignores.
+
+    Used by the scenarios that check a route's statements per request, which
+    a cache hit (0 statements) would hide.
+    """
+    run = uuid.uuid4().hex[:8]
+    return [Request('GET', f'{path}&nocache={run}-{i}') for i in range(n)]
+
+
+@scenario('login', 40)
+def login(ctx, n):
+    return [
+        Request('POST', '/login', {'email': f'user{ctx.user(i)}@example.test', 'password': PASSWORD})
+        for i in range(n)
+    ]
+
+
+@scenario('register', 40)
+def register(ctx, n):
+    run = uuid.uuid4().hex[:8]
+    return [
+        Request('POST', '/register', {'name': 'Bench', 'email': f'bench-{run}-{i}@example.test', 'password': PASSWORD})
+        for i in range(n)
+    ]
+
+
+@scenario('protected', 500)
+def protected(ctx, n):
+    headers = ctx.auth(ctx.first_user)
+    return [Request('GET', '/protected', headers=headers) for _ in range(n)]
+
+
+@scenario('events_create', 300)
+def events_create(ctx, n):
+    headers = ctx.auth(ctx.first_user)
+    body = {'title': 'Bench event', 'description': 'Created by the benchmark suite',
+            'date': '2030-01-01', 'location': 'Bench Park'}
+    return [Request('POST', '/events/create', body, headers) for _ in range(n)]
+
+
+@scenario('events_batch', 20, warmup=1)
+def events_batch(ctx, n):
+    # 500 events per request: one JSON decode, one validation pass and one multi-row INSERT
+    headers = ctx.auth(ctx.first_user)
+    body = [{'title': f'Bench event {i}', 'description': 'Imported by the benchmark suite',
+             'date': '2030-01-01', 'location': 'Bench Park'} for i in range(500)]
+    return [Request('POST', '/events/batch', body, headers) for _ in range(n)]
+
+
+@scenario('events_nearby', 300)
+def events_nearby(ctx, n):
+    # Distinct centres, so every request misses the response cache and runs the proximity query
+    south, west, north, east = AREA
+    return [Request('GET', f'/events/nearby?lat={south + (north - south) * (i * 0.618 % 1):.5f}'
+                           f'&lng={west + (east - west) * (i * 0.382 % 1):.5f}&radius_km=5&limit=50')
+            for i in range(n)]
+
+
+@scenario('events_view_first_page', 300)
+def events_view_first_page(ctx, n):
+    return uncached('/events/view?limit=50', n)
+
+
+@scenario('events_view_deep_page', 300)
+def events_view_deep_page(ctx, n):
+    # Page N: resume from the row 90% of the way through the (date, event_id) order
+    with ctx.app.app_context():
+        total = db.session.scalar(select(func.count()).select_from(Event).where(Event.date.isnot(None)))
+        row = db.session.execute(
+            select(Event.date, Event.event_id).where(Event.date.isnot(None))
+            .order_by(Event.date, Event.event_id).offset(int(total * 0.9)).limit(1)
+        ).first()
+    cursor = encode_cursor(row.date, row.event_id)
+    return uncached(f'/events/view?limit=50&cursor={cursor}', n)
+
+
+@scenario('events_view_max_page', 300)
+def events_view_max_page(ctx, n):
+    # Same statement count as a 50-row page: organizers are joined, not lazy-loaded
+    return uncached('/events/view?limit=200', n)
+
+
+@scenario('events_view_fields', 300)
+def events_view_fields(ctx, n):
+    # The largest page again, trimmed to the fields a calendar view needs
+    return uncached('/events/view?limit=200&fields=id,title,date', n)
+
+
+@scenario('events_view_not_modified', 300)
+def events_view_not_modified(ctx, n):
+    # Clients polling with the ETag of the copy they already hold; answered from the response cache
+    with ctx.app.test_client() as client:
+        etag = client.get('/events/view?limit=50').headers.get('ETag')
+    headers = {'If-None-Match': etag} if etag else {}
+    return [Request('GET', '/events/view?limit=50', headers=headers) for _ in range(n)]
+
+
+@scenario('events_view_during_rsvps', 330)
+def events_view_during_rsvps(ctx, n):
+    # One RSVP for every ten event-list reads: each one invalidates the cached event listings
+    with ctx.app.app_context():
+        event_id = db.session.scalar(select(func.min(Event.event_id)))
+        attending = set(db.session.scalars(select(RSVP.user_id).where(RSVP.event_id == event_id)))
+    users = (user_id for user_id in range(ctx.first_user, ctx.last_user + 1) if user_id not in attending)
+    requests = []
+    for i in range(n):
+        user_id = next(users, None) if i % 11 == 0 else None
+        if user_id is not None:
+            requests.append(Request('POST', f'/events/{event_id}/rsvp', headers=ctx.auth(user_id)))
+        else:
+            requests.append(Request('GET', '/events/view?limit=50'))
+    return requests
+
+
+@scenario('event_detail', 300)
+def event_detail(ctx, n):
+    with ctx.app.app_context():
+        ids = db.session.scalars(select(Event.event_id).order_by(Event.event_id).limit(n)).all()
+    return [Request('GET', f'/events/{ids[i % len(ids)]}') for i in range(n)]
+
+
+@scenario('events_delete', 300)
+def events_delete(ctx, n):
+    with ctx.app.app_context():
+        events = [Event(title='Doomed', description='Deleted by the benchmark suite', location='Bench Park',
+                        organizer_id=ctx.first_user) for _ in range(n)]
+        db.session.add_all(events)
+        db.session.commit()
+        ids = [event.event_id for event in events]
+    headers = ctx.auth(ctx.first_user)
+    return [Request('DELETE', f'/events/delete/{event_id}', headers=headers) for event_id in ids]
+
+
+@scenario('rsvp_hot_event', 1000, warmup=0)
+def rsvp_hot_event(ctx, n):
+    # Many distinct users RSVP to one event at once; the counter must match exactly
+    n = min(n, ctx.last_user - ctx.first_user + 1)
+    with ctx.app.app_context():
+        event = Event(title='Hot event', description='Everyone is going', location='Bench Park',
+                      organizer_id=ctx.first_user)
+        db.session.add(event)
+        db.session.commit()
+        event_id = event.event_id
+
+    def check():
+        with ctx.app.app_context():
+            counter = db.session.scalar(select(Event.attendee_count).where(Event.event_id == event_id))
+            rows = db.session.scalar(select(func.count()).select_from(RSVP).where(RSVP.event_id == event_id))
+        if counter != rows or rows != n:
+            return f'rsvp_hot_event: attendee_count {counter}, {rows} RSVP rows, expected {n}'
+
+    ctx.checks.append(check)
+    return [Request('POST', f'/events/{event_id}/rsvp', headers=ctx.auth(ctx.user(i))) for i in range(n)]
+
+
+@scenario('comments_create', 300)
+def comments_create(ctx, n):
+    # Alternate new top-level comments and replies to the first comment of the big thread
+    post_id, first_comment, _ = ctx.comment_thread()
+    headers = ctx.auth(ctx.first_user)
+    return [
+        Request('POST', f'/posts/{post_id}/comment',
+                {'content': f'Bench comment {i}', 'parent_id': first_comment if i % 2 else None}, headers)
+        for i in range(n)
+    ]
+
+
+@scenario('comments_thread_first_page', 300)
+def comments_thread_first_page(ctx, n):
+    post_id, _, _ = ctx.comment_thread()
+    return [Request('GET', f'/posts/{post_id}/comments?limit=50') for _ in range(n)]
+
+
+@scenario('comments_thread_deep_page', 300)
+def comments_thread_deep_page(ctx, n):
+    # Resume 90% of the way through the thread, as the last pages of a long discussion do
+    post_id, _, _ = ctx.comment_thread()
+    with ctx.app.app_context():
+        path = db.session.scalar(
+            select(Comment.path).where(Comment.post_id == post_id)
+            .order_by(Comment.path).offset(int(THREAD_SIZE * 0.9)).limit(1)
+        )
+    cursor = encode_cursor(path)
+    return [Request('GET', f'/posts/{post_id}/comments?limit=50&cursor={cursor}') for _ in range(n)]
+
+
+@scenario('comments_thread_pruned', 300)
+def comments_thread_pruned(ctx, n):
+    # A first screen: 20 top-level comments with their first three replies per level, two levels deep
+    post_id, _, _ = ctx.comment_thread()
+    return [Request('GET', f'/posts/{post_id}/comments?limit=20&replies=3&depth=2') for _ in range(n)]
+
+
+@scenario('comment_replies', 300)
+def comment_replies(ctx, n):
+    # The subtree below the top-level comment with the most replies
+    post_id, _, _ = ctx.comment_thread()
+    with ctx.app.app_context():
+        comment_id = db.session.scalar(
+            select(Comment.comment_id).where(Comment.post_id == post_id, Comment.depth == 0)
+            .order_by(Comment.reply_count.desc()).limit(1)
+        )
+    return [Request('GET', f'/comments/{comment_id}/replies?limit=50') for _ in range(n)]
+
+
+def _inbox_owner(ctx):
+    # The seeded conversations are Zipf-distributed over users, so the first user has the biggest inbox
+    with ctx.app.app_context():
+        return db.session.scalar(
+            select(ConversationParticipant.user_id)
+            .group_by(ConversationParticipant.user_id)
+            .order_by(func.count().desc()).limit(1)
+        )
+
+
+def _busiest_conversation(ctx):
+    with ctx.app.app_context():
+        conversation_id = db.session.scalar(
+            select(Message.conversation_id).group_by(Message.conversation_id).order_by(func.count().desc()).limit(1)
+        )
+        user_id = db.session.scalar(
+            select(ConversationParticipant.user_id).where(ConversationParticipant.conversation_id == conversation_id)
+            .limit(1)
+        )
+    return conversation_id, user_id
+
+
+@scenario('messages_send', 300)
+def messages_send(ctx, n):
+    # Both participants of the busiest conversation write at once; unread counters must stay exact
+    conversation_id, _ = _busiest_conversation(ctx)
+    with ctx.app.app_context():
+        members = db.session.scalars(
+            select(ConversationParticipant.user_id).where(ConversationParticipant.conversation_id == conversation_id)
+        ).all()
+
+    def check():
+        with ctx.app.app_context():
+            for member in db.session.scalars(
+                select(ConversationParticipant).where(ConversationParticipant.conversation_id == conversation_id)
+            ):
+                unread = db.session.scalar(
+                    select(func.count()).select_from(Message)
+                    .where(Message.conversation_id == conversation_id,
+                           Message.message_id > (member.last_read_message_id or 0))
+                )
+                if member.unread_count != unread:
+                    return (f'messages_send: user {member.user_id} has unread_count {member.unread_count}, '
+                            f'{unread} messages after their last read')
+
+    ctx.checks.append(check)
+    headers = [ctx.auth(member) for member in members]
+    return [
+        Request('POST', '/messages', {'conversation_id': conversation_id, 'body': f'Bench message {i}'},
+                headers[i % len(headers)])
+        for i in range(n)
+    ]
+
+
+@scenario('inbox_first_page', 300)
+def inbox_first_page(ctx, n):
+    headers = ctx.auth(_inbox_owner(ctx))
+    return [Request('GET', '/conversations?limit=20', headers=headers) for _ in range(n)]
+
+
+@scenario('inbox_deep_page', 300)
+def inbox_deep_page(ctx, n):
+    user_id = _inbox_owner(ctx)
+    with ctx.app.app_context():
+        inbox = (
+            select(ConversationParticipant.last_message_at, ConversationParticipant.conversation_id)
+            .where(ConversationParticipant.user_id == user_id)
+        )
+        total = db.session.scalar(select(func.count()).select_from(inbox.subquery()))
+        row = db.session.execute(
+            inbox.order_by(ConversationParticipant.last_message_at.desc(),
+                           ConversationParticipant.conversation_id.desc())
+            .offset(int(total * 0.9)).limit(1)
+        ).first()
+    cursor = encode_cursor(row.last_message_at, row.conversation_id)
+    headers = ctx.auth(user_id)
+    return [Request('GET', f'/conversations?limit=20&cursor={cursor}', headers=headers) for _ in range(n)]
+
+
+@scenario('conversation_history', 300)
+def conversation_history(ctx, n):
+    conversation_id, user_id = _busiest_conversation(ctx)
+    headers = ctx.auth(user_id)
+    return [Request('GET', f'/conversations/{conversation_id}/messages?limit=50', headers=headers) for _ in range(n)]
+
+
+@scenario('conversation_history_deep', 300)
+def conversation_history_deep(ctx, n):
+    conversation_id, user_id = _busiest_conversation(ctx)
+    with ctx.app.app_context():
+        ids = select(Message.message_id).where(Message.conversation_id == conversation_id)
+        total = db.session.scalar(select(func.count()).select_from(ids.subquery()))
+        before = db.session.scalar(ids.order_by(Message.message_id.desc()).offset(int(total * 0.9)).limit(1))
+    cursor = encode_cursor(before)
+    headers = ctx.auth(user_id)
+    return [
+        Request('GET', f'/conversations/{conversation_id}/messages?limit=50&cursor={cursor}', headers=headers)
+        for _ in range(n)
+    ]
+
+
+@scenario('conversation_mark_read', 300)
+def conversation_mark_read(ctx, n):
+    conversation_id, user_id = _busiest_conversation(ctx)
+    headers = ctx.auth(user_id)
+    return [Request('POST', f'/conversations/{conversation_id}/read', headers=headers) for _ in range(n)]
+
+
+@scenario('events_export', 4, warmup=1, rss_ceiling_mb=EXPORT_RSS_CEILING_MB)
+def events_export(ctx, n):
+    headers = ctx.auth(ctx.first_user)
+    return [Request('GET', '/events/export?format=ndjson', headers=headers) for _ in range(n)]
+
+
+@scenario('events_export_fields', 4, warmup=1, rss_ceiling_mb=EXPORT_RSS_CEILING_MB)
+def events_export_fields(ctx, n):
+    headers = ctx.auth(ctx.first_user)
+    return [Request('GET', '/events/export?format=ndjson&fields=id,title', headers=headers) for _ in range(n)]
+
+
+@scenario('posts_export', 2, warmup=1, rss_ceiling_mb=EXPORT_RSS_CEILING_MB)
+def posts_export(ctx, n):
+    # The largest table at every size: 500k rows at --size medium
+    headers = ctx.auth(ctx.first_user)
+    return [Request('GET', '/posts/export', headers=headers) for _ in range(n)]
+
+
+@scenario('posts_create', 300)
+def posts_create(ctx, n):
+    headers = ctx.auth(ctx.first_user)
+    return [Request('POST', '/posts', {'content': f'Bench post {i}'}, headers) for i in range(n)]
+
+
+@scenario('posts_delete', 300)
+def posts_delete(ctx, n):
+    with ctx.app.app_context():
+        posts = [Post(content='Doomed', created_by_id=ctx.first_user) for _ in range(n)]
+        db.session.add_all(posts)
+        db.session.commit()
+        ids = [post.post_id for post in posts]
+    headers = ctx.auth(ctx.first_user)
+    return [Request('POST', f'/posts/{post_id}/delete', headers=headers) for post_id in ids]
+
+
+@scenario('feed', 300)
+def feed(ctx, n):
+    # Readers from the largest (Zipf rank 1) neighbourhood
+    with ctx.app.app_context():
+        readers = db.session.scalars(
+            select(User.user_id).where(User.neighborhood == 'Neighbourhood 1').limit(50)
+        ).all()
+    headers = [ctx.auth(user_id) for user_id in readers]
+    return [Request('GET', '/feed?limit=50', headers=headers[i % len(headers)]) for i in range(n)]
+
+
+@scenario('trending', 300)
+def view_trending(ctx, n):
+    with ctx.app.app_context():
+        # Databases seeded before the activity log existed get its backfill here
+        if db.session.scalar(select(func.count()).select_from(Activity)) == 0:
+            trending.backfill(datetime.utcnow() - timedelta(days=trending.BACKFILL_DAYS))
+            db.session.commit()
+        readers = db.session.scalars(
+            select(User.user_id).where(User.neighborhood == 'Neighbourhood 1').limit(50)
+        ).all()
+    headers = [ctx.auth(user_id) for user_id in readers]
+    return [Request('GET', '/trending?limit=20', headers=headers[i % len(headers)]) for i in range(n)]
+
+
+@scenario('search', 300)
+def search(ctx, n):
+    return [Request('GET', f'/search?q={WORDS[i % len(WORDS)][:4]}') for i in range(n)]
+
+
+@scenario('mixed_login_events', 330)
+def mixed_login_events(ctx, n):
+    # One login for every ten event-list reads, as during a login burst
+    requests = []
+    for i in range(n):
+        if i % 11 == 0:
+            requests.append(Request('POST', '/login', {'email': f'user{ctx.user(i)}@example.test', 'password': PASSWORD}))
+        else:
+            requests.append(Request('GET', '/events/view?limit=50'))
+    return requests
@@ -0,0 +1,137 @@
+"""Serializing ``--events`` events (with organizers): hand-built dicts and Flask's ``json`` against compiled schemas and orjson.
+
+Loads the events from a seeded database once, then times building the
+response dicts and encoding them as a ``jsonify`` response, best of
+``--repeat`` runs:
+
+* ``current``: the hand-written ``serialize_event`` the routes used before
+  ``serialization.py``, encoded by Flask's ``DefaultJSONProvider``;
+* ``compiled``: the ``event_schema`` serializer, same provider;
+* ``compiled+orjson``: the serializer and ``OrjsonProvider``, as served now;
+* ``unsorted``: the same without ``sort_keys``;
+* ``?fields=...``: a ``--fields`` selection through orjson.
+
+``current`` leaves dates to the encoder, which formats them with
+``werkzeug.http.http_date``; the compiled serializers format them while
+building, so compare totals. The first three must produce byte-identical
+bodies. ``GET /events/export``
+(NDJSON, every event) is also timed end to end under both providers.
+
+    python -m benchmarks.serialization --events 10000
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.serialization', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fields', default='id,title,date', help='Selection timed as ?fields=.')
+    return parser.parse_args(argv)
+
+
+def hand_built(event):
+    """``routes.event.serialize_event(event, with_organizer=True)`` as it was written before compiled schemas."""
+    data = {
+        "id": event.event_id,
+        "title": event.title,
+        "description": event.description,
+        "date": event.date,
+        "location": event.location,
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "organizer_id": event.organizer_id,
+        "attendee_count": event.attendee_count
+    }
+    user = event.organizer
+    data["organizer"] = {"id": user.user_id, "name": user.name, "neighborhood": user.neighborhood}
+    return data
+
+
+def best(fn, repeat):
+    # Like timeit, keep the collector out of the timings: when it runs depends on what earlier paths allocated
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return min(times), result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-serialization-')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    from flask.json.provider import DefaultJSONProvider
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+    from app import create_app
+    from models import db, Event
+    from seed import seed_volume
+    from serialization import OrjsonProvider, event_schema
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'events.db')}",
+                      'RESPONSE_CACHE_ENABLED': False, 'EXPORT_CLIENT_IDS': {'1'}})
+    flask_json, fast_json = DefaultJSONProvider(app), OrjsonProvider(app)
+    unsorted_json = OrjsonProvider(app)
+    unsorted_json.sort_keys = False
+    compiled = event_schema.compile(expand=('organizer',))
+    selected = event_schema.select(args.fields, ('organizer',))
+
+    with app.app_context():
+        db.create_all()
+        seed_volume(users=1000, events=args.events, test_data=True, log=lambda message: None)
+        events = db.session.scalars(select(Event).options(joinedload(Event.organizer)).order_by(Event.event_id)).all()
+        token = create_access_token(identity='1')
+        print(f"{len(events)} events, best of {args.repeat}")
+
+        paths = [
+            ('current', hand_built, flask_json),
+            ('compiled', compiled, flask_json),
+            ('compiled+orjson', compiled, fast_json),
+            ('unsorted', compiled, unsorted_json),
+            (f'?fields={args.fields}', selected, fast_json),
+        ]
+        bodies, baseline = {}, None
+        for name, serialize, provider in paths:
+            build, items = best(lambda: [serialize(event) for event in events], args.repeat)
+            encode, response = best(lambda: provider.response({"events": items, "next_cursor": None}).get_data(),
+                                    args.repeat)
+            bodies[name] = response
+            del items
+            total = build + encode
+            baseline = baseline or total
+            print(f"{name:<26} build {build * 1000:>8.1f}ms  encode {encode * 1000:>8.1f}ms  "
+                  f"total {total * 1000:>8.1f}ms  {baseline / total:>5.1f}x  {len(response) / 1024:>8.0f} KiB")
+        same = bodies['current'] == bodies['compiled'] == bodies['compiled+orjson']
+        print(f"current, compiled and compiled+orjson bodies identical: {same}")
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    for name, provider in (('json', flask_json), ('orjson', fast_json)):
+        app.json = provider
+        elapsed, body = best(lambda: client.get('/events/export?format=ndjson', headers=headers).get_data(),
+                             args.repeat)
+        print(f"GET /events/export  {name:<7} {elapsed * 1000:>8.1f}ms  {len(body) / 1024:>8.0f} KiB")
+
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""How many live-update subscribers one worker can hold.
+
+For each subscriber count, opens that many ``/feed/stream`` connections
+(all as one user) to a local threaded WSGI server and reports the
+threads and memory they cost while idle, then publishes a burst of
+messages to the channel and reports fan-out throughput and delivery
+latency. One extra
+subscription is never read, as if its connection had stalled, to show
+slow-consumer eviction. With ``--pubsub local-redis`` messages go through
+``PUBSUB_URL`` and the Redis backend instead, published over their own
+connection as another worker would, to a local Redis-compatible stand-in.
+Exits non-zero if any subscriber missed a message.
+
+    python -m benchmarks.sse --subscribers 100,500,1000 --messages 200
+    python -m benchmarks.sse --subscribers 100 --pubsub local-redis
+"""
+import argparse
+import json
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+NEIGHBORHOOD = 'Neighbourhood 1'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.sse', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subscribers', default='100,500,1000', help='Comma-separated subscriber counts.')
+    parser.add_argument('--messages', type=int, default=200, help='Messages published per subscriber count.')
+    parser.add_argument('--rate', type=float, default=100.0, help='Messages published per second.')
+    parser.add_argument('--payload', type=int, default=300, help='Approximate message size in bytes.')
+    parser.add_argument('--pubsub', choices=('memory', 'local-redis'), default='memory',
+                        help='Relay messages in-process or through a local Redis-compatible stand-in.')
+    return parser.parse_args(argv)
+
+
+def open_stream(port, token):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect(('127.0.0.1', port))
+    sock.sendall(f'GET /feed/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n'
+                 f'Authorization: Bearer {token}\r\n\r\n'.encode())
+    return sock
+
+
+class Reader:
+    """Reads every subscriber socket from one thread and records when each message arrives."""
+
+    def __init__(self, sockets):
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        for sock in sockets:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+            self.buffers[sock] = b''
+        self.latencies = []
+        self.connected = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, _ in self.selector.select(timeout=0.1):
+                try:
+                    chunk = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    self.selector.unregister(key.fileobj)
+                    continue
+                now = time.perf_counter()
+                data = self.buffers[key.fileobj] + chunk
+                lines = data.split(b'\n')
+                self.buffers[key.fileobj] = lines.pop()
+                for line in lines:
+                    if line.startswith(b': connected'):
+                        self.connected += 1
+                    elif line.startswith(b'data: '):
+                        self.latencies.append(now - json.loads(line[6:])['sent'])
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join()
+
+
+def run(app, token, count, messages, rate, payload):
+    from benchmarks.harness import WSGIServerDriver, max_rss_mb, percentile
+    from pubsub import RedisBackend, broker
+    import feed
+
+    url = app.config['PUBSUB_URL']
+    # Another worker's connection to the server, so the messages make the full round trip
+    publish = RedisBackend(url, None).publish if url else broker.publish
+
+    server = WSGIServerDriver(app)
+    threads_before, rss_before = threading.active_count(), max_rss_mb()
+    sockets = [open_stream(server.port, token) for _ in range(count)]
+    stalled = broker.subscribe(feed.channel(NEIGHBORHOOD))
+    reader = Reader(sockets)
+    reader.start()
+
+    deadline = time.perf_counter() + 30
+    while reader.connected < count and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    threads, rss = threading.active_count() - threads_before, max_rss_mb() - rss_before
+
+    padding = 'x' * payload
+    started = time.perf_counter()
+    for i in range(messages):
+        publish(feed.channel(NEIGHBORHOOD), 'post',
+                json.dumps({'id': i, 'sent': time.perf_counter(), 'content': padding}))
+        sleep = started + (i + 1) / rate - time.perf_counter()
+        if sleep > 0:
+            time.sleep(sleep)
+    deadline = time.perf_counter() + 30
+    while len(reader.latencies) < count * messages and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    reader.stop()
+    broker.unsubscribe(stalled)
+    for sock in sockets:
+        sock.close()
+    server.close()
+
+    latencies = reader.latencies
+    return {
+        'subscribers': count,
+        'connected': reader.connected,
+        'threads': threads,
+        'rss_mb': round(rss, 1),
+        'kb_per_subscriber': round(rss * 1024 / count, 1) if count else 0.0,
+        'delivered': len(latencies),
+        'expected': count * messages,
+        'deliveries_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'stalled_evicted': stalled.evicted,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-sse-'), 'sse.db')}"
+    os.environ.setdefault('SSE_QUEUE_SIZE', '64')
+    if args.pubsub == 'local-redis':
+        from localredis import LocalRedis
+        os.environ['PUBSUB_URL'] = LocalRedis().serve().url
+
+    # config.Config reads the environment when first imported, so import it only now
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from models import db, User
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(name='Subscriber', email='subscriber@example.test', password='-', neighborhood=NEIGHBORHOOD)
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.user_id))
+
+    missed = False
+    for count in (int(n) for n in args.subscribers.split(',')):
+        r = run(app, token, count, args.messages, args.rate, args.payload)
+        missed = missed or r['delivered'] < r['expected']
+        print(f"{r['subscribers']:>6} subscribers  {r['threads']:>5} threads  {r['rss_mb']:>7.1f} MB "
+              f"({r['kb_per_subscriber']:>6.1f} KB each)  {r['delivered']}/{r['expected']} delivered  "
+              f"{r['deliveries_per_s']:>9.1f}/s  p50 {r['p50_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  "
+              f"stalled subscriber {'evicted' if r['stalled_evicted'] else 'NOT evicted'}")
+    if missed:
+        print('FAILED: some subscribers missed messages')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Cold-start cost: how long a fresh worker process takes to build the app and answer its first request.
+
+Each run starts a new interpreter, so nothing is shared with earlier runs
+or with the parent. ``startup/create_app`` is the time spent importing
+``app`` and calling ``create_app()``; ``startup/first_request`` is the
+wall time from spawning the process to the first response, interpreter
+start-up included. ``--importtime N`` also lists the N slowest imports
+as reported by ``python -X importtime``.
+
+    python -m benchmarks.startup --runs 20 --importtime 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+
+from sqlalchemy import event
+from models import db
+queries = []
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(1))
+status = app.test_client().get(sys.argv[1]).status_code
+print(json.dumps({
+    'create_app_ms': (created - started) * 1000,
+    'status': status,
+    'queries': len(queries),
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='Fresh processes to start.')
+    parser.add_argument('--path', default='/events/view', help='First request sent by each process.')
+    parser.add_argument('--database', help='SQLite file to run against (default: an empty temporary one).')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='Also list the N slowest imports.')
+    return parser.parse_args(argv)
+
+
+def summarize(samples_ms, errors, queries, rss_mb):
+    """Shape one series of start-up timings like ``harness.measure`` results, so ``compare`` applies."""
+    count = len(samples_ms)
+    return {
+        'requests': count,
+        'errors': errors,
+        'rejected': 0,
+        # Processes started (and ready) per second, back to back
+        'throughput': round(count / (sum(samples_ms) / 1000), 2) if count else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'queries_per_request': round(queries / count, 3) if count else 0.0,
+        'rss_growth_mb': round(rss_mb, 1),
+    }
+
+
+def measure_startup(runs=10, path='/events/view', env=None):
+    """Start ``runs`` fresh processes; returns ``{'startup/create_app': ..., 'startup/first_request': ...}``.
+
+    The child inherits ``env`` (default: this process's environment), so
+    ``DATABASE_URL`` and the rest of the configuration must be set in it.
+    """
+    create_app_ms, first_request_ms = [], []
+    errors = queries = 0
+    rss_mb = 0.0
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', CHILD, path], cwd=ROOT, env=env,
+                              capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            errors += 1
+            sys.stderr.write(proc.stderr)
+            continue
+        # The app may log to stdout; the measurement is the last line
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        errors += r['status'] >= 400
+        queries += r['queries']
+        rss_mb = max(rss_mb, r['rss_mb'])
+        create_app_ms.append(r['create_app_ms'])
+        # Spawn to exit: interpreter start-up, create_app(), the first request and shutdown
+        first_request_ms.append(elapsed)
+
+    return {
+        'startup/create_app': summarize(create_app_ms, errors, 0, rss_mb),
+        'startup/first_request': summarize(first_request_ms, errors, queries, rss_mb),
+    }
+
+
+def slowest_imports(count, env=None):
+    """Return ``(cumulative_ms, self_ms, module)`` for the ``count`` slowest imports of ``create_app()``."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us) / 1000, int(self_us) / 1000, module.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def report(results):
+    for key, r in results.items():
+        print(f"{key:<45} {r['throughput']:>9.1f} starts/s  p50 {r['p50_ms']:>8.2f}ms  "
+              f"p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  "
+              f"{r['queries_per_request']:>6.2f} q/req  {r['rss_growth_mb']:>6.1f} MB  {r['errors']} errors")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='bench-startup-'), 'startup.db')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.abspath(database)}')
+
+    if not os.path.exists(database):
+        subprocess.run([sys.executable, '-c', 'from app import create_app\nfrom models import db\n'
+                        'with create_app().app_context(): db.create_all()'], cwd=ROOT, env=env, check=True)
+
+    report(measure_startup(args.runs, args.path, env))
+    if args.importtime:
+        print(f"\n{'cumulative':>10} {'self':>8}  module")
+        for cumulative, own, module in slowest_imports(args.importtime, env):
+            print(f'{cumulative:>8.1f}ms {own:>6.1f}ms  {module}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Trending rankings kept incrementally, against rescoring the activity log per request.
+
+Seeds posts and events over ``--neighborhoods`` neighbourhoods, then
+generates a reproducible stream of their creations and of
+``--interactions`` comments and RSVPs over the last ``--hours``: item
+popularity is Zipf-distributed and each item's activity tails off after
+it is posted. ``--record`` saves the stream as NDJSON, ``--replay``
+reads a saved one instead. Reported:
+
+* apply: the stream folded into a ``TrendingEngine`` in log order;
+* top-K: ``TrendingEngine.top`` for every neighbourhood, against the
+  same ranking computed from the whole ``activity`` table with the decay
+  formula in SQL, as a request would have to without the engine, and
+  whether the two rankings agree;
+* cold start: replaying the whole log, saving a snapshot, and starting
+  from that snapshot instead;
+* ``GET /trending`` through the test client.
+
+    python -m benchmarks.trending --interactions 1000000 --record /tmp/trending-stream.ndjson
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.trending', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--interactions', type=int, default=1000000, help='Comments and RSVPs in the stream.')
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--neighborhoods', type=int, default=50)
+    parser.add_argument('--hours', type=float, default=72, help='Time span of the stream, ending now.')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of item popularity.')
+    parser.add_argument('--record', help='Write the generated stream to this NDJSON file.')
+    parser.add_argument('--replay', help='Read the stream from this NDJSON file instead of generating one.')
+    parser.add_argument('--requests', type=int, default=2000, help='GET /trending requests.')
+    return parser.parse_args(argv)
+
+
+def generate(items, args, half_life):
+    """``[neighborhood, kind, ref_id, action, seconds_before_now]`` lines, oldest first."""
+    from seed import _zipf_weights
+
+    rng = random.Random(0)
+    span = args.hours * 3600
+    rng.shuffle(items)
+    births = [rng.uniform(0, span) for _ in items]
+    stream = [[neighborhood, kind, ref_id, kind, span - born]
+              for (neighborhood, kind, ref_id), born in zip(items, births)]
+    popularity = _zipf_weights(len(items), args.skew)
+    for index in rng.choices(range(len(items)), cum_weights=popularity, k=args.interactions):
+        at = births[index] + rng.expovariate(1 / half_life)
+        if at < span:
+            neighborhood, kind, ref_id = items[index]
+            stream.append([neighborhood, kind, ref_id, 'comment' if kind == 'post' else 'rsvp', span - at])
+    stream.sort(key=lambda line: -line[4])
+    return stream
+
+
+def naive_statement(weights):
+    """The decayed score of every item of one neighbourhood and kind, from a full pass over ``activity``."""
+    from sqlalchemy import text
+
+    cases = " ".join(f"WHEN '{action}' THEN {weight!r}" for action, weight in weights.items())
+    return text(
+        f"SELECT ref_id, SUM(CASE action {cases} ELSE 0 END "
+        "* exp(:decay * (julianday(created_at) - julianday(:now)) * 86400.0)) AS score "
+        "FROM activity WHERE neighborhood = :neighborhood AND kind = :kind "
+        "GROUP BY ref_id ORDER BY score DESC, ref_id LIMIT :k"
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-trending-')
+    database = os.path.join(workdir, 'trending.db')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    from sqlalchemy import delete, insert, select
+    from app import create_app
+    from models import db, Activity, Event, Post, User
+    from seed import seed_volume
+    from trending import KINDS, TrendingEngine, rankings
+    from benchmarks.harness import Request, TestClientDriver, measure, percentile
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'RESPONSE_CACHE_ENABLED': False})
+    half_life = app.config['TRENDING_HALF_LIFE']
+    with app.app_context():
+        db.create_all()
+        seed_volume(users=2000, posts=args.posts, events=args.events, neighborhoods=args.neighborhoods,
+                    test_data=True, log=lambda message: None)
+        db.session.execute(delete(Activity))
+        db.session.commit()
+        items = [(n, 'post', ref_id) for n, ref_id in db.session.execute(
+            select(User.neighborhood, Post.post_id).join(User, Post.created_by_id == User.user_id))]
+        items += [(n, 'event', ref_id) for n, ref_id in db.session.execute(
+            select(User.neighborhood, Event.event_id).join(User, Event.organizer_id == User.user_id))]
+
+    if args.replay:
+        with open(args.replay) as f:
+            stream = [json.loads(line) for line in f]
+    else:
+        stream = generate(items, args, half_life)
+    if args.record:
+        with open(args.record, 'w') as f:
+            f.writelines(json.dumps(line) + '\n' for line in stream)
+    now = datetime.utcnow()
+    rows = [(activity_id, neighborhood, kind, ref_id, action, now - timedelta(seconds=ago))
+            for activity_id, (neighborhood, kind, ref_id, action, ago) in enumerate(stream, 1)]
+    neighborhoods = sorted({row[1] for row in rows})
+    print(f"{len(rows)} activity rows over {len(neighborhoods)} neighbourhoods and {len(items)} posts and events")
+
+    engine = TrendingEngine()
+    engine.init_app(app)
+    with app.app_context():
+        engine.load()
+        started = time.perf_counter()
+        for start in range(0, len(rows), 10000):
+            engine.apply(rows[start:start + 10000])
+        elapsed = time.perf_counter() - started
+    stats = engine.stats()
+    print(f"apply        {len(rows) / elapsed:>10.0f} rows/s  ({elapsed:.2f}s; {stats['items']} items in "
+          f"{stats['boards']} boards)")
+
+    with app.app_context():
+        for start in range(0, len(rows), 10000):
+            db.session.execute(insert(Activity), [
+                {'activity_id': r[0], 'neighborhood': r[1], 'kind': r[2], 'ref_id': r[3], 'action': r[4],
+                 'created_at': r[5]} for r in rows[start:start + 10000]])
+        db.session.commit()
+
+        top_times, naive_times, agree = [], [], 0
+        statement = naive_statement(app.config['TRENDING_WEIGHTS'])
+        for neighborhood in neighborhoods:
+            for kind in KINDS:
+                started = time.perf_counter()
+                ranked = engine.top(neighborhood, kind, engine.size)
+                top_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                naive = db.session.execute(statement, {
+                    'decay': engine.decay, 'now': datetime.utcnow(), 'neighborhood': neighborhood, 'kind': kind,
+                    'k': engine.size}).all()
+                naive_times.append(time.perf_counter() - started)
+                # Near-ties may swap places; compare the ranked ids and the scores they report
+                agree += len(ranked) == len(naive) and all(
+                    item.ref_id == row.ref_id or math.isclose(item.score, row.score, rel_tol=1e-6)
+                    for item, row in zip(ranked, naive))
+    print(f"top-K        engine p50 {percentile(top_times, 50) * 1e6:>8.1f}us  p99 {percentile(top_times, 99) * 1e6:>8.1f}us"
+          f"   full rescoring p50 {percentile(naive_times, 50) * 1000:>7.1f}ms  "
+          f"p99 {percentile(naive_times, 99) * 1000:>7.1f}ms   rankings agree {agree}/{len(top_times)}")
+
+    with app.app_context():
+        cold = TrendingEngine()
+        cold.init_app(app)
+        started = time.perf_counter()
+        cold.load()
+        replayed = time.perf_counter() - started
+        started = time.perf_counter()
+        cold.snapshot()
+        saved = time.perf_counter() - started
+        warm = TrendingEngine()
+        warm.init_app(app)
+        started = time.perf_counter()
+        warm.load()
+        restored = time.perf_counter() - started
+    print(f"cold start   replay log {replayed:.2f}s   save snapshot {saved:.2f}s   load snapshot {restored:.2f}s")
+
+    rankings.init_app(app)
+    with app.app_context():
+        rankings.load()
+        db_engine = db.engine
+    driver = TestClientDriver(app)
+    requests = [Request('GET', f'/trending?neighborhood={neighborhoods[i % len(neighborhoods)]}')
+                for i in range(args.requests + 10)]
+    r = measure(driver, db_engine, requests, warmup=10)
+    print(f"GET /trending {r['throughput']:>9.1f} req/s  p50 {r['p50_ms']:>7.3f}ms  p99 {r['p99_ms']:>7.3f}ms  "
+          f"{r['queries_per_request']:>5.2f} q/req  {r['errors']} failed")
+    driver.close()
+    db_engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Concurrent ``POST /events/create`` under each SQLite engine profile.
+
+Every profile gets its own copy of the same seeded database and is driven
+by the threaded WSGI server at each concurrency level:
+
+* ``default``: SQLAlchemy's defaults (rollback journal, ``synchronous=FULL``),
+  each request thread committing its own write;
+* ``tuned``: the ``DATABASE_PROFILE=tuned`` PRAGMAs (WAL, ``synchronous=NORMAL``,
+  mmap, busy timeout), still one commit per request;
+* ``tuned+queue``: the tuned profile with writes funnelled through the
+  single writer thread (``WRITE_QUEUE_ENABLED``), which commits in batches.
+
+    python -m benchmarks.writes --concurrency 1,8,32
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+PROFILES = {
+    'default': {'DATABASE_PROFILE': 'default', 'WRITE_QUEUE_ENABLED': False},
+    'tuned': {'DATABASE_PROFILE': 'tuned', 'WRITE_QUEUE_ENABLED': False},
+    'tuned+queue': {'DATABASE_PROFILE': 'tuned', 'WRITE_QUEUE_ENABLED': True},
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.writes', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated client connection counts.')
+    parser.add_argument('--requests', type=int, default=600, help='Events created per profile and concurrency.')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='Comma-separated profile names.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='bench-writes-')
+    template = os.path.join(workdir, 'template.db')
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+    from app import create_app
+    from models import db, User
+    from benchmarks.harness import WSGIServerDriver, measure
+    from benchmarks.scenarios import SCENARIOS, SIZES, Context
+    from seed import seed_volume
+
+    # Seed once with the plain profile so the template stays a single rollback-journal file that copies cleanly
+    app = create_app({**PROFILES['default'], 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{template}'})
+    with app.app_context():
+        db.create_all()
+        seed_volume(**SIZES[args.size], test_data=True, log=lambda message: print(f'  {message}'))
+        last_user = db.session.query(db.func.max(User.user_id)).scalar()
+        db.engine.dispose()
+
+    factory, _, warmup = SCENARIOS['events_create']
+    for concurrency in (int(n) for n in args.concurrency.split(',')):
+        for name in args.profiles.split(','):
+            database = os.path.join(workdir, f'{name}-{concurrency}.db')
+            shutil.copyfile(template, database)
+            app = create_app({**PROFILES[name], 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+                              'WRITE_QUEUE_MAX_PENDING': max(256, 4 * concurrency)})
+            ctx = Context(app, 1, last_user)
+            with app.app_context():
+                engine = db.engine
+            driver = WSGIServerDriver(app, concurrency=concurrency)
+            try:
+                r = measure(driver, engine, factory(ctx, args.requests + warmup), warmup=warmup)
+            finally:
+                driver.close()
+                engine.dispose()
+            print(f"events_create  c={concurrency:<4} {name:<12} {r['throughput']:>9.1f} req/s  "
+                  f"p50 {r['p50_ms']:>8.2f}ms  p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  "
+                  f"{r['queries_per_request']:>6.2f} q/req  {r['errors']} errors  {r['rejected']} rejected")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
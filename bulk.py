@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+
+from flask import jsonify, request
+from writer import WriterBusy, writer
+
+# Rows per multi-row INSERT and per transaction; a failing chunk only fails its own items
+CHUNK_SIZE = 500
+MAX_ITEMS = 10000
+# Larger chunks are announced on the live stream as one "<kind>_batch" message instead of item by item
+ANNOUNCE_LIMIT = 100
+
+FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+EXTENSIONS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+def _upload():
+    """The request body and its format: a raw JSON / NDJSON / CSV body, or a ``file`` field in a multipart form."""
+    upload = request.files.get('file')
+    if upload is not None:
+        fmt = FORMATS.get(upload.mimetype)
+        if fmt is None:
+            extension = '.' + upload.filename.rsplit('.', 1)[-1].lower() if '.' in (upload.filename or '') else ''
+            fmt = EXTENSIONS.get(extension)
+        return upload.read(), fmt
+    return request.get_data(), FORMATS.get(request.mimetype)
+
+
+def read_items(key):
+    """Parse a batch upload into a list of items.
+
+    An item is a dict, or a ``ValueError`` for an NDJSON line that could not
+    be parsed, so the caller can report it against its index. A JSON body
+    may be a bare array or an object holding the array under ``key``.
+    Raises ``ValueError`` when the upload as a whole is unusable.
+    """
+    data, fmt = _upload()
+    if fmt is None:
+        raise ValueError('Send a JSON array, NDJSON or CSV (as the body or a "file" upload)')
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError('Upload must be UTF-8')
+
+    if fmt == 'json':
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f'Malformed JSON: {e}')
+        if isinstance(items, dict):
+            items = items.get(key)
+        if not isinstance(items, list):
+            raise ValueError(f'Expected a JSON array or an object with a "{key}" array')
+    elif fmt == 'ndjson':
+        items = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f'Malformed JSON: {e}'))
+    else:
+        items = list(csv.DictReader(io.StringIO(text)))
+
+    if not items:
+        raise ValueError('The batch is empty')
+    if len(items) > MAX_ITEMS:
+        raise BatchTooLarge(f'At most {MAX_ITEMS} items per batch')
+    return items
+
+
+def validate(items, build):
+    """Run ``build(item)`` over every item; returns ``(valid, results)``.
+
+    ``valid`` is a list of ``(index, built)`` pairs; ``results`` already
+    holds a 400 entry for every item that failed validation.
+    """
+    valid, results = [], []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            if not isinstance(item, dict):
+                raise ValueError('Invalid request data')
+            valid.append((index, build(item)))
+        except ValueError as e:
+            results.append({'index': index, 'status': 400, 'error': str(e)})
+    return valid, results
+
+
+def insert_chunks(valid, job, id_name, *args):
+    """Insert validated items ``CHUNK_SIZE`` at a time with ``writer.run(job, rows, *args)``.
+
+    ``job`` returns the new ids in row order. Returns one result per item;
+    every item of a chunk whose transaction fails gets a 500 (or 429 when
+    the write queue is full) and later chunks are still attempted.
+    """
+    results = []
+    for start in range(0, len(valid), CHUNK_SIZE):
+        chunk = valid[start:start + CHUNK_SIZE]
+        try:
+            ids = writer.run(job, [row for _, row in chunk], *args)
+        except WriterBusy:
+            results += [{'index': index, 'status': 429, 'error': 'Too many writes in progress, please retry shortly'}
+                        for index, _ in chunk]
+        except Exception as e:
+            results += [{'index': index, 'status': 500, 'error': str(e)} for index, _ in chunk]
+        else:
+            results += [{'index': index, 'status': 201, id_name: new_id} for (index, _), new_id in zip(chunk, ids)]
+    return results
+
+
+def batch_response(results):
+    """201 when every item was created, 207 when only some were, otherwise the items' common error status."""
+    results.sort(key=lambda result: result['index'])
+    created = sum(result['status'] == 201 for result in results)
+    failed = len(results) - created
+    if not failed:
+        status = 201
+    elif created:
+        status = 207
+    else:
+        statuses = {result['status'] for result in results}
+        status = statuses.pop() if len(statuses) == 1 else 500
+    return jsonify({'created': created, 'failed': failed, 'results': results}), status
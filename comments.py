@@ -0,0 +1,112 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload
+from models import db, Comment
+
+# Ten digits per level keep lexicographic path order equal to numeric id order
+SEGMENT_WIDTH = 10
+MAX_DEPTH = 32
+
+# Bounds of the pruned thread view: replies per comment, levels below the
+# top-level comments, and comments returned in total
+DEFAULT_REPLIES = 3
+MAX_REPLIES = 10
+DEFAULT_TREE_DEPTH = 2
+MAX_TREE_DEPTH = 3
+MAX_TREE_COMMENTS = 1000
+
+
+class CommentError(ValueError):
+    pass
+
+
+def segment(comment_id):
+    return f'{comment_id:0{SEGMENT_WIDTH}d}/'
+
+
+def subtree_range(path):
+    """Bounds of the paths strictly below ``path``: every one starts with it, and '0' sorts right after '/'."""
+    return Comment.path > path, Comment.path < path[:-1] + '0'
+
+
+def add(post_id, author_id, content, parent_id=None):
+    """Insert a comment (or reply) in the current transaction and return it.
+
+    A reply claims its position by atomically bumping the parent's
+    ``reply_count``; the same UPDATE ... RETURNING reads the parent's path,
+    so adding a reply costs one UPDATE and the INSERT. Raises
+    ``LookupError`` when the parent is not a comment on ``post_id`` and
+    ``CommentError`` when the thread is already ``MAX_DEPTH`` deep.
+    """
+    prefix, depth, position = '', 0, 0
+    if parent_id is not None:
+        parent = db.session.execute(
+            update(Comment)
+            .where(Comment.comment_id == parent_id, Comment.post_id == post_id)
+            .values(reply_count=Comment.reply_count + 1)
+            .returning(Comment.path, Comment.depth, Comment.reply_count)
+        ).first()
+        if parent is None:
+            raise LookupError('Parent comment not found on this post')
+        if parent.depth + 1 >= MAX_DEPTH:
+            raise CommentError(f'Replies can be nested at most {MAX_DEPTH} levels deep')
+        prefix, depth, position = parent.path, parent.depth + 1, parent.reply_count
+
+    comment = Comment(post_id=post_id, parent_id=parent_id, author_id=author_id, content=content,
+                      path=prefix, depth=depth, position=position)
+    db.session.add(comment)
+    # The path ends with the comment's own id, which is only known after the INSERT
+    db.session.flush()
+    comment.path = prefix + segment(comment.comment_id)
+    return comment
+
+
+def _comments():
+    return select(Comment).options(joinedload(Comment.author))
+
+
+def page(post_id, limit, after=None, root_path=None):
+    """Return up to ``limit`` comments of a post in depth-first thread order.
+
+    This is one range scan of ``ix_comments_post_path``: ``root_path``
+    narrows it to the replies below one comment and ``after`` is the path
+    of the last comment of the previous page.
+    """
+    statement = _comments().where(Comment.post_id == post_id)
+    if root_path is not None:
+        statement = statement.where(*subtree_range(root_path))
+    if after is not None:
+        statement = statement.where(Comment.path > after)
+    return db.session.scalars(statement.order_by(Comment.path).limit(limit)).all()
+
+
+def tree(post_id, limit, after=None, replies=DEFAULT_REPLIES, depth=DEFAULT_TREE_DEPTH):
+    """Return ``limit`` top-level comments with their first ``replies`` replies, ``depth`` levels down.
+
+    A path range scan would have to step over every pruned reply, so this
+    reads one level per query instead: the top-level comments from
+    ``ix_comments_post_depth_path``, then each level's first replies from
+    ``ix_comments_parent_position``. Every query touches at most
+    ``replies`` rows per parent and ``MAX_TREE_COMMENTS`` in total. The
+    result is in depth-first thread order like ``page``; ``after`` is the
+    path of the last top-level comment of the previous page.
+    """
+    statement = _comments().where(Comment.post_id == post_id, Comment.depth == 0)
+    if after is not None:
+        statement = statement.where(Comment.path > after)
+    top_level = db.session.scalars(statement.order_by(Comment.path).limit(limit)).all()
+
+    found, parents = list(top_level), [c.comment_id for c in top_level if c.reply_count]
+    for _ in range(depth):
+        remaining = MAX_TREE_COMMENTS - len(found)
+        if not parents or remaining <= 0:
+            break
+        level = db.session.scalars(
+            _comments()
+            .where(Comment.parent_id.in_(parents), Comment.position <= replies)
+            .order_by(Comment.path).limit(remaining)
+        ).all()
+        found.extend(level)
+        parents = [c.comment_id for c in level if c.reply_count]
+
+    found.sort(key=lambda c: c.path)
+    return top_level, found
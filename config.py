@@ -1,6 +1,86 @@
 import os
 
+
+def _flag(name, default=''):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///db.sqlite3')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 'tuned' applies the SQLite / PostgreSQL engine profile in engines.py; 'default' keeps SQLAlchemy's defaults
+    DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'tuned')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    # Single writer thread with group commit for SQLite; unset means on for SQLite files, off otherwise
+    WRITE_QUEUE_ENABLED = _flag('WRITE_QUEUE_ENABLED') if os.getenv('WRITE_QUEUE_ENABLED') else None
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
+
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your_secret_key')
+    JWT_TOKEN_LOCATION = ['headers']
+    JWT_HEADER_NAME = 'Authorization'
+    JWT_HEADER_TYPE = 'Bearer'
+
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 4 * PASSWORD_HASH_WORKERS))
+
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+    QUERY_BUDGET_RAISE = _flag('QUERY_BUDGET_RAISE')
+
+    # Neighbourhoods too large for fan-out on write; their feeds are assembled on read
+    FEED_READ_TIME_NEIGHBORHOODS = {n.strip() for n in os.getenv('FEED_READ_TIME_NEIGHBORHOODS', '').split(',') if n.strip()}
+    # User ids of the admin and data-sync clients allowed to stream whole tables from the export endpoints
+    EXPORT_CLIENT_IDS = {n.strip() for n in os.getenv('EXPORT_CLIENT_IDS', '').split(',') if n.strip()}
+    # Redis-compatible server relaying live updates between workers; unset keeps them in-process
+    PUBSUB_URL = os.getenv('PUBSUB_URL') or None
+    SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 256))
+    # Worker processes serving the app; gunicorn and uvicorn read the same variable as their default worker count
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+    # Rendered GET responses: memory:// (one worker), file:///dir (one host) or redis://... (every host).
+    # Unset means on, except memory:// under WEB_CONCURRENCY > 1, where workers would miss each other's writes
+    RESPONSE_CACHE_ENABLED = _flag('RESPONSE_CACHE_ENABLED') if os.getenv('RESPONSE_CACHE_ENABLED') else None
+    RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL', 'memory://')
+    # asyncio driver URL for the ASGI entry point (asgi.py); derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or None
+
+    # "New event in your neighbourhood" emails, sent by `flask jobs work` in batches of NOTIFY_BATCH_SIZE
+    MAIL_NOTIFICATIONS = _flag('MAIL_NOTIFICATIONS')
+    NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 500))
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 25))
+    MAIL_USE_TLS = _flag('MAIL_USE_TLS')
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME') or None
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD') or None
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@localhost')
+    # Background job queue (jobs.py): a SQLite file, by default jobs.sqlite3 in the instance folder
+    JOB_QUEUE_DATABASE = os.getenv('JOB_QUEUE_DATABASE') or None
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    pass
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_HASH_MAX_PENDING = 1
+    # Fail loudly on N+1 regressions
+    QUERY_BUDGET_RAISE = True
+
+
+# Selected with APP_CONFIG when create_app() is not given a configuration
+configs = {
+    'default': Config,
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
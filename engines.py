@@ -0,0 +1,115 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+SQLITE_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class EngineProfile:
+    """Engine options and per-connection settings tuned for the configured database.
+
+    ``DATABASE_PROFILE = 'tuned'`` (the default) gives SQLite a
+    write-ahead log, ``synchronous=NORMAL`` (durable across application
+    crashes; a power loss may only drop the last commits), a memory-mapped
+    read path and a busy timeout, so readers never block the writer and a
+    contended writer waits instead of failing with "database is locked".
+    PostgreSQL gets a sized ``QueuePool`` that pings and recycles its
+    connections, a larger compiled-statement cache and, with psycopg 3,
+    server-side prepared statements. ``'default'`` leaves SQLAlchemy's
+    defaults alone. Explicit ``SQLALCHEMY_ENGINE_OPTIONS`` always win.
+
+    ``init_app`` must run before ``db.init_app``, which creates the engines.
+    """
+
+    def __init__(self, app=None):
+        self.pragmas = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_PROFILE', 'tuned')
+        app.config.setdefault('DB_POOL_SIZE', 10)
+        app.config.setdefault('DB_MAX_OVERFLOW', 20)
+        app.config.setdefault('DB_POOL_TIMEOUT', 30)
+        app.config.setdefault('DB_POOL_RECYCLE', 1800)
+        app.config.setdefault('DB_STATEMENT_CACHE_SIZE', 1200)
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 16 * 1024)
+
+        profile = app.config['DATABASE_PROFILE']
+        if profile not in ('tuned', 'default'):
+            raise ValueError(f"Unsupported DATABASE_PROFILE: {profile} (expected 'tuned' or 'default')")
+
+        self.profile = profile
+        self.pragmas = ()
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        if profile == 'tuned':
+            if url.get_backend_name() == 'sqlite':
+                options = self._sqlite_options(app.config, url)
+            elif url.get_backend_name() == 'postgresql':
+                options = self._postgresql_options(app.config, url)
+            else:
+                options = {}
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+        if not event.contains(Engine, 'connect', _on_connect):
+            event.listen(Engine, 'connect', _on_connect)
+        app.extensions['engine_profile'] = self
+
+    def _sqlite_options(self, config, url):
+        synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+        if synchronous not in SQLITE_SYNCHRONOUS:
+            raise ValueError(f'Unsupported SQLITE_SYNCHRONOUS: {synchronous}')
+        pragmas = [
+            f'synchronous={synchronous}',
+            f"mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+            # Negative cache_size is in KiB rather than pages
+            f"cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        ]
+        if url.database and url.database != ':memory:':
+            # Stored in the database file, but setting it again per connection is a no-op
+            pragmas.insert(0, 'journal_mode=WAL')
+        self.pragmas = tuple(pragmas)
+
+        # pysqlite's timeout is SQLite's busy timeout: how long a writer waits for the lock
+        options = {'connect_args': {'timeout': int(config['SQLITE_BUSY_TIMEOUT_MS']) / 1000}}
+        if url.database and url.database != ':memory:':
+            # In-memory databases use a single shared connection instead of a pool
+            options.update(pool_size=int(config['DB_POOL_SIZE']), max_overflow=int(config['DB_MAX_OVERFLOW']),
+                           pool_timeout=float(config['DB_POOL_TIMEOUT']))
+        return options
+
+    def _postgresql_options(self, config, url):
+        options = {
+            'pool_size': int(config['DB_POOL_SIZE']),
+            'max_overflow': int(config['DB_MAX_OVERFLOW']),
+            'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+            # Drop connections the server or a proxy closed, and replace them before idle timeouts hit
+            'pool_pre_ping': True,
+            'pool_recycle': int(config['DB_POOL_RECYCLE']),
+            'query_cache_size': int(config['DB_STATEMENT_CACHE_SIZE']),
+        }
+        if url.get_driver_name() == 'psycopg':
+            # Prepare statements server-side after their fifth execution on a connection
+            options['connect_args'] = {'prepare_threshold': 5}
+        return options
+
+    def configure_sqlite(self, dbapi_connection):
+        """Apply the profile's PRAGMAs to a new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in self.pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+        finally:
+            cursor.close()
+
+
+engine_profile = EngineProfile()
+
+
+def _on_connect(dbapi_connection, connection_record):
+    if engine_profile.pragmas and isinstance(dbapi_connection, sqlite3.Connection):
+        engine_profile.configure_sqlite(dbapi_connection)
@@ -0,0 +1,71 @@
+import functools
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from models import db
+
+EXPORT_BATCH_SIZE = 1000
+FLUSH_BYTES = 64 * 1024
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def export_client_required(view):
+    """Limit ``view`` to the clients listed in ``EXPORT_CLIENT_IDS``; stack it under ``@jwt_required()``."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if str(get_jwt_identity()) not in current_app.config.get('EXPORT_CLIENT_IDS', ()):
+            return jsonify({"error": "Exports are limited to admin and data-sync clients"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def export_format():
+    """Pick the export format from ``?format=`` or the Accept header."""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt if fmt in FORMATS else None
+    if request.accept_mimetypes.best_match(list(FORMATS.values())) == FORMATS['ndjson']:
+        return 'ndjson'
+    return 'json'
+
+
+def stream_rows(statement, serialize, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Stream every row of ``statement`` as NDJSON or a chunked JSON array.
+
+    Rows are fetched ``batch_size`` at a time through a server-side cursor and
+    encoded one by one, so memory stays flat no matter how large the table is.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        result = db.session.execute(
+            statement.execution_options(yield_per=batch_size, stream_results=True)
+        )
+        buffer = ['['] if fmt == 'json' else []
+        size = 0
+        first = True
+        try:
+            for row in result:
+                encoded = dumps(serialize(row))
+                if fmt == 'json':
+                    buffer.append(encoded if first else ',' + encoded)
+                else:
+                    buffer.append(encoded + '\n')
+                first = False
+                size += len(encoded) + 1
+                if size >= FLUSH_BYTES:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+        finally:
+            result.close()
+        if fmt == 'json':
+            buffer.append(']')
+        if buffer:
+            yield ''.join(buffer)
+
+    return Response(stream_with_context(generate()), mimetype=FORMATS[fmt])
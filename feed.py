@@ -0,0 +1,111 @@
+from flask import current_app
+from sqlalchemy import insert, literal, select, tuple_, union_all
+from sqlalchemy.orm import joinedload
+from models import db, Event, FeedItem, Post, User
+from pubsub import broker
+
+
+def reads_on_demand(neighborhood):
+    """Very large neighbourhoods skip fan-out on write and are assembled on read."""
+    return neighborhood in current_app.config.get('FEED_READ_TIME_NEIGHBORHOODS', ())
+
+
+def fan_out(kind, ref_id, neighborhood, created_at, session=None):
+    """Add a feed row for a new post or event in the current transaction (of ``session``, if given)."""
+    if not neighborhood or reads_on_demand(neighborhood):
+        return
+    (session or db.session).add(FeedItem(neighborhood=neighborhood, kind=kind, ref_id=ref_id, created_at=created_at))
+
+
+def fan_out_many(kind, refs, neighborhood, session=None):
+    """Add feed rows for many new posts or events, given as ``(ref_id, created_at)`` pairs, in one multi-row INSERT."""
+    if not refs or not neighborhood or reads_on_demand(neighborhood):
+        return
+    (session or db.session).execute(insert(FeedItem), [
+        {'neighborhood': neighborhood, 'kind': kind, 'ref_id': ref_id, 'created_at': created_at}
+        for ref_id, created_at in refs
+    ])
+
+
+def channel(neighborhood):
+    return f'neighborhood:{neighborhood}'
+
+
+def announce(kind, payload, neighborhood, session=None):
+    """Push a new post or event to the neighbourhood's live stream once the current transaction commits."""
+    if not neighborhood:
+        return
+    broker.publish_after_commit(session or db.session, channel(neighborhood), kind, current_app.json.dumps(payload))
+
+
+def remove(kind, ref_id):
+    """Delete the feed rows for a post or event in the current transaction."""
+    db.session.execute(
+        db.delete(FeedItem).where(FeedItem.kind == kind, FeedItem.ref_id == ref_id)
+    )
+
+
+def backfill(first_post_id=1, first_event_id=1):
+    """Fan out posts and events from the given ids upward with two INSERT ... SELECT statements."""
+    skipped = tuple(current_app.config.get('FEED_READ_TIME_NEIGHBORHOODS', ()))
+    columns = ['neighborhood', 'kind', 'ref_id', 'created_at']
+    sources = (
+        select(User.neighborhood, literal('post'), Post.post_id, Post.timestamp)
+        .join(User, Post.created_by_id == User.user_id)
+        .where(Post.post_id >= first_post_id, Post.timestamp.isnot(None)),
+        select(User.neighborhood, literal('event'), Event.event_id, Event.created_at)
+        .join(User, Event.organizer_id == User.user_id)
+        .where(Event.event_id >= first_event_id, Event.created_at.isnot(None)),
+    )
+    for source in sources:
+        source = source.where(User.neighborhood.isnot(None), User.neighborhood.notin_(skipped))
+        db.session.execute(insert(FeedItem).from_select(columns, source))
+
+
+def _on_read_entries(neighborhood):
+    posts = (
+        select(literal('post').label('kind'), Post.post_id.label('ref_id'), Post.timestamp.label('created_at'))
+        .join(User, Post.created_by_id == User.user_id)
+        .where(User.neighborhood == neighborhood)
+    )
+    events = (
+        select(literal('event').label('kind'), Event.event_id.label('ref_id'), Event.created_at.label('created_at'))
+        .join(User, Event.organizer_id == User.user_id)
+        .where(User.neighborhood == neighborhood)
+    )
+    return union_all(posts, events).subquery()
+
+
+def read_page(neighborhood, limit, after=None):
+    """Return up to ``limit`` ``(kind, ref_id, created_at)`` entries, newest first.
+
+    ``after`` is the ``(created_at, kind, ref_id)`` key of the last entry of
+    the previous page. Both the materialized table and the on-read union are
+    ordered by the same key, so cursors stay valid whichever path serves them.
+    """
+    if reads_on_demand(neighborhood):
+        source = _on_read_entries(neighborhood)
+        columns = source.c
+        statement = select(columns.kind, columns.ref_id, columns.created_at).where(columns.created_at.isnot(None))
+    else:
+        columns = FeedItem.__table__.c
+        statement = select(columns.kind, columns.ref_id, columns.created_at).where(columns.neighborhood == neighborhood)
+
+    if after is not None:
+        statement = statement.where(tuple_(columns.created_at, columns.kind, columns.ref_id) < tuple_(*after))
+
+    statement = statement.order_by(
+        columns.created_at.desc(), columns.kind.desc(), columns.ref_id.desc()
+    ).limit(limit)
+    return db.session.execute(statement).all()
+
+
+def hydrate(entries):
+    """Load the posts and events behind ``(kind, ref_id)`` entries with one query per kind."""
+    post_ids = [entry.ref_id for entry in entries if entry.kind == 'post']
+    event_ids = [entry.ref_id for entry in entries if entry.kind == 'event']
+    posts = {p.post_id: p for p in Post.query.filter(Post.post_id.in_(post_ids))} if post_ids else {}
+    events = {
+        e.event_id: e for e in Event.query.options(joinedload(Event.organizer)).filter(Event.event_id.in_(event_ids))
+    } if event_ids else {}
+    return posts, events
@@ -0,0 +1,262 @@
+import math
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import bindparam, event, text
+from models import db
+
+NearbyHit = namedtuple('NearbyHit', ['event_id', 'distance_km'])
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+# Each ring of a proximity search covers 16x the area of the one inside it
+RING_GROWTH = 4
+MAX_RINGS = 3
+MIN_RING_KM = 2
+
+# SQLite: an R*Tree over the events that have coordinates, with the event date as an auxiliary
+# column so a radius query is answered from the R*Tree alone. Triggers keep it in sync.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS events_geo USING rtree(
+        event_id, min_lat, max_lat, min_lng, max_lng, +date
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_insert AFTER INSERT ON events
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO events_geo VALUES (new.event_id, new.latitude, new.latitude, new.longitude, new.longitude, new.date);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_update AFTER UPDATE OF latitude, longitude, date ON events BEGIN
+        DELETE FROM events_geo WHERE event_id = old.event_id;
+        INSERT INTO events_geo SELECT new.event_id, new.latitude, new.latitude, new.longitude, new.longitude, new.date
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_delete AFTER DELETE ON events BEGIN
+        DELETE FROM events_geo WHERE event_id = old.event_id;
+    END""",
+]
+
+# PostgreSQL: a B-tree over the geohash, so the cells covering a radius are a handful of prefix range scans.
+POSTGRESQL_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_events_geohash ON events (geohash text_pattern_ops)",
+]
+
+DDL = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}
+
+SQLITE_BACKFILL = """INSERT INTO events_geo
+    SELECT event_id, latitude, latitude, longitude, longitude, date FROM events
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL"""
+
+SQLITE_INSERT_TRIGGER = 'events_geo_insert'
+
+
+@event.listens_for(db.metadata, 'after_create')
+def install(target, connection, **kw):
+    """Create the spatial index alongside ``db.create_all()``."""
+    for statement in DDL.get(connection.dialect.name, ()):
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def uninstall(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("DROP TABLE IF EXISTS events_geo"))
+
+
+@contextmanager
+def deferred_indexing(first_event_id):
+    """Index events inserted inside the block in one pass instead of row by row (see ``search.deferred_indexing``)."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        yield
+        return
+
+    db.session.execute(text(f"DROP TRIGGER IF EXISTS {SQLITE_INSERT_TRIGGER}"))
+    db.session.commit()
+    try:
+        yield
+    finally:
+        db.session.rollback()
+        db.session.execute(text(SQLITE_BACKFILL + " AND event_id >= :first_event"), {'first_event': first_event_id})
+        for statement in SQLITE_DDL:
+            if SQLITE_INSERT_TRIGGER in statement:
+                db.session.execute(text(statement))
+        db.session.commit()
+
+
+def parse_coordinates(latitude, longitude):
+    """Validate an optional ``(latitude, longitude)`` pair; returns floats or ``(None, None)``.
+
+    Raises ``ValueError`` with a client-facing message when only one is
+    given or either is out of range.
+    """
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    if latitude in (None, '') or longitude in (None, ''):
+        raise ValueError("latitude and longitude must be given together")
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must be numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("latitude must be within [-90, 90] and longitude within [-180, 180]")
+    return latitude, longitude
+
+
+def geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a point as a geohash; a shared prefix means a shared cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lng_scale(latitude):
+    # Kilometres per degree of longitude shrink with the cosine of the latitude
+    return max(math.cos(math.radians(latitude)), 1e-6)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """``(south, north, [(west, east), ...])`` around a circle; two longitude ranges when it crosses ±180°."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * _lng_scale(latitude))
+    south, north = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    if dlng >= 180 or north >= 90 or south <= -90:
+        return south, north, [(-180.0, 180.0)]
+    west, east = longitude - dlng, longitude + dlng
+    if west < -180:
+        return south, north, [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return south, north, [(west, 180.0), (-180.0, east - 360)]
+    return south, north, [(west, east)]
+
+
+def _cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell with ``precision`` characters."""
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** (5 * precision - lat_bits)
+
+
+def _geohash_cells(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together cover the circle."""
+    south, north, ranges = bounding_box(latitude, longitude, radius_km)
+    height, width = north - south, max(east - west for west, east in ranges)
+
+    def covers(precision):
+        cell_height, cell_width = _cell_size(precision)
+        return cell_height >= height and cell_width >= width
+
+    if not covers(1):
+        # Only near the poles, where the box spans every longitude
+        return ['']
+    # The longest prefix whose cells are at least as large as the box, so its corners fall in at most 4 cells
+    precision = 1
+    while precision < GEOHASH_PRECISION and covers(precision + 1):
+        precision += 1
+    return sorted({geohash(lat, lng, precision) for lat in (south, north)
+                   for west, east in ranges for lng in (west, east)})
+
+
+def _sqlite_nearby(latitude, longitude, radius_km, start, end, limit):
+    south, north, ranges = bounding_box(latitude, longitude, radius_km)
+    boxes = " OR ".join(f"(min_lng <= :east{i} AND max_lng >= :west{i})" for i in range(len(ranges)))
+    params = {'lat': latitude, 'lng': longitude, 'k2': _lng_scale(latitude) ** 2,
+              'north': north, 'south': south, 'r2': (radius_km / KM_PER_DEGREE) ** 2, 'limit': limit}
+    for i, (west, east) in enumerate(ranges):
+        params[f'west{i}'], params[f'east{i}'] = west, east
+    filters, bind = [], []
+    if start is not None:
+        filters.append("date >= :start")
+        bind.append(bindparam('start', start, type_=db.DateTime))
+    if end is not None:
+        filters.append("date < :end")
+        bind.append(bindparam('end', end, type_=db.DateTime))
+
+    # Equirectangular distance, in degrees of latitude: plain arithmetic on the R*Tree columns, and
+    # exact enough to filter and rank by at these distances. It breaks down across the antimeridian,
+    # where the few rows in the box are ranked by haversine instead.
+    exact = len(ranges) > 1
+    sql = (
+        "SELECT event_id, min_lat, min_lng, "
+        "(min_lat - :lat) * (min_lat - :lat) + (min_lng - :lng) * (min_lng - :lng) * :k2 AS d2 "
+        f"FROM events_geo WHERE min_lat <= :north AND max_lat >= :south AND ({boxes})"
+    )
+    sql += "".join(f" AND {condition}" for condition in filters)
+    if not exact:
+        sql += " AND d2 <= :r2 ORDER BY d2, date, event_id LIMIT :limit"
+    rows = db.session.execute(text(sql).bindparams(*bind), params)
+    hits = [NearbyHit(event_id, distance_km(latitude, longitude, lat, lng)) for event_id, lat, lng, _ in rows]
+    if exact:
+        hits = sorted((hit for hit in hits if hit.distance_km <= radius_km), key=lambda hit: hit.distance_km)[:limit]
+    return hits
+
+
+def _postgresql_nearby(latitude, longitude, radius_km, start, end, limit):
+    cells = _geohash_cells(latitude, longitude, radius_km)
+    prefixes = " OR ".join(f"geohash LIKE :cell{i}" for i in range(len(cells)))
+    sql = (
+        "SELECT event_id, d FROM (SELECT event_id, date, 2 * :earth * asin(least(1, sqrt("
+        "power(sin(radians(latitude - :lat) / 2), 2) + "
+        "cos(radians(:lat)) * cos(radians(latitude)) * power(sin(radians(longitude - :lng) / 2), 2)))) AS d "
+        f"FROM events WHERE ({prefixes})"
+    )
+    params = {'earth': EARTH_RADIUS_KM, 'lat': latitude, 'lng': longitude, 'radius': radius_km, 'limit': limit}
+    params.update({f'cell{i}': f'{cell}%' for i, cell in enumerate(cells)})
+    if start is not None:
+        sql += " AND date >= :start"
+        params['start'] = start
+    if end is not None:
+        sql += " AND date < :end"
+        params['end'] = end
+    sql += ") nearby WHERE d <= :radius ORDER BY d, date, event_id LIMIT :limit"
+    return [NearbyHit(event_id, float(d)) for event_id, d in db.session.execute(text(sql), params)]
+
+
+def rings(radius_km):
+    """Radii to search in turn: up to ``MAX_RINGS``, growing ``RING_GROWTH``-fold to ``radius_km``, none under ``MIN_RING_KM``."""
+    radii = [radius_km]
+    while len(radii) < MAX_RINGS and radii[0] / RING_GROWTH >= MIN_RING_KM:
+        radii.insert(0, radii[0] / RING_GROWTH)
+    return radii
+
+
+def nearby(latitude, longitude, radius_km, start=None, end=None, limit=50):
+    """Return ``NearbyHit`` rows for events within ``radius_km``, nearest first, then by date.
+
+    The index can only fetch everything in a box, so large radii are
+    searched in growing rings: once an inner ring holds ``limit`` events,
+    they are the nearest ones and the rest of the circle is never read.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        search = _sqlite_nearby
+    elif dialect == 'postgresql':
+        search = _postgresql_nearby
+    else:
+        raise NotImplementedError(f'Proximity search is not supported on {dialect}')
+    for radius in rings(radius_km):
+        hits = search(latitude, longitude, radius, start, end, limit)
+        if len(hits) >= limit:
+            break
+    return hits
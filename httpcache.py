@@ -0,0 +1,361 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from caching import TTLCache
+
+
+class CachedResponse:
+    """A rendered 200 response: body bytes plus what is needed to replay and validate it."""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified')
+
+    def __init__(self, body, mimetype, etag, last_modified):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def pack(self):
+        header = json.dumps([self.mimetype, self.etag, self.last_modified]).encode('utf-8')
+        return header + b'\n' + self.body
+
+    @classmethod
+    def unpack(cls, data):
+        header, body = data.split(b'\n', 1)
+        mimetype, etag, last_modified = json.loads(header)
+        return cls(body, mimetype, etag, last_modified)
+
+
+class MemoryBackend:
+    """Entries in a per-process LRU; tag versions are plain counters.
+
+    Invalidations only reach the process that made them, so this is only
+    correct with a single worker.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self._entries = TTLCache(maxsize, ttl)
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions[tag] for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] += 1
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries.set(key, entry)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class FilesystemBackend:
+    """Entries and tag versions as files in one directory, shared by every worker on the host.
+
+    Each write goes to a temporary file that is renamed into place, so
+    readers never see a partial entry. A version is a random token rather
+    than a counter so concurrent bumps need no lock. Expired entries are
+    swept every ``prune_every`` writes.
+    """
+
+    prune_every = 256
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(os.path.join(directory, 'tags'), exist_ok=True)
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _tag_path(self, tag):
+        return os.path.join(self.directory, 'tags', hashlib.blake2b(tag.encode(), digest_size=16).hexdigest())
+
+    def versions(self, tags):
+        versions = []
+        for tag in tags:
+            try:
+                with open(self._tag_path(tag), 'rb') as f:
+                    versions.append(f.read().decode())
+            except FileNotFoundError:
+                versions.append('')
+        return versions
+
+    def bump(self, tags):
+        for tag in tags:
+            self._write(self._tag_path(tag), uuid.uuid4().hex.encode())
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            if os.stat(path).st_mtime + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return CachedResponse.unpack(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        self._write(os.path.join(self.directory, key), entry.pack())
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired entries, including ones left unreachable by later invalidations."""
+        cutoff = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
+
+
+class RedisBackend:
+    """Entries and tag versions in a Redis-compatible server shared by every worker.
+
+    Entries expire through Redis TTLs; versions are ``INCR`` counters read
+    with one ``MGET``. Needs the optional ``redis`` package.
+    """
+
+    prefix = 'neighborhood-social:http:'
+
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('A redis:// RESPONSE_CACHE_URL requires the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def versions(self, tags):
+        return self._client.mget([self.prefix + 'tag:' + tag for tag in tags]) if tags else []
+
+    def bump(self, tags):
+        pipeline = self._client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(self.prefix + 'tag:' + tag)
+        pipeline.execute()
+
+    def get(self, key):
+        data = self._client.get(self.prefix + key)
+        return CachedResponse.unpack(data) if data is not None else None
+
+    def set(self, key, entry):
+        self._client.set(self.prefix + key, entry.pack(), ex=max(1, int(self.ttl)))
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+def create_backend(url, maxsize, ttl):
+    """Pick a backend from ``RESPONSE_CACHE_URL``: ``memory://``, ``file:///some/dir`` or ``redis://...``."""
+    scheme = urlsplit(url).scheme
+    if scheme == 'memory':
+        return MemoryBackend(maxsize, ttl)
+    if scheme == 'file':
+        return FilesystemBackend(urlsplit(url).path, ttl)
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisBackend(url, ttl)
+    raise ValueError(f'Unsupported RESPONSE_CACHE_URL: {url}')
+
+
+class ResponseCache:
+    """Caches rendered GET responses and answers conditional requests from the cache.
+
+    Views opt in with ``@responses.cached(*tags)``. A response is keyed by
+    endpoint, view arguments, query string and any ``vary`` values, plus
+    the current version of each of its tags; writes bump those versions
+    with ``invalidate_after_commit`` instead of finding and deleting keys,
+    so stale entries simply stop being reachable and age out. Every cached
+    response carries a strong ``ETag`` (a hash of its body) and
+    ``Last-Modified``; a matching ``If-None-Match`` is answered with 304
+    from the cache without running the view or touching the database.
+
+    ``RESPONSE_CACHE_ENABLED`` defaults to on, except for the ``memory://``
+    backend when ``WEB_CONCURRENCY`` says more than one worker is serving.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self.enabled = False
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', None)
+        app.config.setdefault('RESPONSE_CACHE_URL', 'memory://')
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 2048)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        app.config.setdefault('WEB_CONCURRENCY', 1)
+
+        enabled = app.config['RESPONSE_CACHE_ENABLED']
+        # memory:// never hears about other workers' writes; they would serve stale pages for up to the TTL
+        per_process = urlsplit(app.config['RESPONSE_CACHE_URL']).scheme == 'memory'
+        workers = int(app.config['WEB_CONCURRENCY'])
+        if enabled is None:
+            enabled = not per_process or workers <= 1
+        elif enabled and per_process and workers > 1:
+            app.logger.warning('RESPONSE_CACHE_URL=memory:// with WEB_CONCURRENCY=%d: responses can stay stale for '
+                               'up to RESPONSE_CACHE_TTL after writes in other workers; use file:// or redis://',
+                               workers)
+
+        self.enabled = bool(enabled)
+        self.backend = create_backend(app.config['RESPONSE_CACHE_URL'], int(app.config['RESPONSE_CACHE_SIZE']),
+                                      float(app.config['RESPONSE_CACHE_TTL']))
+        if not event.contains(Session, 'after_commit', _invalidate_pending):
+            event.listen(Session, 'after_commit', _invalidate_pending)
+            event.listen(Session, 'after_rollback', _discard_pending)
+        app.extensions['response_cache'] = self
+
+    def cached(self, *tags, private=False, **vary):
+        """Cache a GET view's 200 responses until one of ``tags`` is invalidated.
+
+        Tags are formatted with the view arguments and ``vary`` values, e.g.
+        ``'comments:{post_id}'``. Each ``vary`` callable is evaluated per
+        request and becomes part of the key; stack the decorator below
+        ``@jwt_required`` when it reads ``current_user``, and pass
+        ``private=True`` for responses that depend on who is asking.
+        """
+        cache_control = 'private, no-cache' if private else 'no-cache'
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.enabled:
+                    return view(**kwargs)
+
+                values = {name: resolve() for name, resolve in vary.items()}
+                key, response = self.lookup(request.endpoint, kwargs, request.args.items(multi=True), tags,
+                                            cache_control, request, values)
+                if response is None:
+                    response = self.store(request.endpoint, key, current_app.make_response(view(**kwargs)),
+                                          cache_control, request)
+                return response
+            return wrapper
+        return decorator
+
+    def lookup(self, endpoint, view_args, query_items, tags, cache_control, conditional, values=None):
+        """Return ``(key, response)``: the cached response (or a 304) for a request, or None on a miss.
+
+        ``conditional`` is the request (or WSGI environ) whose
+        ``If-None-Match`` / ``If-Modified-Since`` headers are honoured. Tag
+        versions are read here, before the view runs, so whatever the view
+        then renders under ``key`` is at least as fresh as they are.
+        """
+        values = values or {}
+        versions = self.backend.versions([tag.format(**view_args, **values) for tag in tags])
+        parts = [endpoint, sorted(view_args.items()), sorted(query_items), sorted(values.items()),
+                 [str(v) for v in versions]]
+        key = hashlib.blake2b(json.dumps(parts, default=str).encode('utf-8'), digest_size=20).hexdigest()
+        entry = self.backend.get(key)
+        if entry is None:
+            return key, None
+        response = self._replay(entry, cache_control, conditional)
+        self.record(endpoint, 'hits' if response.status_code == 200 else 'not_modified', len(entry.body))
+        return key, response
+
+    def store(self, endpoint, key, response, cache_control, conditional):
+        """Cache a freshly rendered response under ``key``; returns what to send (possibly a 304)."""
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        body = response.get_data()
+        entry = CachedResponse(body, response.mimetype,
+                               hashlib.blake2b(body, digest_size=16).hexdigest(), int(time.time()))
+        self.backend.set(key, entry)
+        response = self._replay(entry, cache_control, conditional)
+        self.record(endpoint, 'misses' if response.status_code == 200 else 'not_modified', len(body))
+        return response
+
+    def _replay(self, entry, cache_control, conditional):
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.last_modified = datetime.fromtimestamp(entry.last_modified, timezone.utc)
+        response.headers['Cache-Control'] = cache_control
+        # Turns the response into a bodiless 304 when If-None-Match / If-Modified-Since match
+        return response.make_conditional(conditional)
+
+    def record(self, endpoint, outcome, size):
+        """Count a ``hits``, ``misses`` or ``not_modified`` outcome of a ``size``-byte response."""
+        with self._lock:
+            counters = self._counters[endpoint or 'unknown']
+            counters[outcome] += 1
+            if outcome == 'not_modified':
+                counters['bytes_saved'] += size
+
+    def invalidate(self, *tags):
+        """Make every cached response tagged with any of ``tags`` unreachable now."""
+        if tags and self.backend is not None:
+            self.backend.bump(tags)
+
+    def invalidate_after_commit(self, session, *tags):
+        """Invalidate once ``session`` commits, so a rolled-back write keeps the cache warm."""
+        session.info.setdefault('response_cache_pending', []).append((self, tags))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = {endpoint: dict(counts) for endpoint, counts in self._counters.items()}
+        stats = {}
+        for endpoint, counts in counters.items():
+            hits, misses, not_modified = counts.get('hits', 0), counts.get('misses', 0), counts.get('not_modified', 0)
+            served = hits + misses + not_modified
+            stats[endpoint] = {
+                'hits': hits,
+                'misses': misses,
+                'not_modified': not_modified,
+                'bytes_saved': counts.get('bytes_saved', 0),
+                'hit_rate': round((hits + not_modified) / served, 4) if served else 0.0
+            }
+        return stats
+
+
+responses = ResponseCache()
+
+
+def _invalidate_pending(session):
+    for owner, tags in session.info.pop('response_cache_pending', ()):
+        owner.invalidate(*tags)
+
+
+def _discard_pending(session):
+    session.info.pop('response_cache_pending', None)
@@ -0,0 +1,175 @@
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (when ``QUERY_BUDGET_RAISE`` is on) if a route runs more SQL than it declared."""
+
+
+def query_budget(limit):
+    """Declare the maximum number of SQL statements a view may execute per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class Instrumentation:
+    """Per-request SQL accounting hooked into SQLAlchemy engine events.
+
+    Every request gets a query count, total DB time and its slowest
+    statements. They are reported in a ``Server-Timing`` header, aggregated
+    per endpoint for ``/metrics``, and checked against ``@query_budget``.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._queries = defaultdict(int)
+        self._db_seconds = defaultdict(float)
+        self._slow_queries = defaultdict(int)
+        self._budget_violations = defaultdict(int)
+        self._latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self._latency_sum = defaultdict(float)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 100)
+        app.config.setdefault('SLOWEST_STATEMENTS', 3)
+        app.config.setdefault('QUERY_BUDGET_RAISE', False)
+
+        self.app = app
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        self.slowest_kept = int(app.config['SLOWEST_STATEMENTS'])
+        self.raise_on_budget = bool(app.config['QUERY_BUDGET_RAISE'])
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['instrumentation'] = self
+
+    def _start_request(self):
+        g._request_started = time.perf_counter()
+        g._sql_count = 0
+        g._sql_seconds = 0.0
+        g._sql_slowest = []
+
+    def record_query(self, statement, seconds):
+        g._sql_count += 1
+        g._sql_seconds += seconds
+        heapq.heappush(g._sql_slowest, (seconds, statement))
+        if len(g._sql_slowest) > self.slowest_kept:
+            heapq.heappop(g._sql_slowest)
+        if seconds >= self.slow_query_seconds:
+            with self._lock:
+                self._slow_queries[request.endpoint or 'unknown'] += 1
+            self.app.logger.warning('Slow query (%.1fms) on %s: %s', seconds * 1000, request.path, statement)
+
+    def _finish_request(self, response):
+        if '_request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g._request_started
+        endpoint = request.endpoint or 'unknown'
+        count, db_seconds = g._sql_count, g._sql_seconds
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_seconds * 1000:.2f};desc="{count} queries", app;dur={elapsed * 1000:.2f}'
+        )
+
+        with self._lock:
+            self._requests[endpoint] += 1
+            self._queries[endpoint] += count
+            self._db_seconds[endpoint] += db_seconds
+            self._latency_sum[endpoint] += elapsed
+            buckets = self._latency[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+
+        view = self.app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and count > budget:
+            with self._lock:
+                self._budget_violations[endpoint] += 1
+            slowest = '; '.join(statement for _, statement in sorted(g._sql_slowest, reverse=True))
+            message = f'{endpoint} ran {count} queries (budget {budget}). Slowest: {slowest}'
+            if self.raise_on_budget:
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning(message)
+        return response
+
+    def render_prometheus(self, extra=()):
+        """Render the aggregated counters in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}')
+
+        with self._lock:
+            family('http_requests_total', 'counter', 'Requests handled per endpoint.',
+                   [({'endpoint': e}, n) for e, n in self._requests.items()])
+            family('db_queries_total', 'counter', 'SQL statements executed per endpoint.',
+                   [({'endpoint': e}, n) for e, n in self._queries.items()])
+            family('db_query_seconds_total', 'counter', 'Time spent in SQL per endpoint.',
+                   [({'endpoint': e}, round(s, 6)) for e, s in self._db_seconds.items()])
+            family('db_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS per endpoint.',
+                   [({'endpoint': e}, n) for e, n in self._slow_queries.items()])
+            family('query_budget_exceeded_total', 'counter', 'Requests that ran more SQL than their budget.',
+                   [({'endpoint': e}, n) for e, n in self._budget_violations.items()])
+
+            histogram = []
+            for endpoint, buckets in self._latency.items():
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                    cumulative += n
+                    histogram.append(({'endpoint': endpoint, 'le': bound}, cumulative))
+            lines.append('# HELP http_request_duration_seconds Request latency per endpoint.')
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for labels, value in histogram:
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{labels["endpoint"]}",le="{labels["le"]}"}} {value}')
+            for endpoint, total in self._latency_sum.items():
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {round(total, 6)}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {self._requests[endpoint]}')
+
+        for name, kind, help_text, samples in extra:
+            family(name, kind, help_text, samples)
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_started'].pop()
+    if has_request_context() and '_sql_count' in g:
+        instrumentation.record_query(statement, time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute; keep the timing stack balanced
+    if context.connection is not None and context.connection.info.get('_query_started'):
+        context.connection.info['_query_started'].pop()
@@ -0,0 +1,319 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import (Column, Float, Index, Integer, MetaData, String, Table, Text, create_engine, delete, event,
+                        func, insert, select, update)
+from sqlalchemy.orm import Session
+
+Job = namedtuple('Job', ['job_id', 'name', 'payload', 'attempts', 'max_attempts'])
+
+metadata = MetaData()
+
+jobs_table = Table(
+    'jobs', metadata,
+    Column('job_id', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('payload', Text, nullable=False),
+    # 'queued', 'running' or 'dead'; finished jobs are deleted
+    Column('state', String(10), nullable=False),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('max_attempts', Integer, nullable=False),
+    # Unix time the job is next due: when it may (re)run, or when a running job's lease expires
+    Column('run_at', Float, nullable=False),
+    Column('last_error', Text),
+    Column('created_at', Float, nullable=False),
+    Index('ix_jobs_state_run_at', 'state', 'run_at'),
+)
+
+
+class Retry(Exception):
+    """Raised by a job to be retried with a new payload, e.g. only the part it did not get through.
+
+    With ``progress`` the attempt got part of the work done, so it does not
+    count towards ``max_attempts``: a batch that keeps losing its connection
+    part-way is still retried until it is through.
+    """
+
+    def __init__(self, message, payload=None, progress=False):
+        super().__init__(message)
+        self.payload = payload
+        self.progress = progress
+
+
+class JobQueue:
+    """A persistent job queue in a local SQLite file, for work that should not hold up a request.
+
+    ``enqueue`` (or ``enqueue_after_commit`` inside a transaction) stores a
+    job: the name of a function registered with ``@jobs.task`` and a JSON
+    payload of its keyword arguments. ``flask jobs work --processes N``
+    runs workers that claim due jobs one at a time: the claim is a single
+    UPDATE, so each job goes to one worker, and holds a lease of
+    ``JOB_LEASE`` seconds after which a crashed worker's job is claimed
+    again. A job that raises is retried up to ``JOB_MAX_ATTEMPTS`` times,
+    after ``JOB_BACKOFF_BASE * 2 ** (attempt - 1)`` seconds (capped at
+    ``JOB_BACKOFF_MAX``, with jitter), then left in the ``dead`` state with
+    its last error for ``flask jobs requeue`` to revive.
+
+    The file (``JOB_QUEUE_DATABASE``, by default ``jobs.sqlite3`` in the
+    instance folder) is separate from the application database, so queue
+    traffic never waits on the application's write lock. Web and worker
+    processes must therefore share a host.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers = {}
+        self._engine = None
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_QUEUE_DATABASE', None)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOB_BACKOFF_BASE', 2)
+        app.config.setdefault('JOB_BACKOFF_MAX', 600)
+        app.config.setdefault('JOB_LEASE', 300)
+        app.config.setdefault('JOB_POLL_INTERVAL', 1)
+
+        self.max_attempts = int(app.config['JOB_MAX_ATTEMPTS'])
+        self.backoff_base = float(app.config['JOB_BACKOFF_BASE'])
+        self.backoff_max = float(app.config['JOB_BACKOFF_MAX'])
+        self.lease = float(app.config['JOB_LEASE'])
+        self.poll_interval = float(app.config['JOB_POLL_INTERVAL'])
+        with self._lock:
+            self.app = app
+            self.path = app.config['JOB_QUEUE_DATABASE'] or os.path.join(app.instance_path, 'jobs.sqlite3')
+            self._engine = None
+        if not event.contains(Session, 'after_commit', _enqueue_pending):
+            event.listen(Session, 'after_commit', _enqueue_pending)
+            event.listen(Session, 'after_rollback', _discard_pending)
+        app.extensions['job_queue'] = self
+
+    @property
+    def engine(self):
+        # Created on first use, so every forked server worker opens its own connections
+        with self._lock:
+            if self._engine is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                engine = create_engine(f'sqlite:///{self.path}', connect_args={'timeout': 30})
+                event.listen(engine, 'connect', _configure_connection)
+                metadata.create_all(engine)
+                self._engine = engine
+            return self._engine
+
+    def task(self, fn):
+        """Register ``fn`` as a job handler under its name; it is called with the payload as keyword arguments."""
+        self.handlers[fn.__name__] = fn
+        return fn
+
+    def enqueue(self, name, payload=None, delay=0):
+        """Store a job for ``name``; returns its id."""
+        return self.enqueue_many(name, [payload or {}], delay)[0]
+
+    def enqueue_many(self, name, payloads, delay=0):
+        """Store one job per payload in a single transaction; returns their ids."""
+        if not payloads:
+            return []
+        now = time.time()
+        rows = [{'name': name, 'payload': json.dumps(payload), 'state': 'queued', 'attempts': 0,
+                 'max_attempts': self.max_attempts, 'run_at': now + delay, 'created_at': now}
+                for payload in payloads]
+        with self.engine.begin() as connection:
+            ids = [row.job_id for row in connection.execute(insert(jobs_table).returning(jobs_table.c.job_id), rows)]
+        self._count('enqueued', len(ids))
+        return ids
+
+    def enqueue_after_commit(self, session, name, payload=None):
+        """Enqueue once ``session`` commits, so a job never refers to rows that were rolled back."""
+        session.info.setdefault('jobs_pending', []).append((self, name, payload))
+
+    def claim(self):
+        """Take the next due job, or one whose worker's lease ran out; returns a ``Job`` or None."""
+        now = time.time()
+        due = (
+            select(jobs_table.c.job_id)
+            .where(jobs_table.c.state.in_(('queued', 'running')), jobs_table.c.run_at <= now)
+            .order_by(jobs_table.c.run_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                update(jobs_table)
+                .where(jobs_table.c.job_id == due)
+                .values(state='running', attempts=jobs_table.c.attempts + 1, run_at=now + self.lease)
+                .returning(jobs_table.c.job_id, jobs_table.c.name, jobs_table.c.payload, jobs_table.c.attempts,
+                           jobs_table.c.max_attempts)
+            ).first()
+        return Job(*row) if row is not None else None
+
+    def run(self, job):
+        """Run a claimed job, then delete it, schedule its retry or dead-letter it."""
+        handler = self.handlers.get(job.name)
+        payload, progress = None, False
+        try:
+            if handler is None:
+                raise LookupError(f'No handler registered for {job.name!r}')
+            if job.attempts > job.max_attempts:
+                # Only after leases expired: the worker crashed or was killed while running it every time
+                raise RuntimeError('Gave up after its lease expired on every attempt')
+            with self.app.app_context():
+                handler(**json.loads(job.payload))
+        except Retry as e:
+            payload, progress, error = e.payload, e.progress, str(e)
+        except Exception as e:
+            self.app.logger.exception('Job %d (%s) failed on attempt %d', job.job_id, job.name, job.attempts)
+            error = f'{type(e).__name__}: {e}'
+        else:
+            with self.engine.begin() as connection:
+                connection.execute(delete(jobs_table).where(jobs_table.c.job_id == job.job_id))
+            self._count('completed')
+            return True
+
+        values = {'last_error': error}
+        if payload is not None:
+            values['payload'] = json.dumps(payload)
+        if progress:
+            # The next claim counts as the first attempt at what is left
+            values['attempts'] = 0
+        if handler is None or (not progress and job.attempts >= job.max_attempts):
+            self.app.logger.error('Job %d (%s) is dead after %d attempts: %s', job.job_id, job.name, job.attempts,
+                                  error)
+            values['state'] = 'dead'
+            self._count('dead')
+        else:
+            # Full jitter keeps jobs that failed together (e.g. on an SMTP outage) from retrying in lockstep
+            attempt = 1 if progress else job.attempts
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1)
+            self.app.logger.warning('Job %d (%s) will be retried in %.1fs: %s', job.job_id, job.name, delay, error)
+            values.update(state='queued', run_at=time.time() + delay)
+            self._count('retried')
+        with self.engine.begin() as connection:
+            connection.execute(update(jobs_table).where(jobs_table.c.job_id == job.job_id).values(**values))
+        return False
+
+    def work(self, burst=False, stop=None):
+        """Run jobs until ``stop`` (a ``threading.Event``) is set or, with ``burst``, the queue is empty."""
+        ran = 0
+        while stop is None or not stop.is_set():
+            job = self.claim()
+            if job is not None:
+                self.run(job)
+                ran += 1
+            elif burst and not self.pending():
+                break
+            elif stop is not None:
+                stop.wait(self.poll_interval)
+            else:
+                time.sleep(self.poll_interval)
+        return ran
+
+    def pending(self):
+        """How many jobs are queued (due or waiting to retry) or running."""
+        with self.engine.connect() as connection:
+            return connection.scalar(
+                select(func.count()).select_from(jobs_table).where(jobs_table.c.state.in_(('queued', 'running')))
+            )
+
+    def requeue_dead(self):
+        """Give every dead job a fresh set of attempts; returns how many."""
+        with self.engine.begin() as connection:
+            return connection.execute(
+                update(jobs_table).where(jobs_table.c.state == 'dead')
+                .values(state='queued', attempts=0, run_at=time.time())
+            ).rowcount
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def stats(self):
+        """Jobs by state and this process's counters; all zero, without creating the file, if no job was queued yet."""
+        states = {}
+        if self._engine is not None or os.path.exists(self.path):
+            with self.engine.connect() as connection:
+                states = dict(connection.execute(
+                    select(jobs_table.c.state, func.count()).group_by(jobs_table.c.state)
+                ).all())
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'queued': states.get('queued', 0),
+            'running': states.get('running', 0),
+            'dead': states.get('dead', 0),
+            **counters
+        }
+
+
+jobs = JobQueue()
+
+
+def _configure_connection(dbapi_connection, _record):
+    # WAL lets workers claim jobs while the web processes enqueue; NORMAL still survives a process crash
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _enqueue_pending(session):
+    for owner, name, payload in session.info.pop('jobs_pending', ()):
+        try:
+            owner.enqueue(name, payload)
+        except Exception:
+            # The transaction has committed; failing the request now would misreport it
+            owner.app.logger.exception('Could not enqueue %s job', name)
+
+
+def _discard_pending(session):
+    session.info.pop('jobs_pending', None)
+
+
+def _work_in_process(burst):
+    from app import create_app
+    create_app()
+    jobs.work(burst=burst)
+
+
+jobs_command = AppGroup('jobs', help='Run and inspect the background job queue.')
+
+
+@jobs_command.command('work')
+@click.option('--processes', default=1, help='Worker processes to run.')
+@click.option('--burst', is_flag=True, help='Exit once no job is queued or running.')
+def work_command(processes, burst):
+    """Run queued jobs."""
+    if processes <= 1:
+        jobs.work(burst=burst)
+        return
+    import multiprocessing
+
+    # Each worker builds its own app (from APP_CONFIG and the environment), engines included
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_work_in_process, args=(burst,), name=f'jobs-worker-{i}')
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+@jobs_command.command('stats')
+def stats_command():
+    """Show how many jobs are queued, running and dead."""
+    click.echo(json.dumps(jobs.stats(), indent=2))
+
+
+@jobs_command.command('requeue')
+def requeue_command():
+    """Retry every dead job from scratch."""
+    click.echo(f'Requeued {jobs.requeue_dead()} dead jobs')
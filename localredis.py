@@ -0,0 +1,264 @@
+"""A local Redis-compatible stand-in for running several workers on one host without a Redis server.
+
+It speaks just enough of RESP2 and RESP3 for ``PUBSUB_URL`` (``PUBLISH``
+and channel and pattern subscriptions) and a ``redis://``
+``RESPONSE_CACHE_URL`` (``GET``, ``SET`` with an expiry, ``MGET``,
+``INCR``/``INCRBY``, ``DEL`` and ``SCAN``). Everything lives in one process, so it
+suits development and the benchmarks, not production.
+
+    flask local-redis --port 6379
+    PUBSUB_URL=redis://127.0.0.1:6379/0 RESPONSE_CACHE_URL=redis://127.0.0.1:6379/0 \
+        WEB_CONCURRENCY=4 gunicorn app:app
+"""
+import socketserver
+import threading
+import time
+from collections import defaultdict
+from fnmatch import fnmatchcase
+
+import click
+
+
+class CommandError(Exception):
+    """Sent back to the client as a RESP error reply."""
+
+
+class Push(list):
+    """An out-of-band message to a subscriber: a RESP3 push, or a plain array under RESP2."""
+
+
+def encode(value, protocol=2):
+    """Encode ``value`` as a RESP reply: ``str`` is a status, ``bytes`` a bulk string, ``None`` a null."""
+    if value is None:
+        return b'_\r\n' if protocol == 3 else b'$-1\r\n'
+    if isinstance(value, CommandError):
+        return f'-ERR {value}\r\n'.encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return f'+{value}\r\n'.encode()
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, dict):
+        if protocol == 3:
+            return b'%%%d\r\n' % len(value) + b''.join(encode(k, 3) + encode(v, 3) for k, v in value.items())
+        value = [item for pair in value.items() for item in pair]
+    kind = b'>' if protocol == 3 and isinstance(value, Push) else b'*'
+    return kind + b'%d\r\n' % len(value) + b''.join(encode(item, protocol) for item in value)
+
+
+class LocalRedis(socketserver.ThreadingTCPServer):
+    """The stand-in server; ``port=0`` picks a free port, available as ``port`` once bound."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), RESPHandler)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.channels = defaultdict(set)
+        self.patterns = defaultdict(set)
+        # key -> (value, expires at as a time.monotonic() value or None)
+        self.data = {}
+
+    @property
+    def url(self):
+        return f'redis://{self.server_address[0]}:{self.port}/0'
+
+    def serve(self):
+        """Serve from a daemon thread; returns the server."""
+        threading.Thread(target=self.serve_forever, name='local-redis', daemon=True).start()
+        return self
+
+    def value(self, key):
+        """The live value of ``key`` or None; call with ``lock`` held."""
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return item[0]
+
+    def publish(self, channel, message):
+        name = channel.decode('latin-1')
+        with self.lock:
+            targets = [(handler, Push([b'message', channel, message])) for handler in self.channels.get(channel, ())]
+            targets += [(handler, Push([b'pmessage', pattern, channel, message]))
+                        for pattern, handlers in self.patterns.items()
+                        if fnmatchcase(name, pattern.decode('latin-1')) for handler in handlers]
+        for handler, reply in targets:
+            handler.send(reply)
+        return len(targets)
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """One client connection: reads commands and writes replies, plus pushed messages once subscribed."""
+
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.protocol = 2
+        self.subscriptions = {b'subscribe': set(), b'psubscribe': set()}
+
+    def send(self, reply):
+        with self.write_lock:
+            try:
+                self.wfile.write(encode(reply, self.protocol))
+            except OSError:
+                pass
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        try:
+            while (command := self.read_command()) is not None:
+                if not command:
+                    continue
+                method = getattr(self, 'do_' + command[0].decode('latin-1').upper(), None)
+                try:
+                    if method is None:
+                        raise CommandError(f"unknown command '{command[0].decode('latin-1')}'")
+                    reply = method(*command[1:])
+                except TypeError:
+                    reply = CommandError(f"wrong number of arguments for '{command[0].decode('latin-1')}'")
+                except CommandError as error:
+                    reply = error
+                if reply is not NotImplemented:
+                    self.send(reply)
+        finally:
+            with self.server.lock:
+                for channels, kind in ((self.server.channels, b'subscribe'), (self.server.patterns, b'psubscribe')):
+                    for name in self.subscriptions[kind]:
+                        channels[name].discard(self)
+                        if not channels[name]:
+                            del channels[name]
+
+    def do_HELLO(self, protocol=b'2', *options):
+        if protocol not in (b'2', b'3'):
+            raise CommandError(f"unsupported protocol version {protocol.decode('latin-1')}")
+        self.protocol = int(protocol)
+        return {b'server': b'redis', b'version': b'7.0.0', b'proto': self.protocol, b'id': id(self),
+                b'mode': b'standalone', b'role': b'master', b'modules': []}
+
+    def do_PING(self, message=None):
+        return message if message is not None else 'PONG'
+
+    def do_CLIENT(self, *args):
+        return 'OK'
+
+    def do_SELECT(self, index):
+        return 'OK'
+
+    def do_GET(self, key):
+        with self.server.lock:
+            return self.server.value(key)
+
+    def do_MGET(self, *keys):
+        with self.server.lock:
+            return [self.server.value(key) for key in keys]
+
+    def do_SET(self, key, value, *options):
+        expires_at = None
+        options = [option.upper() for option in options]
+        for unit, scale in ((b'EX', 1.0), (b'PX', 0.001)):
+            if unit in options:
+                try:
+                    expires_at = time.monotonic() + int(options[options.index(unit) + 1]) * scale
+                except (IndexError, ValueError):
+                    raise CommandError('syntax error')
+        with self.server.lock:
+            self.server.data[key] = (value, expires_at)
+        return 'OK'
+
+    def do_INCR(self, key):
+        return self.do_INCRBY(key, b'1')
+
+    def do_INCRBY(self, key, amount):
+        with self.server.lock:
+            current = self.server.value(key)
+            try:
+                value = int(current or 0) + int(amount)
+            except ValueError:
+                raise CommandError('value is not an integer or out of range')
+            expires_at = self.server.data[key][1] if current is not None else None
+            self.server.data[key] = (b'%d' % value, expires_at)
+        return value
+
+    def do_DEL(self, *keys):
+        deleted = 0
+        with self.server.lock:
+            for key in keys:
+                if self.server.value(key) is not None:
+                    del self.server.data[key]
+                    deleted += 1
+        return deleted
+
+    def do_SCAN(self, cursor, *options):
+        # The whole keyspace in one batch, so the cursor always comes back as 0
+        options = [option.upper() if i % 2 == 0 else option for i, option in enumerate(options)]
+        pattern = options[options.index(b'MATCH') + 1].decode('latin-1') if b'MATCH' in options else '*'
+        with self.server.lock:
+            keys = [key for key in list(self.server.data)
+                    if self.server.value(key) is not None and fnmatchcase(key.decode('latin-1'), pattern)]
+        return [b'0', keys]
+
+    def do_PUBLISH(self, channel, message):
+        return self.server.publish(channel, message)
+
+    def _subscribe(self, kind, names):
+        channels = self.server.channels if kind == b'subscribe' else self.server.patterns
+        for name in names:
+            with self.server.lock:
+                channels[name].add(self)
+                self.subscriptions[kind].add(name)
+                count = sum(len(current) for current in self.subscriptions.values())
+            self.send(Push([kind, name, count]))
+        return NotImplemented
+
+    def _unsubscribe(self, kind, names):
+        channels = self.server.channels if kind == b'unsubscribe' else self.server.patterns
+        subscribed = self.subscriptions[kind[2:]]
+        for name in names or list(subscribed) or [None]:
+            with self.server.lock:
+                if name in subscribed:
+                    subscribed.discard(name)
+                    channels[name].discard(self)
+                    if not channels[name]:
+                        del channels[name]
+                count = sum(len(current) for current in self.subscriptions.values())
+            self.send(Push([kind, name, count]))
+        return NotImplemented
+
+    def do_SUBSCRIBE(self, *channels):
+        return self._subscribe(b'subscribe', channels)
+
+    def do_PSUBSCRIBE(self, *patterns):
+        return self._subscribe(b'psubscribe', patterns)
+
+    def do_UNSUBSCRIBE(self, *channels):
+        return self._unsubscribe(b'unsubscribe', channels)
+
+    def do_PUNSUBSCRIBE(self, *patterns):
+        return self._unsubscribe(b'punsubscribe', patterns)
+
+
+@click.command('local-redis')
+@click.option('--host', default='127.0.0.1', help='Interface to listen on.')
+@click.option('--port', default=6379, help='Port to listen on.')
+def local_redis_command(host, port):
+    """Run a local Redis-compatible stand-in for PUBSUB_URL and RESPONSE_CACHE_URL."""
+    server = LocalRedis(host, port)
+    click.echo(f'Listening on {server.url}')
+    server.serve_forever()
@@ -0,0 +1,158 @@
+from datetime import datetime
+from sqlalchemy import case, func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Conversation, ConversationParticipant as Participant, Message, User
+
+MAX_PARTICIPANTS = 50
+
+
+def direct_key(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f'{low}:{high}'
+
+
+def start(creator_id, participant_ids, key=None):
+    """Create a conversation between ``creator_id`` and ``participant_ids``; returns its id.
+
+    Raises ``LookupError`` if any participant does not exist.
+    """
+    user_ids = sorted(set(participant_ids) | {creator_id})
+    if len(user_ids) < 2:
+        raise ValueError('A conversation needs at least one other participant')
+    if len(user_ids) > MAX_PARTICIPANTS:
+        raise ValueError(f'A conversation can have at most {MAX_PARTICIPANTS} participants')
+    found = db.session.scalar(select(func.count()).select_from(User).where(User.user_id.in_(user_ids)))
+    if found != len(user_ids):
+        raise LookupError('Unknown participant')
+
+    now = datetime.utcnow()
+    conversation = Conversation(direct_key=key, created_at=now, last_message_at=now)
+    db.session.add(conversation)
+    db.session.flush()
+    db.session.add_all(
+        Participant(conversation_id=conversation.conversation_id, user_id=user_id, last_message_at=now)
+        for user_id in user_ids
+    )
+    db.session.flush()
+    return conversation.conversation_id
+
+
+def direct_conversation(user_id, other_id):
+    """Return the id of the one-to-one conversation between two users, creating it on first contact."""
+    if user_id == other_id:
+        raise ValueError('You cannot message yourself')
+    key = direct_key(user_id, other_id)
+    existing = db.session.scalar(select(Conversation.conversation_id).where(Conversation.direct_key == key))
+    if existing is not None:
+        return existing
+    try:
+        with db.session.begin_nested():
+            return start(user_id, [other_id], key)
+    except IntegrityError:
+        # Both users wrote to each other at once; the unique direct_key picked a winner
+        return db.session.scalar(select(Conversation.conversation_id).where(Conversation.direct_key == key))
+
+
+def send(conversation_id, sender_id, body):
+    """Append a message and update every participant's inbox row in the current transaction.
+
+    One UPDATE moves the conversation to the top of each participant's
+    inbox, bumps the recipients' unread counts and marks the conversation
+    read for the sender; it also returns the participants, so membership costs
+    no extra query. Raises ``PermissionError`` if the sender is not one.
+    """
+    now = datetime.utcnow()
+    message = Message(conversation_id=conversation_id, sender_id=sender_id, body=body, sent_at=now)
+    db.session.add(message)
+    db.session.flush()
+
+    is_sender = Participant.user_id == sender_id
+    participants = db.session.scalars(
+        update(Participant)
+        .where(Participant.conversation_id == conversation_id)
+        .values(
+            last_message_at=now,
+            unread_count=case((is_sender, 0), else_=Participant.unread_count + 1),
+            last_read_message_id=case((is_sender, message.message_id), else_=Participant.last_read_message_id),
+        )
+        .returning(Participant.user_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if sender_id not in participants:
+        raise PermissionError('You are not a participant in this conversation')
+
+    db.session.execute(
+        update(Conversation)
+        .where(Conversation.conversation_id == conversation_id)
+        .values(last_message_id=message.message_id, last_message_at=now)
+    )
+    return message
+
+
+def mark_read(conversation_id, user_id):
+    """Reset a participant's unread count; raises ``LookupError`` if they are not in the conversation."""
+    last_message_id = (
+        select(Conversation.last_message_id)
+        .where(Conversation.conversation_id == conversation_id)
+        .scalar_subquery()
+    )
+    updated = db.session.execute(
+        update(Participant)
+        .where(Participant.conversation_id == conversation_id, Participant.user_id == user_id)
+        .values(unread_count=0, last_read_message_id=last_message_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        raise LookupError('Conversation not found')
+
+
+def inbox(user_id, limit, after=None):
+    """Return a page of a user's conversations, most recently active first, and their members.
+
+    ``after`` is the ``(last_message_at, conversation_id)`` key of the last
+    conversation of the previous page. The page is one range scan of
+    ``ix_conversation_participants_inbox`` joined to each conversation's
+    last message; a second query loads the members of just those
+    conversations. Nothing scales with the number of messages.
+    """
+    statement = (
+        select(Participant.conversation_id, Participant.last_message_at, Participant.unread_count,
+               Message.message_id, Message.sender_id, Message.body, Message.sent_at)
+        .join(Conversation, Conversation.conversation_id == Participant.conversation_id)
+        .outerjoin(Message, Message.message_id == Conversation.last_message_id)
+        .where(Participant.user_id == user_id)
+    )
+    if after is not None:
+        statement = statement.where(tuple_(Participant.last_message_at, Participant.conversation_id) < tuple_(*after))
+    rows = db.session.execute(
+        statement.order_by(Participant.last_message_at.desc(), Participant.conversation_id.desc()).limit(limit)
+    ).all()
+
+    members = {row.conversation_id: [] for row in rows}
+    if members:
+        for conversation_id, member_id, name in db.session.execute(
+            select(Participant.conversation_id, User.user_id, User.name)
+            .join(User, User.user_id == Participant.user_id)
+            .where(Participant.conversation_id.in_(members))
+        ):
+            members[conversation_id].append({"id": member_id, "name": name})
+    return rows, members
+
+
+def history(conversation_id, user_id, limit, before=None):
+    """Return ``(last_read_message_id, messages)``, newest first, older than ``before``.
+
+    Raises ``LookupError`` if ``user_id`` is not a participant.
+    """
+    membership = db.session.execute(
+        select(Participant.last_read_message_id)
+        .where(Participant.conversation_id == conversation_id, Participant.user_id == user_id)
+    ).first()
+    if membership is None:
+        raise LookupError('Conversation not found')
+
+    statement = select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None:
+        statement = statement.where(Message.message_id < before)
+    messages = db.session.scalars(statement.order_by(Message.message_id.desc()).limit(limit)).all()
+    return membership.last_read_message_id, messages
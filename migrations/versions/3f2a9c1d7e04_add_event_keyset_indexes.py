@@ -0,0 +1,30 @@
+"""Add composite indexes for keyset pagination of events
+
+Revision ID: 3f2a9c1d7e04
+Revises: 68b0479182bb
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7e04'
+down_revision = '68b0479182bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_date_event_id', ['date', 'event_id'], unique=False)
+        batch_op.create_index('ix_events_organizer_date', ['organizer_id', 'date', 'event_id'], unique=False)
+        batch_op.create_index('ix_events_location_date', ['location', 'date', 'event_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_location_date')
+        batch_op.drop_index('ix_events_organizer_date')
+        batch_op.drop_index('ix_events_date_event_id')
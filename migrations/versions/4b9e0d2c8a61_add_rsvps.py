@@ -0,0 +1,41 @@
+"""Add RSVPs and denormalized attendee counts
+
+Revision ID: 4b9e0d2c8a61
+Revises: e2b4f7a19c35
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e0d2c8a61'
+down_revision = 'e2b4f7a19c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rsvps',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.event_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('event_id', 'user_id')
+    )
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rsvps_user_id'), ['user_id'], unique=False)
+
+    # Plain ALTER TABLE: a batch rebuild of events on SQLite would drop its search triggers
+    op.add_column('events', sa.Column('attendee_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.execute("ALTER TABLE events DROP COLUMN attendee_count")
+
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rsvps_user_id'))
+
+    op.drop_table('rsvps')
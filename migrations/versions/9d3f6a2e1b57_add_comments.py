@@ -0,0 +1,48 @@
+"""Add threaded comments with materialized paths
+
+Revision ID: 9d3f6a2e1b57
+Revises: 4b9e0d2c8a61
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f6a2e1b57'
+down_revision = '4b9e0d2c8a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('comments',
+    sa.Column('comment_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.String(length=1000), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('path', sa.String(length=400), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.user_id'], ),
+    sa.ForeignKeyConstraint(['parent_id'], ['comments.comment_id'], ),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.post_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('comment_id')
+    )
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.create_index('ix_comments_parent_position', ['parent_id', 'position'], unique=False)
+        batch_op.create_index('ix_comments_post_depth_path', ['post_id', 'depth', 'path'], unique=False)
+        batch_op.create_index('ix_comments_post_path', ['post_id', 'path'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_post_path')
+        batch_op.drop_index('ix_comments_post_depth_path')
+        batch_op.drop_index('ix_comments_parent_position')
+
+    op.drop_table('comments')
@@ -0,0 +1,69 @@
+"""Add the activity log and trending snapshots
+
+Revision ID: a3c7e9f1b5d2
+Revises: f1c9a3d5e7b2
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c7e9f1b5d2'
+down_revision = 'f1c9a3d5e7b2'
+branch_labels = None
+depends_on = None
+
+# Days of existing posts, events, comments and RSVPs logged so they can trend straight away. The statements
+# are trending.backfill as of this revision, written out so later edits there cannot change this migration.
+BACKFILL_DAYS = 7
+BACKFILL = [
+    """INSERT INTO activity (neighborhood, kind, ref_id, action, created_at)
+        SELECT u.neighborhood, 'post', p.post_id, 'post', p.timestamp FROM posts p
+        JOIN users u ON p.created_by_id = u.user_id
+        WHERE p.timestamp >= :since AND u.neighborhood IS NOT NULL ORDER BY p.timestamp""",
+    """INSERT INTO activity (neighborhood, kind, ref_id, action, created_at)
+        SELECT u.neighborhood, 'event', e.event_id, 'event', e.created_at FROM events e
+        JOIN users u ON e.organizer_id = u.user_id
+        WHERE e.created_at >= :since AND u.neighborhood IS NOT NULL ORDER BY e.created_at""",
+    """INSERT INTO activity (neighborhood, kind, ref_id, action, created_at)
+        SELECT u.neighborhood, 'post', c.post_id, 'comment', c.created_at FROM comments c
+        JOIN posts p ON c.post_id = p.post_id JOIN users u ON p.created_by_id = u.user_id
+        WHERE c.created_at >= :since AND u.neighborhood IS NOT NULL ORDER BY c.created_at""",
+    """INSERT INTO activity (neighborhood, kind, ref_id, action, created_at)
+        SELECT u.neighborhood, 'event', r.event_id, 'rsvp', r.created_at FROM rsvps r
+        JOIN events e ON r.event_id = e.event_id JOIN users u ON e.organizer_id = u.user_id
+        WHERE r.created_at >= :since AND u.neighborhood IS NOT NULL ORDER BY r.created_at""",
+]
+
+
+def upgrade():
+    op.create_table('activity',
+    sa.Column('activity_id', sa.Integer(), nullable=False),
+    sa.Column('neighborhood', sa.String(length=100), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('activity_id')
+    )
+    op.create_table('trending_snapshots',
+    sa.Column('snapshot_id', sa.Integer(), nullable=False),
+    sa.Column('last_activity_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('scores', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('snapshot_id')
+    )
+
+    since = sa.bindparam('since', datetime.utcnow() - timedelta(days=BACKFILL_DAYS), type_=sa.DateTime())
+    bind = op.get_bind()
+    for statement in BACKFILL:
+        bind.execute(sa.text(statement).bindparams(since))
+
+
+def downgrade():
+    op.drop_table('trending_snapshots')
+    op.drop_table('activity')
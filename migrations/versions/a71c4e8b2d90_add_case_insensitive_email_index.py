@@ -0,0 +1,24 @@
+"""Add case-insensitive unique index on users.email
+
+Revision ID: a71c4e8b2d90
+Revises: 3f2a9c1d7e04
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71c4e8b2d90'
+down_revision = '3f2a9c1d7e04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
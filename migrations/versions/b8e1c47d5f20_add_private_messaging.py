@@ -0,0 +1,65 @@
+"""Add conversations, participants and messages
+
+Revision ID: b8e1c47d5f20
+Revises: 9d3f6a2e1b57
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1c47d5f20'
+down_revision = '9d3f6a2e1b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversations',
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('direct_key', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_message_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('conversation_id'),
+    sa.UniqueConstraint('direct_key')
+    )
+    op.create_table('conversation_participants',
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_message_at', sa.DateTime(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.conversation_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('conversation_id', 'user_id')
+    )
+    with op.batch_alter_table('conversation_participants', schema=None) as batch_op:
+        batch_op.create_index('ix_conversation_participants_inbox', ['user_id', 'last_message_at', 'conversation_id'], unique=False)
+
+    op.create_table('messages',
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('sender_id', sa.Integer(), nullable=False),
+    sa.Column('body', sa.String(length=2000), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.conversation_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['sender_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('message_id')
+    )
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('ix_messages_conversation_message', ['conversation_id', 'message_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_messages_conversation_message')
+
+    op.drop_table('messages')
+    with op.batch_alter_table('conversation_participants', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversation_participants_inbox')
+
+    op.drop_table('conversation_participants')
+    op.drop_table('conversations')
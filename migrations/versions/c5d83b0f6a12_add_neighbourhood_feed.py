@@ -0,0 +1,75 @@
+"""Add materialized neighbourhood feed
+
+Revision ID: c5d83b0f6a12
+Revises: a71c4e8b2d90
+Create Date: 2026-10-18 12:45:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d83b0f6a12'
+down_revision = 'a71c4e8b2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_items',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('neighborhood', sa.String(length=100), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('item_id')
+    )
+    with op.batch_alter_table('feed_items', schema=None) as batch_op:
+        batch_op.create_index('ix_feed_items_neighborhood_created', ['neighborhood', 'created_at', 'kind', 'ref_id'], unique=False)
+        batch_op.create_index('ix_feed_items_kind_ref', ['kind', 'ref_id'], unique=False)
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_events_organizer_created', ['organizer_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index('ix_posts_created_by_timestamp', ['created_by_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_neighborhood', ['neighborhood'], unique=False)
+
+    # Backfill: existing events count as created now, then fan out existing content
+    events = sa.table('events', sa.column('created_at', sa.DateTime()))
+    op.execute(events.update().where(events.c.created_at.is_(None)).values(created_at=datetime.utcnow()))
+    op.execute(
+        "INSERT INTO feed_items (neighborhood, kind, ref_id, created_at) "
+        "SELECT u.neighborhood, 'post', p.post_id, p.timestamp FROM posts p "
+        "JOIN users u ON u.user_id = p.created_by_id "
+        "WHERE u.neighborhood IS NOT NULL AND p.timestamp IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO feed_items (neighborhood, kind, ref_id, created_at) "
+        "SELECT u.neighborhood, 'event', e.event_id, e.created_at FROM events e "
+        "JOIN users u ON u.user_id = e.organizer_id "
+        "WHERE u.neighborhood IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_neighborhood')
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index('ix_posts_created_by_timestamp')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_organizer_created')
+        batch_op.drop_column('created_at')
+
+    with op.batch_alter_table('feed_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_feed_items_kind_ref')
+        batch_op.drop_index('ix_feed_items_neighborhood_created')
+
+    op.drop_table('feed_items')
@@ -0,0 +1,99 @@
+"""Add full-text search index for posts and events
+
+Revision ID: e2b4f7a19c35
+Revises: c5d83b0f6a12
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b4f7a19c35'
+down_revision = 'c5d83b0f6a12'
+branch_labels = None
+depends_on = None
+
+# Copied from search.DDL as of this revision rather than imported, so later edits there cannot change
+# what this migration does.
+
+# SQLite: one FTS5 row per post (rowid = 2 * post_id) or event (rowid = 2 * event_id + 1),
+# so the sync triggers address rows by rowid instead of scanning the index.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        neighborhood UNINDEXED, title, body,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO search_index (rowid, neighborhood, title, body)
+        VALUES (2 * new.post_id, (SELECT neighborhood FROM users WHERE user_id = new.created_by_id), '', new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_update AFTER UPDATE OF content ON posts BEGIN
+        UPDATE search_index SET body = new.content WHERE rowid = 2 * new.post_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_delete AFTER DELETE ON posts BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.post_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_insert AFTER INSERT ON events BEGIN
+        INSERT INTO search_index (rowid, neighborhood, title, body)
+        VALUES (2 * new.event_id + 1, (SELECT neighborhood FROM users WHERE user_id = new.organizer_id), new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_update AFTER UPDATE OF title, description ON events BEGIN
+        UPDATE search_index SET title = new.title, body = new.description WHERE rowid = 2 * new.event_id + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_delete AFTER DELETE ON events BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.event_id + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_neighborhood AFTER UPDATE OF neighborhood ON users BEGIN
+        UPDATE search_index SET neighborhood = new.neighborhood
+        WHERE rowid IN (SELECT 2 * post_id FROM posts WHERE created_by_id = new.user_id
+                        UNION ALL SELECT 2 * event_id + 1 FROM events WHERE organizer_id = new.user_id);
+    END""",
+]
+
+# PostgreSQL: stored generated tsvector columns stay in sync without triggers.
+POSTGRESQL_DDL = [
+    """ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+    """ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING GIN (search_vector)",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    for statement in {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(bind.dialect.name, ()):
+        op.execute(statement)
+
+    if bind.dialect.name == 'sqlite':
+        op.execute(
+            "INSERT INTO search_index (rowid, neighborhood, title, body) "
+            "SELECT 2 * p.post_id, u.neighborhood, '', p.content FROM posts p "
+            "LEFT JOIN users u ON u.user_id = p.created_by_id"
+        )
+        op.execute(
+            "INSERT INTO search_index (rowid, neighborhood, title, body) "
+            "SELECT 2 * e.event_id + 1, u.neighborhood, e.title, e.description FROM events e "
+            "LEFT JOIN users u ON u.user_id = e.organizer_id"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_index")
+        for trigger in ('posts_search_insert', 'posts_search_update', 'posts_search_delete',
+                        'events_search_insert', 'events_search_update', 'events_search_delete',
+                        'users_search_neighborhood'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_events_search_vector")
+        op.execute("ALTER TABLE events DROP COLUMN IF EXISTS search_vector")
+        op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+        op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,79 @@
+"""Add coordinates to events and users, and the proximity index
+
+Revision ID: f1c9a3d5e7b2
+Revises: d4a6e2f80b13
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c9a3d5e7b2'
+down_revision = 'd4a6e2f80b13'
+branch_labels = None
+depends_on = None
+
+# Copied from geo.DDL and geo.SQLITE_BACKFILL as of this revision rather than imported, so later edits
+# there cannot change what this migration does.
+
+# SQLite: an R*Tree over the events that have coordinates, with the event date as an auxiliary
+# column so a radius query is answered from the R*Tree alone. Triggers keep it in sync.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS events_geo USING rtree(
+        event_id, min_lat, max_lat, min_lng, max_lng, +date
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_insert AFTER INSERT ON events
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO events_geo VALUES (new.event_id, new.latitude, new.latitude, new.longitude, new.longitude, new.date);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_update AFTER UPDATE OF latitude, longitude, date ON events BEGIN
+        DELETE FROM events_geo WHERE event_id = old.event_id;
+        INSERT INTO events_geo SELECT new.event_id, new.latitude, new.latitude, new.longitude, new.longitude, new.date
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_geo_delete AFTER DELETE ON events BEGIN
+        DELETE FROM events_geo WHERE event_id = old.event_id;
+    END""",
+]
+
+# PostgreSQL: a B-tree over the geohash, so the cells covering a radius are a handful of prefix range scans.
+POSTGRESQL_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_events_geohash ON events (geohash text_pattern_ops)",
+]
+
+SQLITE_BACKFILL = """INSERT INTO events_geo
+    SELECT event_id, latitude, latitude, longitude, longitude, date FROM events
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL"""
+
+
+def upgrade():
+    # Plain ADD COLUMN: a batch rebuild of events would drop the search triggers
+    op.add_column('events', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('events', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('events', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.add_column('users', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('users', sa.Column('longitude', sa.Float(), nullable=True))
+
+    bind = op.get_bind()
+    for statement in {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(bind.dialect.name, ()):
+        op.execute(statement)
+    if bind.dialect.name == 'sqlite':
+        op.execute(SQLITE_BACKFILL)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('events_geo_insert', 'events_geo_update', 'events_geo_delete'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS events_geo")
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_events_geohash")
+
+    op.drop_column('users', 'longitude')
+    op.drop_column('users', 'latitude')
+    op.drop_column('events', 'geohash')
+    op.drop_column('events', 'longitude')
+    op.drop_column('events', 'latitude')
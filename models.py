@@ -1,6 +1,5 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
 
 db = SQLAlchemy()
 
@@ -12,9 +11,24 @@ class Event(db.Model):
     description = db.Column(db.String(500), nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     location = db.Column(db.String(255), nullable=False)
+    # Optional coordinates, indexed for /events/nearby by geo.py (an R*Tree on SQLite, the geohash on PostgreSQL)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized RSVP count, maintained with atomic UPDATE ... SET attendee_count = attendee_count + 1
+    attendee_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     organizer_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     
     organizer = db.relationship('User', backref=db.backref('events', lazy=True))
+
+    # Composite indexes backing keyset pagination on (date, event_id) in /events/view
+    __table_args__ = (
+        db.Index('ix_events_date_event_id', 'date', 'event_id'),
+        db.Index('ix_events_organizer_date', 'organizer_id', 'date', 'event_id'),
+        db.Index('ix_events_location_date', 'location', 'date', 'event_id'),
+        db.Index('ix_events_organizer_created', 'organizer_id', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<Event {self.title}>'
@@ -28,22 +42,181 @@ class Post(db.Model):
     created_by_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     
     created_by = db.relationship('User', backref=db.backref('posts', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_posts_created_by_timestamp', 'created_by_id', 'timestamp'),
+    )
     
     def __repr__(self):
         return f'<Post {self.content[:20]}>'
 
-class User(db.Model, UserMixin):
+class Comment(db.Model):
+    __tablename__ = 'comments'
+
+    comment_id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.post_id', ondelete='CASCADE'), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comments.comment_id'))
+    author_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    content = db.Column(db.String(1000), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Materialized path: the zero-padded ids of every ancestor and the comment itself,
+    # so ORDER BY path is depth-first thread order and a subtree is one path range
+    path = db.Column(db.String(400), nullable=False)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    # 1-based position among the parent's replies (0 for top-level comments)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    author = db.relationship('User')
+
+    __table_args__ = (
+        db.Index('ix_comments_post_path', 'post_id', 'path'),
+        db.Index('ix_comments_post_depth_path', 'post_id', 'depth', 'path'),
+        db.Index('ix_comments_parent_position', 'parent_id', 'position'),
+    )
+
+    def __repr__(self):
+        return f'<Comment {self.comment_id} on {self.post_id}>'
+
+class Conversation(db.Model):
+    __tablename__ = 'conversations'
+
+    conversation_id = db.Column(db.Integer, primary_key=True)
+    # "low_user_id:high_user_id" for one-to-one conversations, so each pair has exactly one
+    direct_key = db.Column(db.String(50), unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_message_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Conversation {self.conversation_id}>'
+
+class ConversationParticipant(db.Model):
+    __tablename__ = 'conversation_participants'
+
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.conversation_id', ondelete='CASCADE'),
+                                primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    # Copied from the conversation on every message so the inbox is one index range per user
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    # Denormalized, maintained in the same transaction as every message and read receipt
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_read_message_id = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('ix_conversation_participants_inbox', 'user_id', 'last_message_at', 'conversation_id'),
+    )
+
+    def __repr__(self):
+        return f'<ConversationParticipant {self.user_id} in {self.conversation_id}>'
+
+class Message(db.Model):
+    __tablename__ = 'messages'
+
+    message_id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.conversation_id', ondelete='CASCADE'),
+                                nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    body = db.Column(db.String(2000), nullable=False)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Backs keyset pagination of a conversation's history on message_id
+    __table_args__ = (
+        db.Index('ix_messages_conversation_message', 'conversation_id', 'message_id'),
+    )
+
+    def __repr__(self):
+        return f'<Message {self.message_id} in {self.conversation_id}>'
+
+class RSVP(db.Model):
+    __tablename__ = 'rsvps'
+
+    # The composite primary key makes RSVPs unique per (event, user)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.event_id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RSVP {self.user_id} -> {self.event_id}>'
+
+class FeedItem(db.Model):
+    __tablename__ = 'feed_items'
+
+    # One row per post or event, fanned out on write to the author's neighbourhood
+    item_id = db.Column(db.Integer, primary_key=True)
+    neighborhood = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    ref_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_feed_items_neighborhood_created', 'neighborhood', 'created_at', 'kind', 'ref_id'),
+        db.Index('ix_feed_items_kind_ref', 'kind', 'ref_id'),
+    )
+
+    def __repr__(self):
+        return f'<FeedItem {self.kind} {self.ref_id}>'
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    # The id orders revocations so every worker can top up its filter with only the new rows
+    revoked_id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    # The token's own expiry; the row is useless afterwards and is compacted away
+    expires_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
+class Activity(db.Model):
+    __tablename__ = 'activity'
+
+    # Append-only log of what makes posts and events trend, replayed in activity_id order by trending.py
+    activity_id = db.Column(db.Integer, primary_key=True)
+    # The neighbourhood the post or event belongs to (its author's), not the commenter's or attendee's
+    neighborhood = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    ref_id = db.Column(db.Integer, nullable=False)
+    # 'post' / 'event' (created), 'comment', 'rsvp' or 'delete'
+    action = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<Activity {self.action} {self.kind} {self.ref_id}>'
+
+class TrendingSnapshot(db.Model):
+    __tablename__ = 'trending_snapshots'
+
+    snapshot_id = db.Column(db.Integer, primary_key=True)
+    # Every activity row up to this one is folded into the scores
+    last_activity_id = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+    # JSON: the scoring epoch and every board's scores
+    scores = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<TrendingSnapshot {self.snapshot_id} at {self.last_activity_id}>'
+
+class User(db.Model):
     __tablename__ = 'users'
     
     user_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
-    neighborhood = db.Column(db.String(100))
+    neighborhood = db.Column(db.String(100), index=True)
+    # Optional home location; the default centre for /events/nearby
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+
+    # Case-insensitive uniqueness; logins look users up by lower(email)
+    __table_args__ = (
+        db.Index('ix_users_email_lower', db.func.lower(email), unique=True),
+    )
 
     def __repr__(self):
         return f'<User {self.name}>'
     
-    # Flask-Login required methods
     def get_id(self):
         return str(self.user_id)
@@ -0,0 +1,97 @@
+import smtplib
+
+from flask import current_app
+from sqlalchemy import select
+
+from jobs import Retry, jobs
+from models import db, Event, User
+
+# Events listed in full in one email; a larger batch import ends with a count of the rest
+MAX_LISTED_EVENTS = 10
+
+
+def events_created(session, event_ids, organizer):
+    """Email the organizer's neighbours about new events once ``session`` commits, if ``MAIL_NOTIFICATIONS`` is on.
+
+    Only a job is queued here; finding the recipients and sending happens in
+    ``flask jobs work``, so creating an event costs the same for a
+    neighbourhood of ten people as for one of ten thousand.
+    """
+    if event_ids and organizer.neighborhood and current_app.config.get('MAIL_NOTIFICATIONS'):
+        jobs.enqueue_after_commit(session, 'notify_new_events', {
+            "event_ids": list(event_ids),
+            "neighborhood": organizer.neighborhood,
+            "organizer_id": organizer.user_id,
+        })
+
+
+@jobs.task
+def notify_new_events(event_ids, neighborhood, organizer_id):
+    """Split the neighbourhood's users into batches of ``NOTIFY_BATCH_SIZE`` and queue one email job per batch."""
+    batch_size = int(current_app.config.get('NOTIFY_BATCH_SIZE', 500))
+    recipients = db.session.execute(
+        select(User.email, User.name)
+        .where(User.neighborhood == neighborhood, User.user_id != organizer_id)
+        .order_by(User.user_id)
+        .execution_options(yield_per=batch_size)
+    )
+    # Queued in one transaction, so a retry of this job cannot email anyone twice
+    jobs.enqueue_many('send_event_emails', [
+        {"event_ids": event_ids, "neighborhood": neighborhood, "recipients": [list(row) for row in batch]}
+        for batch in recipients.partitions()
+    ])
+
+
+@jobs.task
+def send_event_emails(event_ids, neighborhood, recipients):
+    """Email one batch of recipients about new events over a single SMTP connection.
+
+    Addresses the server refuses are logged and skipped. If the connection
+    fails, the job is retried for the recipients that were not sent to yet;
+    an attempt that got any email out does not use up one of the job's attempts.
+    """
+    from flask_mail import Message
+
+    events = db.session.scalars(select(Event).where(Event.event_id.in_(event_ids)).order_by(Event.date)).all()
+    if not events:
+        return
+    subject, body = render(events, neighborhood)
+
+    sent = 0
+    try:
+        with mailer().connect() as connection:
+            for email, name in recipients:
+                try:
+                    connection.send(Message(subject, recipients=[email], body=f"Hi {name},\n\n{body}"))
+                except smtplib.SMTPRecipientsRefused:
+                    current_app.logger.warning('Notification to %s refused', email)
+                sent += 1
+    except (smtplib.SMTPException, OSError) as e:
+        if sent < len(recipients):
+            raise Retry(f'{type(e).__name__} after {sent} of {len(recipients)} emails: {e}', {
+                "event_ids": event_ids, "neighborhood": neighborhood, "recipients": recipients[sent:],
+            }, progress=sent > 0)
+
+
+def render(events, neighborhood):
+    """The subject and body of a new-events email."""
+    if len(events) == 1:
+        subject = f"New event in {neighborhood}: {events[0].title}"
+    else:
+        subject = f"{len(events)} new events in {neighborhood}"
+    lines = [f"{'A new event is' if len(events) == 1 else 'New events are'} coming up in {neighborhood}:", ""]
+    for event in events[:MAX_LISTED_EVENTS]:
+        lines += [event.title, f"{event.date:%A %d %B %Y} at {event.location}", event.description, ""]
+    if len(events) > MAX_LISTED_EVENTS:
+        lines += [f"...and {len(events) - MAX_LISTED_EVENTS} more.", ""]
+    return subject, "\n".join(lines)
+
+
+def mailer():
+    """The app's Flask-Mail extension, set up on first use; flask_mail is only imported by job workers."""
+    from flask_mail import Mail
+
+    mail = Mail()
+    if 'mail' not in current_app.extensions:
+        mail.init_app(current_app)
+    return mail
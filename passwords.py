@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import TimeoutError
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool queue is full; answered with a 429."""
+
+
+def hash_password(password, rounds):
+    """bcrypt ``password`` at cost ``rounds`` in the calling process; also picklable for process pools."""
+    import bcrypt  # Imported on first use, keeping it out of application startup
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password(hashed, password):
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_rounds(hashed):
+    """Return the cost factor stored in a ``$2b$<rounds>$...`` hash, or None."""
+    parts = hashed.split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded process pool instead of the request thread.
+
+    At most ``PASSWORD_HASH_MAX_PENDING`` hashes may be queued or running at
+    once; beyond that ``HasherBusy`` is raised so the route can shed load with
+    a 429 instead of letting a login burst starve every other request.
+    Setting ``PASSWORD_HASH_WORKERS`` to 0 hashes inline on the caller.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 4 * app.config['PASSWORD_HASH_WORKERS'])
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+
+        self.rounds = int(app.config['BCRYPT_LOG_ROUNDS'])
+        self.workers = int(app.config['PASSWORD_HASH_WORKERS'])
+        self.timeout = float(app.config['PASSWORD_HASH_TIMEOUT'])
+        self._slots = threading.BoundedSemaphore(max(1, int(app.config['PASSWORD_HASH_MAX_PENDING'])))
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        # Created lazily so every forked server worker gets its own pool
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._executor is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy()
+
+    async def _run_async(self, fn, *args):
+        # Same bounded pool, but the event loop awaits the result instead of a thread blocking on it
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy()
+
+    def generate_password_hash(self, password):
+        return self._run(hash_password, password, self.rounds)
+
+    def check_password_hash(self, hashed, password):
+        return self._run(check_password, hashed, password)
+
+    async def generate_password_hash_async(self, password):
+        return await self._run_async(hash_password, password, self.rounds)
+
+    async def check_password_hash_async(self, hashed, password):
+        return await self._run_async(check_password, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """True when ``hashed`` was made with a cost other than the configured one."""
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,187 @@
+import itertools
+import json
+import threading
+from collections import defaultdict, deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class Subscription:
+    """One connection's bounded queue of ``(message_id, event, data)`` messages.
+
+    A consumer that falls ``maxsize`` messages behind is evicted instead of
+    letting its backlog grow: the queue is dropped and the connection is
+    told to reconnect, so one stalled client cannot hold memory for every
+    message published after it stopped reading.
+    """
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.maxsize = maxsize
+        self.evicted = False
+        self._messages = deque()
+        self._ready = threading.Condition()
+
+    def put(self, message):
+        """Queue a message; returns False if the subscription is (now) evicted."""
+        with self._ready:
+            if self.evicted:
+                return False
+            if len(self._messages) >= self.maxsize:
+                self.evicted = True
+                self._messages.clear()
+                self._ready.notify()
+                return False
+            self._messages.append(message)
+            self._ready.notify()
+            return True
+
+    def get(self, timeout):
+        """Return the next message, or None after ``timeout`` seconds or once evicted."""
+        with self._ready:
+            if not self._messages and not self.evicted:
+                self._ready.wait(timeout)
+            return self._messages.popleft() if self._messages else None
+
+
+class InMemoryBackend:
+    """Delivers straight to this process's subscribers; enough for a single worker."""
+
+    def __init__(self, dispatch):
+        self._dispatch = dispatch
+
+    def publish(self, channel, event_name, data):
+        self._dispatch(channel, event_name, data)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Relays messages through a Redis-compatible server so subscribers on every worker see them.
+
+    Each worker runs one listener thread, started with its first
+    subscriber, that pattern-subscribes to every channel and hands messages
+    to the local subscriptions. Needs the optional ``redis`` package.
+    """
+
+    prefix = 'neighborhood-social:'
+
+    def __init__(self, url, dispatch):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PUBSUB_URL requires the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self._dispatch = dispatch
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def publish(self, channel, event_name, data):
+        self._client.publish(self.prefix + channel, json.dumps([event_name, data]))
+
+    def start(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{self.prefix + '*': self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, message):
+        channel = message['channel'].decode('utf-8')[len(self.prefix):]
+        event_name, data = json.loads(message['data'])
+        self._dispatch(channel, event_name, data)
+
+
+class Broker:
+    """Channel-based pub/sub for Server-Sent Events.
+
+    Publishers call ``publish`` (or ``publish_after_commit`` from inside a
+    transaction); each subscriber gets its own bounded ``Subscription``.
+    ``PUBSUB_URL`` selects the Redis backend for multi-worker deployments;
+    without it messages stay in-process.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._ids = itertools.count(1)
+        self._counters = defaultdict(int)
+        self.backend = InMemoryBackend(self._dispatch)
+        self.queue_size = 256
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PUBSUB_URL', None)
+        app.config.setdefault('SSE_QUEUE_SIZE', 256)
+        app.config.setdefault('SSE_KEEPALIVE', 15)
+
+        self.queue_size = int(app.config['SSE_QUEUE_SIZE'])
+        url = app.config['PUBSUB_URL']
+        self.backend = RedisBackend(url, self._dispatch) if url else InMemoryBackend(self._dispatch)
+        if not event.contains(Session, 'after_commit', _publish_pending):
+            event.listen(Session, 'after_commit', _publish_pending)
+            event.listen(Session, 'after_rollback', _discard_pending)
+        app.extensions['pubsub'] = self
+
+    def subscribe(self, channel):
+        self.backend.start()
+        subscription = Subscription(channel, self.queue_size)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, event_name, data):
+        """Send ``data`` (an already encoded JSON string) to every subscriber of ``channel``."""
+        self.backend.publish(channel, event_name, data)
+
+    def publish_after_commit(self, session, channel, event_name, data):
+        """Publish once ``session`` commits, so subscribers never see rows that were rolled back."""
+        session.info.setdefault('pubsub_pending', []).append((self, channel, event_name, data))
+
+    def _dispatch(self, channel, event_name, data):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        message = (next(self._ids), event_name, data)
+        delivered = evicted = 0
+        for subscription in subscribers:
+            if subscription.put(message):
+                delivered += 1
+            else:
+                evicted += 1
+                self.unsubscribe(subscription)
+        with self._lock:
+            self._counters['published'] += 1
+            self._counters['delivered'] += delivered
+            self._counters['evicted'] += evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'channels': len(self._subscriptions),
+                'subscribers': sum(len(s) for s in self._subscriptions.values()),
+                **self._counters
+            }
+
+
+broker = Broker()
+
+
+def _publish_pending(session):
+    for owner, channel, event_name, data in session.info.pop('pubsub_pending', ()):
+        owner.publish(channel, event_name, data)
+
+
+def _discard_pending(session):
+    session.info.pop('pubsub_pending', None)
@@ -0,0 +1,197 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from bloom import BloomFilter
+from caching import TTLCache
+from models import db, RevokedToken
+from writer import writer
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _unexpired(now):
+    return or_(RevokedToken.expires_at.is_(None), RevokedToken.expires_at >= now)
+
+
+def insert_revoked(session, jti, expires_at):
+    """``writer.run`` job: record a revoked token."""
+    session.execute(insert(RevokedToken).values(jti=jti, expires_at=expires_at))
+
+
+def delete_expired(session, now):
+    """``writer.run`` job: drop revocations of tokens that have expired anyway; returns how many."""
+    return session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now)).rowcount
+
+
+class RevocationStore:
+    """Answers "has this token been revoked?" for every authenticated request.
+
+    Revoked ``jti``s are stored in ``revoked_tokens`` until the token would
+    have expired anyway. Each process keeps a Bloom filter of them, so a
+    token that was never revoked (nearly every request) is accepted without
+    any I/O. A filter hit is confirmed against the table and the answer is
+    cached for ``REVOCATION_REFRESH`` seconds.
+
+    A background thread per process builds the filter, tops it up every
+    ``REVOCATION_REFRESH`` seconds with rows other workers added
+    (``revoked_id`` above the last one seen), and every
+    ``REVOCATION_COMPACT_INTERVAL`` seconds deletes expired rows and
+    rebuilds the filter without them, since a Bloom filter cannot forget.
+    A worker sees its own revocations at once and other workers' within
+    ``REVOCATION_REFRESH`` seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._filter = None
+        self._watermark = 0
+        self._entries = 0
+        self._sized_for = 0
+        # Revoked here since the filter was last rebuilt; a rebuild that read the table before they committed re-adds them
+        self._recent = set()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REVOCATION_FILTER_CAPACITY', 100000)
+        app.config.setdefault('REVOCATION_REFRESH', 5)
+        app.config.setdefault('REVOCATION_COMPACT_INTERVAL', 3600)
+
+        self.capacity = int(app.config['REVOCATION_FILTER_CAPACITY'])
+        self.refresh_interval = float(app.config['REVOCATION_REFRESH'])
+        self.compact_interval = float(app.config['REVOCATION_COMPACT_INTERVAL'])
+        self._confirmed = TTLCache(10000, self.refresh_interval)
+        with self._lock:
+            # A thread left over from an earlier init_app notices the new app and exits
+            self.app = app
+            self._filter = None
+            self._recent.clear()
+            self._ready = threading.Event()
+            self._thread = None
+        app.extensions['revocation_store'] = self
+
+    def _start(self):
+        # Started lazily so every forked server worker gets its own
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._maintain, args=(self.app,), name='revocation-refresh',
+                                                daemon=True)
+                self._thread.start()
+
+    def _maintain(self, app):
+        compacted_at = time.monotonic()
+        while self.app is app:
+            try:
+                with app.app_context():
+                    if self._filter is None:
+                        self.rebuild()
+                    elif time.monotonic() - compacted_at >= self.compact_interval:
+                        self.compact()
+                        compacted_at = time.monotonic()
+                    else:
+                        self.refresh()
+            except Exception:
+                app.logger.exception('Refreshing the token revocation filter failed')
+            time.sleep(self.refresh_interval)
+
+    def _load_since(self, bloom, watermark, now):
+        rows = db.session.execute(
+            select(RevokedToken.revoked_id, RevokedToken.jti)
+            .where(RevokedToken.revoked_id > watermark, _unexpired(now))
+            .execution_options(yield_per=10000)
+        )
+        added = 0
+        for revoked_id, jti in rows:
+            bloom.add(jti)
+            watermark = max(watermark, revoked_id)
+            added += 1
+        return watermark, added
+
+    def rebuild(self):
+        """Rebuild the filter from every unexpired row in ``revoked_tokens``."""
+        now = _utcnow()
+        live = db.session.scalar(select(db.func.count()).select_from(RevokedToken).where(_unexpired(now)))
+        # Leave room to grow, so the false-positive rate holds until the next compaction
+        sized_for = max(self.capacity, 2 * live)
+        bloom = BloomFilter(sized_for)
+        watermark, added = self._load_since(bloom, 0, now)
+        with self._lock:
+            for jti in self._recent:
+                bloom.add(jti)
+            self._recent.clear()
+            self._filter, self._watermark, self._entries, self._sized_for = bloom, watermark, added, sized_for
+        self._confirmed.clear()
+        self._ready.set()
+
+    def refresh(self):
+        """Add revocations recorded since the last refresh, by this or any other worker."""
+        watermark, added = self._load_since(self._filter, self._watermark, _utcnow())
+        with self._lock:
+            self._watermark = max(self._watermark, watermark)
+            self._entries += added
+        if self._entries > self._sized_for:
+            self.rebuild()
+
+    def compact(self):
+        """Delete expired revocations and rebuild the filter; returns how many rows were deleted."""
+        deleted = writer.run(delete_expired, _utcnow())
+        self.rebuild()
+        return deleted
+
+    def revoked_cached(self, jti):
+        """The answer for ``jti`` if it can be given without I/O, otherwise None."""
+        self._start()
+        bloom = self._filter
+        if bloom is None:
+            return None
+        if jti not in bloom:
+            return False
+        return self._confirmed.get(jti)
+
+    def is_revoked(self, jti):
+        """True if the token with this ``jti`` has been revoked; may query ``revoked_tokens``."""
+        revoked = self.revoked_cached(jti)
+        if revoked is not None:
+            return revoked
+        if self._filter is None:
+            # Only until this process has loaded its filter; should that keep failing, ask the table every time
+            self._ready.wait(self.refresh_interval)
+        bloom = self._filter
+        if bloom is not None and jti not in bloom:
+            return False
+
+        # A filter hit: either revoked or a false positive, which the table tells apart
+        revoked = db.session.scalar(select(RevokedToken.revoked_id).where(RevokedToken.jti == jti)) is not None
+        self._confirmed.set(jti, revoked)
+        return revoked
+
+    def revoke(self, jti, expires_at=None):
+        """Revoke a token until ``expires_at`` (naive UTC; None keeps the row until it is deleted by hand)."""
+        try:
+            writer.run(insert_revoked, jti, expires_at)
+        except IntegrityError:
+            # Already revoked, e.g. by a concurrent logout with the same token
+            pass
+        with self._lock:
+            self._recent.add(jti)
+            if self._filter is not None:
+                # Counted in entries by the next refresh, which reads the row back
+                self._filter.add(jti)
+        self._confirmed.set(jti, True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': self._entries,
+                'filter_bytes': len(self._filter.bits) if self._filter is not None else 0,
+            }
+
+
+revocations = RevocationStore()
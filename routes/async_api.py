@@ -0,0 +1,250 @@
+"""Async variants of the hot auth, event and post routes, served natively by ``asgi.application``.
+
+They share validation, serialization and caches with the Flask views but
+run their SQL on the asyncio engine (``asyncdb.adb``) and await bcrypt on
+the hashing pool, so a worker keeps serving other requests while they
+wait. Every other route falls through to the Flask app.
+"""
+import asyncio
+import functools
+from urllib.parse import parse_qsl
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import ExpiredSignatureError, PyJWTError
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.routing import Rule
+
+from accounts import credentials, identities, normalize_email
+from asyncdb import adb
+from httpcache import responses
+from models import User, Post
+from pagination import InvalidCursor
+from passwords import hasher
+from revocation import revocations
+from routes.auth import registration_fields
+from routes.event import (
+    WITH_ORGANIZER, build_event, event_statement, events_page, events_page_statement, publish_event
+)
+from routes.post import post_fields, publish_post
+from serialization import event_schema
+
+
+class JSONError(Exception):
+    """Ends a handler with a JSON error response."""
+
+    def __init__(self, status, body, headers=None):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the handlers need, with Flask-like accessors."""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']])
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        self.body = body
+
+    def get_json(self):
+        """The JSON body, or None if it is missing or malformed."""
+        try:
+            return current_app.json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+    @property
+    def form(self):
+        if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            return MultiDict(parse_qsl(self.body.decode('utf-8'), keep_blank_values=True))
+        return MultiDict()
+
+    @property
+    def environ(self):
+        # Just enough of a WSGI environ for werkzeug's conditional-request helpers
+        environ = {'REQUEST_METHOD': self.method}
+        for name, value in self.headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        return environ
+
+
+def cached(endpoint, *tags):
+    """``responses.cached`` for async handlers; ``endpoint`` matches the Flask view so both share entries."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, **view_args):
+            if not responses.enabled:
+                return await handler(request, **view_args)
+            key, response = responses.lookup(endpoint, view_args, request.args.items(multi=True), tags,
+                                             'no-cache', request.environ)
+            if response is None:
+                rendered = current_app.make_response(await handler(request, **view_args))
+                response = responses.store(endpoint, key, rendered, 'no-cache', request.environ)
+            return response
+        return wrapper
+    return decorator
+
+
+async def authenticate(request, endpoint):
+    """Resolve the request's access token to a CachedUser, like ``@jwt_required`` plus ``current_user``."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        raise JSONError(401, {"msg": "Missing Authorization Header"})
+    try:
+        claims = decode_token(header[len('Bearer '):])
+    except ExpiredSignatureError:
+        raise JSONError(401, {"msg": "Token has expired"})
+    except (PyJWTError, JWTExtendedException) as e:
+        raise JSONError(422, {"msg": str(e)})
+    if claims.get('type') != 'access':
+        raise JSONError(422, {"msg": "Only non-refresh tokens are allowed"})
+    # Answered from the in-process filter unless the token might be revoked
+    revoked = revocations.revoked_cached(claims['jti'])
+    if revoked is None:
+        revoked = await asyncio.to_thread(revocations.is_revoked, claims['jti'])
+    if revoked:
+        raise JSONError(401, {"msg": "Token has been revoked"})
+
+    user = identities.cached(claims['sub'], endpoint)
+    if user is None:
+        async with adb.session() as session:
+            row = await session.get(User, int(claims['sub']))
+        if row is None:
+            raise JSONError(401, {"msg": f"Error loading the user {claims['sub']}"})
+        user = identities.remember(row)
+    return user
+
+
+async def login(request):
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return {'message': 'Invalid credentials'}, 401
+    email = normalize_email(data.get('email'))
+    password = data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str):
+        return {'message': 'Invalid credentials'}, 401
+
+    # Cached credentials and the negative email filter answer most logins without any query
+    account = credentials.cached(email)
+    if account is None and await asyncio.to_thread(credentials.might_exist, email):
+        async with adb.session() as session:
+            user = (await session.scalars(select(User).where(func.lower(User.email) == email))).first()
+        if user is not None:
+            account = credentials.remember(user)
+
+    if account and await hasher.check_password_hash_async(account[1], password):
+        user_id, hashed_password = account
+
+        # Transparently upgrade hashes made with a different BCRYPT_LOG_ROUNDS
+        if hasher.needs_rehash(hashed_password):
+            new_hash = await hasher.generate_password_hash_async(password)
+            async with adb.session() as session:
+                user = await session.get(User, user_id)
+                user.password = new_hash
+                await session.commit()
+            credentials.remember(user)
+            identities.evict(user_id)
+
+        return {'message': 'Login successful!', 'access_token': create_access_token(identity=str(user_id))}, 200
+
+    return {'message': 'Invalid credentials'}, 401
+
+
+async def register(request):
+    try:
+        fields = registration_fields(request.get_json())
+    except ValueError as e:
+        return {'message': str(e)}, 400
+    new_user = User(**{**fields, 'password': await hasher.generate_password_hash_async(fields['password'])})
+
+    # Rely on the unique lower(email) index instead of a racy read-then-insert
+    async with adb.session() as session:
+        session.add(new_user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            return {'message': 'Email already exists'}, 400
+
+    credentials.remember(new_user)
+    return {'message': 'Account created successfully!'}, 201
+
+
+@cached('event.view_events', 'events')
+async def view_events(request):
+    try:
+        statement, limit = events_page_statement(request.args)
+        serialize = event_schema.select(request.args.get('fields'), WITH_ORGANIZER)
+    except (InvalidCursor, ValueError) as e:
+        return {"error": str(e)}, 400
+
+    async with adb.session() as session:
+        events = (await session.scalars(statement)).all()
+    return events_page(events, limit, serialize), 200
+
+
+@cached('event.view_event', 'events')
+async def view_event(request, event_id):
+    try:
+        serialize = event_schema.select(request.args.get('fields'), WITH_ORGANIZER)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    async with adb.session() as session:
+        event = (await session.scalars(event_statement(event_id))).first()
+    if not event:
+        return {"error": "Event not found"}, 404
+    return serialize(event), 200
+
+
+async def create_event(request):
+    organizer = await authenticate(request, 'event.create_event')
+    try:
+        new_event = build_event(request.get_json(), organizer.user_id)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    async with adb.session() as session:
+        try:
+            session.add(new_event)
+            await session.flush()
+            # Feed row, live update and cache invalidation hook into the wrapped sync session's commit
+            publish_event(session.sync_session, new_event, organizer)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            return {"error": str(e)}, 500
+
+    return {"message": "Event created successfully", "event_id": new_event.event_id}, 201
+
+
+async def create_post(request):
+    author = await authenticate(request, 'post.create_post')
+    try:
+        new_post = Post(**post_fields(request.get_json() or request.form), created_by_id=author.user_id)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    async with adb.session() as session:
+        session.add(new_post)
+        await session.flush()
+        publish_post(session.sync_session, new_post, author)
+        await session.commit()
+
+    return {"message": "Post created successfully!", "post_id": new_post.post_id}, 201
+
+
+rules = [
+    Rule('/login', methods=['POST'], endpoint=login),
+    Rule('/register', methods=['POST'], endpoint=register),
+    Rule('/events/view', methods=['GET'], endpoint=view_events),
+    Rule('/events/<int:event_id>', methods=['GET'], endpoint=view_event),
+    Rule('/events/create', methods=['POST'], endpoint=create_event),
+    Rule('/posts', methods=['POST'], endpoint=create_post),
+]
@@ -1,25 +1,60 @@
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     jwt_required,
-    get_jwt_identity
+    get_jwt,
+    get_jwt_identity,
+    current_user
 )
-from models import db, User
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+import geo
+from models import User
+from accounts import credentials, identities, normalize_email
+from httpcache import responses
+from passwords import HasherBusy, hasher
+from instrumentation import query_budget
+from revocation import revocations
+from trending import rankings
+from writer import WriterBusy, writer
 
 auth_bp = Blueprint('auth', __name__)
-bcrypt = Bcrypt()
+
+@auth_bp.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Password hashing pool is saturated; ask the client to back off
+    return jsonify({'message': 'Too many authentication requests, please retry shortly'}), 429, {'Retry-After': '1'}
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Invalid credentials'}), 401
     email = data.get('email')
     password = data.get('password')
-    
-    user = User.query.filter_by(email=email).first()
-    if user and bcrypt.check_password_hash(user.password, password):
-        access_token = create_access_token(identity=str(user.user_id))
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({'message': 'Invalid credentials'}), 401
+
+    # Served from the credential cache; unknown emails never reach the database
+    account = credentials.lookup(email)
+    if account and hasher.check_password_hash(account[1], password):
+        user_id, hashed_password = account
+
+        # Transparently upgrade hashes made with a different BCRYPT_LOG_ROUNDS
+        if hasher.needs_rehash(hashed_password):
+            new_hash = hasher.generate_password_hash(password)
+            try:
+                writer.run(update_password, user_id, new_hash)
+            except WriterBusy:
+                # The old hash still works; the upgrade is retried on a later login
+                pass
+            else:
+                credentials.remember(User(user_id=user_id, email=email, password=new_hash))
+                identities.evict(user_id)
+
+        access_token = create_access_token(identity=str(user_id))
         # refresh_token = create_refresh_token(identity=user.user_id)
         return jsonify({
             'message': 'Login successful!',
@@ -29,21 +64,53 @@ def login():
     
     return jsonify({'message': 'Invalid credentials'}), 401
 
+def update_password(session, user_id, password_hash):
+    """``writer.run`` job: replace a user's password hash."""
+    session.execute(update(User).where(User.user_id == user_id).values(password=password_hash))
+
+
+def insert_user(session, user):
+    """``writer.run`` job: insert a new user; returns its id."""
+    session.add(user)
+    session.flush()
+    return user.user_id
+
+
+def registration_fields(data):
+    """Validate a registration payload into column values, the password still in clear; raises ``ValueError``."""
+    if not isinstance(data, dict):
+        raise ValueError('Invalid request data')
+    name, email, password = data.get('name'), data.get('email'), data.get('password')
+    if not all(isinstance(value, str) and value.strip() for value in (name, email, password)):
+        raise ValueError('Name, email and password are required')
+    neighborhood = data.get('neighborhood')
+    if neighborhood is not None:
+        if not isinstance(neighborhood, str) or not neighborhood.strip() or len(neighborhood.strip()) > 100:
+            raise ValueError('neighborhood must be a non-empty string of at most 100 characters')
+        neighborhood = neighborhood.strip()
+    latitude, longitude = geo.parse_coordinates(data.get('latitude'), data.get('longitude'))
+    return {'name': name, 'email': normalize_email(email), 'password': password, 'neighborhood': neighborhood,
+            'latitude': latitude, 'longitude': longitude}
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
-    data = request.get_json()
-    name = data.get('name')
-    email = data.get('email')
-    password = data.get('password')
+    try:
+        fields = registration_fields(request.get_json())
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    if User.query.filter_by(email=email).first():
+    password = hasher.generate_password_hash(fields['password'])
+
+    # Rely on the unique lower(email) index instead of a racy read-then-insert
+    try:
+        user_id = writer.run(insert_user, User(**{**fields, 'password': password}))
+    except IntegrityError:
         return jsonify({'message': 'Email already exists'}), 400
+    except WriterBusy:
+        return jsonify({'message': 'Too many writes in progress, please retry shortly'}), 429, {'Retry-After': '1'}
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-    new_user = User(name=name, email=email, password=hashed_password)
-    
-    db.session.add(new_user)
-    db.session.commit()
+    # The inserted User belongs to the writer's session; the cache only needs these three values
+    credentials.remember(User(user_id=user_id, email=fields['email'], password=password))
 
     return jsonify({'message': 'Account created successfully!'}), 201
 
@@ -51,10 +118,16 @@ def register():
 @jwt_required()
 def logout():
     user_id = get_jwt_identity()  # Get user identity from JWT token
-    print(request.headers)
     if not user_id:
         return jsonify({'error': 'Unauthorized'}), 400
 
+    # Revoked until the token would have expired anyway; every later request with it gets a 401
+    claims = get_jwt()
+    expires_at = datetime.fromtimestamp(claims['exp'], timezone.utc).replace(tzinfo=None) if 'exp' in claims else None
+    try:
+        revocations.revoke(claims['jti'], expires_at)
+    except WriterBusy:
+        return jsonify({'error': 'Too many writes in progress, please retry shortly'}), 429, {'Retry-After': '1'}
 
     return jsonify({'message': 'Logout successful!'}), 200
 
@@ -62,7 +135,11 @@ def logout():
 
 @auth_bp.route('/protected', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def protected():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    return jsonify({'message': f'Hello, {user.name}! This is a protected route.'}), 200
+    return jsonify({'message': f'Hello, {current_user.name}! This is a protected route.'}), 200
+
+@auth_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'identity_cache': identities.stats(), 'response_cache': responses.stats(),
+                    'revocations': revocations.stats(), 'trending': rankings.stats()}), 200
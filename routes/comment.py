@@ -0,0 +1,128 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy import select
+import comments
+import trending
+from httpcache import responses
+from instrumentation import query_budget
+from models import db, Comment, Post
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from writer import WriterBusy, writer
+
+comment_bp = Blueprint('comment', __name__)
+
+
+def serialize_comment(comment):
+    """Serialize a Comment with its author; load ``Comment.author`` with ``joinedload`` first."""
+    return {
+        "id": comment.comment_id,
+        "post_id": comment.post_id,
+        "parent_id": comment.parent_id,
+        "depth": comment.depth,
+        "content": comment.content,
+        "created_at": comment.created_at,
+        "reply_count": comment.reply_count,
+        "author": {"id": comment.author.user_id, "name": comment.author.name}
+    }
+
+
+def _bounded_int(name, default, maximum):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return max(0, min(int(value), maximum))
+    except ValueError:
+        raise InvalidCursor(f'{name} must be an integer')
+
+
+def _thread(post_id):
+    """One page of a post's comments; ``replies`` or ``depth`` switch to the pruned tree view."""
+    limit = parse_limit(request.args.get('limit'))
+    after = decode_cursor(request.args['cursor'], str)[0] if request.args.get('cursor') else None
+
+    if 'replies' in request.args or 'depth' in request.args:
+        replies = _bounded_int('replies', comments.DEFAULT_REPLIES, comments.MAX_REPLIES)
+        depth = _bounded_int('depth', comments.DEFAULT_TREE_DEPTH, comments.MAX_TREE_DEPTH)
+        # Pages are counted in top-level comments, so the cursor is the last of those
+        page_rows, rows = comments.tree(post_id, limit, after, replies, depth)
+    else:
+        page_rows = rows = comments.page(post_id, limit, after)
+
+    next_cursor = encode_cursor(page_rows[-1].path) if len(page_rows) == limit else None
+    return {"comments": [serialize_comment(c) for c in rows], "next_cursor": next_cursor}
+
+
+def insert_comment(session, post_id, author_id, content, parent_id):
+    """``writer.run`` job: add a comment or reply; returns its id.
+
+    Raises ``LookupError`` if the post (or the parent comment) does not exist.
+    """
+    if parent_id is None and session.get(Post, post_id) is None:
+        raise LookupError("Post not found")
+
+    comment = comments.add(post_id, author_id, content, parent_id)
+    trending.record_for('comment', 'post', post_id, session=session)
+    responses.invalidate_after_commit(session, f'comments:{post_id}')
+    return comment.comment_id
+
+@comment_bp.route('/posts/<int:post_id>/comment', methods=['POST'])
+@jwt_required()
+def create_comment(post_id):
+    try:
+        data = request.get_json(silent=True) or request.form
+        content = data.get('content')
+        parent_id = data.get('parent_id')
+        if not content:
+            return jsonify({"error": "Content is required"}), 400
+        if not isinstance(content, str):
+            return jsonify({"error": "Content must be a string"}), 400
+
+        try:
+            comment_id = writer.run(insert_comment, post_id, current_user.user_id, content,
+                                    int(parent_id) if parent_id is not None else None)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except WriterBusy:
+            return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+
+        return jsonify({"message": "Comment added", "comment_id": comment_id}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@comment_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+@query_budget(2 + comments.MAX_TREE_DEPTH)
+@responses.cached('comments:{post_id}')
+def view_thread(post_id):
+    try:
+        result = _thread(post_id)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    # An empty first page is the only case that needs to tell "no comments" from "no post"
+    if not result["comments"] and 'cursor' not in request.args and db.session.get(Post, post_id) is None:
+        return jsonify({"error": "Post not found"}), 404
+    return jsonify(result), 200
+
+@comment_bp.route('/comments/<int:comment_id>/replies', methods=['GET'])
+@query_budget(2)
+def view_replies(comment_id):
+    """Every reply below one comment, in thread order, e.g. to expand a pruned branch."""
+    root = db.session.execute(
+        select(Comment.post_id, Comment.path).where(Comment.comment_id == comment_id)
+    ).first()
+    if root is None:
+        return jsonify({"error": "Comment not found"}), 404
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args['cursor'], str)[0] if request.args.get('cursor') else None
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = comments.page(root.post_id, limit, after, root.path)
+    next_cursor = encode_cursor(rows[-1].path) if len(rows) == limit else None
+    return jsonify({"comments": [serialize_comment(c) for c in rows], "next_cursor": next_cursor}), 200
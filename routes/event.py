@@ -1,85 +1,347 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Event
-from datetime import datetime
+from flask_jwt_extended import jwt_required, current_user, get_current_user
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.orm import joinedload
+from models import db, Event, RSVP
+from export import export_client_required, export_format, stream_rows
+import bulk
+import feed
+import geo
+import notifications
+import trending
+from httpcache import responses
+from instrumentation import query_budget
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from serialization import event_schema, user_schema
+from writer import WriterBusy, writer
+from datetime import datetime, timedelta
 
 event_bp = Blueprint('event', __name__)
 
+EVENT_EXPORT_COLUMNS = (
+    Event.event_id, Event.title, Event.description,
+    Event.date, Event.location, Event.latitude, Event.longitude, Event.organizer_id, Event.attendee_count
+)
+
+MAX_NEARBY_RADIUS_KM = 50
+
+
+# Nested objects the event routes embed, and may be left out with ?fields=
+WITH_ORGANIZER = ('organizer',)
+
+serialize_organizer = user_schema.compile()
+_serialize_event = event_schema.compile()
+_serialize_event_with_organizer = event_schema.compile(expand=WITH_ORGANIZER)
+
+
+def serialize_event(event, with_organizer=False):
+    """Serialize an Event (or a row selected with its columns) for the API.
+
+    ``with_organizer`` embeds the organizer; load it with ``joinedload`` first
+    or every event will issue its own query. Routes serializing many events
+    take the compiled function from ``event_schema`` once instead.
+    """
+    return (_serialize_event_with_organizer if with_organizer else _serialize_event)(event)
+
+
+def parse_event_date(value):
+    """Parse a ``YYYY-MM-DD`` event date; raises ``ValueError`` like ``strptime``."""
+    if not isinstance(value, str):
+        raise ValueError("date must be YYYY-MM-DD")
+    # fromisoformat is C code and far cheaper than strptime, which matters for batch imports
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def event_fields(data):
+    """Validate a create-event payload into column values; raises ``ValueError`` with a client-facing message."""
+    if not data or not isinstance(data, dict):
+        raise ValueError("Invalid request data")
+
+    title = data.get('title')
+    description = data.get('description')
+    date = data.get('date')
+    location = data.get('location')
+
+    if not all([title, description, date, location]):
+        raise ValueError("All fields are required")
+    if not all(isinstance(value, str) for value in (title, description, location)):
+        raise ValueError("title, description and location must be strings")
+    latitude, longitude = geo.parse_coordinates(data.get('latitude'), data.get('longitude'))
+
+    return {
+        "title": title,
+        "description": description,
+        "date": parse_event_date(date),
+        "location": location,
+        "latitude": latitude,
+        "longitude": longitude,
+        "geohash": geo.geohash(latitude, longitude) if latitude is not None else None,
+    }
+
+
+def build_event(data, organizer_id):
+    """Validate a create-event payload into a new Event; raises ``ValueError`` with a client-facing message."""
+    return Event(**event_fields(data), organizer_id=organizer_id)
+
+
+def publish_event(session, event, organizer):
+    """Queue a flushed new event's feed row, live update, notification emails and cache invalidation on ``session``."""
+    # Fan out to the organizer's neighbourhood feed in the same transaction, and stream it once committed
+    feed.fan_out('event', event.event_id, organizer.neighborhood, event.created_at, session=session)
+    feed.announce('event', {**serialize_event(event), "organizer": serialize_organizer(organizer)},
+                  organizer.neighborhood, session=session)
+    trending.record('event', 'event', event.event_id, organizer.neighborhood, session=session,
+                    created_at=event.created_at)
+    notifications.events_created(session, [event.event_id], organizer)
+    responses.invalidate_after_commit(session, 'events', f'feed:{organizer.neighborhood}')
+
+
+def insert_event(session, event, organizer):
+    """``writer.run`` job: insert a new event and publish it; returns its id."""
+    session.add(event)
+    session.flush()
+    publish_event(session, event, organizer)
+    return event.event_id
+
+
+def insert_events(session, rows, organizer):
+    """``writer.run`` job: insert validated events with one multi-row INSERT and publish them; returns their ids."""
+    created_at = datetime.utcnow()
+    # sort_by_parameter_order makes SQLAlchemy fall back to one INSERT per row on SQLite; a single multi-row
+    # INSERT assigns increasing ids in VALUES order, so sorting by id restores the input order
+    events = sorted(session.execute(
+        insert(Event).returning(*EVENT_EXPORT_COLUMNS),
+        [{**row, "organizer_id": organizer.user_id, "created_at": created_at} for row in rows]
+    ).all(), key=lambda row: row.event_id)
+
+    refs = [(event.event_id, created_at) for event in events]
+    feed.fan_out_many('event', refs, organizer.neighborhood, session=session)
+    trending.record_many('event', 'event', refs, organizer.neighborhood, session=session)
+    notifications.events_created(session, [event.event_id for event in events], organizer)
+    if len(events) <= bulk.ANNOUNCE_LIMIT:
+        for event in events:
+            feed.announce('event', {**serialize_event(event), "organizer": serialize_organizer(organizer)},
+                          organizer.neighborhood, session=session)
+    else:
+        # One message instead of a burst that would overflow every subscriber's queue
+        feed.announce('event_batch', {"count": len(events), "organizer": serialize_organizer(organizer)},
+                      organizer.neighborhood, session=session)
+    responses.invalidate_after_commit(session, 'events', f'feed:{organizer.neighborhood}')
+    return [event.event_id for event in events]
+
+
 @event_bp.route('/events/create', methods=['POST'])
 @jwt_required()
 def create_event():
     try:
-        data = request.get_json()  # Extract JSON payload from request
-        user_id = get_jwt_identity()  # Get logged-in user's ID from JWT token
-
-        if not data:
-            return jsonify({"error": "Invalid request data"}), 400
-        
-        # Extract data from the request
-        title = data.get('title')
-        description = data.get('description')
-        date = data.get('date')
-        location = data.get('location')
-
-        if not all([title, description, date, location]):
-            return jsonify({"error": "All fields are required"}), 400
-
-        # Create a new event instance
-        new_event = Event(
-            title=title, 
-            description=description, 
-            date=datetime.strptime(data['date'], "%Y-%m-%d"), 
-            location=location, 
-            organizer_id=user_id
-        )
-        
-        db.session.add(new_event)
-        db.session.commit()
-
-        return jsonify({"message": "Event created successfully", "event_id": new_event.event_id}), 201
-    
+        # Logged-in user, resolved from the identity cache
+        new_event = build_event(request.get_json(), current_user.user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # On SQLite this is committed by the single writer thread, batched with concurrent writes
+        event_id = writer.run(insert_event, new_event, get_current_user())
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({"message": "Event created successfully", "event_id": event_id}), 201
+
+
+@event_bp.route('/events/batch', methods=['POST'])
+@jwt_required()
+def create_events_batch():
+    """Create up to ``bulk.MAX_ITEMS`` events from a JSON array, NDJSON or CSV upload.
+
+    Items are validated in one pass and inserted ``bulk.CHUNK_SIZE`` at a
+    time; the response lists a status per item, in upload order.
+    """
+    try:
+        items = bulk.read_items('events')
+    except bulk.BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    valid, results = bulk.validate(items, event_fields)
+    results += bulk.insert_chunks(valid, insert_events, 'event_id', get_current_user())
+    return bulk.batch_response(results)
+
+
+def events_page_statement(args):
+    """Build the ``/events/view`` query from its arguments; returns ``(statement, limit)``.
+
+    Raises ``InvalidCursor`` or ``ValueError`` for malformed arguments. The
+    statement fetches one row more than ``limit`` so ``events_page`` can tell
+    whether there is a next page.
+    """
+    limit = parse_limit(args.get('limit'))
+    # The organizer is a many-to-one, so joining it keeps the page to a single query
+    statement = select(Event).options(joinedload(Event.organizer)).where(Event.date.isnot(None))
+
+    # Optional server-side filters; each one is backed by a composite index
+    if args.get('organizer_id'):
+        statement = statement.where(Event.organizer_id == int(args['organizer_id']))
+    if args.get('location'):
+        statement = statement.where(Event.location == args['location'])
+    if args.get('start_date'):
+        statement = statement.where(Event.date >= datetime.strptime(args['start_date'], "%Y-%m-%d"))
+    if args.get('end_date'):
+        end = datetime.strptime(args['end_date'], "%Y-%m-%d") + timedelta(days=1)
+        statement = statement.where(Event.date < end)
+
+    # Keyset pagination: continue strictly after the last (date, event_id) seen
+    if args.get('cursor'):
+        last_date, last_id = decode_cursor(args['cursor'], datetime, int)
+        statement = statement.where(or_(
+            Event.date > last_date,
+            and_(Event.date == last_date, Event.event_id > last_id)
+        ))
+    return statement.order_by(Event.date, Event.event_id).limit(limit + 1), limit
+
+
+def events_page(events, limit, serialize=_serialize_event_with_organizer):
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].date, events[-1].event_id)
+    return {"events": [serialize(event) for event in events], "next_cursor": next_cursor}
+
+
+def event_statement(event_id):
+    return select(Event).options(joinedload(Event.organizer)).where(Event.event_id == event_id)
+
 
 @event_bp.route('/events/view', methods=['GET'])
+@query_budget(1)
+@responses.cached('events')
 def view_events():
-    events = Event.query.all()
-    event_list = [
-        {
-            "id": event.event_id,
-            "title": event.title,
-            "description": event.description,
-            "date": event.date,
-            "location": event.location,
-            "organizer_id": event.organizer_id
-        } for event in events
-    ]
-    return jsonify(event_list), 200
+    try:
+        statement, limit = events_page_statement(request.args)
+        serialize = event_schema.select(request.args.get('fields'), WITH_ORGANIZER)
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
 
-@event_bp.route('/events/delete/<int:event_id>', methods=['DELETE'])
-@jwt_required()
-def delete_event(event_id):
+    return jsonify(events_page(db.session.scalars(statement).all(), limit, serialize)), 200
+
+def home_location():
+    """The caller's home coordinates when ``/events/nearby`` is not given ``lat``/``lng``, else None."""
+    user = get_current_user()
+    if request.args.get('lat') or request.args.get('lng') or user is None:
+        return None
+    return user.latitude, user.longitude
+
+
+@event_bp.route('/events/nearby', methods=['GET'])
+@jwt_required(optional=True)
+# Up to geo.MAX_RINGS index queries, the page of events and, on an identity cache miss, the caller
+@query_budget(geo.MAX_RINGS + 2)
+@responses.cached('events', home=home_location)
+def nearby_events():
+    """Events within ``radius_km`` (default 5) of ``lat``/``lng``, nearest first and then by date.
+
+    Without ``lat``/``lng`` the caller's home location is used. ``start_date``
+    and ``end_date`` narrow the dates as in ``/events/view``.
+    """
+    args = request.args
     try:
-        user_id = get_jwt_identity()  # Get the logged-in user's ID
-        event = Event.query.get(event_id)
+        latitude, longitude = geo.parse_coordinates(args.get('lat'), args.get('lng'))
+        if latitude is None:
+            latitude, longitude = home_location() or (None, None)
+        if latitude is None:
+            raise ValueError("lat and lng are required")
+        radius_km = float(args.get('radius_km', 5))
+        if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+            raise ValueError(f"radius_km must be greater than 0 and at most {MAX_NEARBY_RADIUS_KM}")
+        limit = parse_limit(args.get('limit'))
+        start = datetime.strptime(args['start_date'], "%Y-%m-%d") if args.get('start_date') else None
+        end = datetime.strptime(args['end_date'], "%Y-%m-%d") + timedelta(days=1) if args.get('end_date') else None
+        serialize = event_schema.select(args.get('fields'), WITH_ORGANIZER)
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    hits = geo.nearby(latitude, longitude, radius_km, start, end, limit)
+    events = []
+    if hits:
+        statement = select(Event).options(joinedload(Event.organizer)).where(
+            Event.event_id.in_([hit.event_id for hit in hits]))
+        # The index ranks by approximate coordinates; the page is ordered by the exact distances it reports
+        events = sorted(((geo.distance_km(latitude, longitude, event.latitude, event.longitude), event)
+                         for event in db.session.scalars(statement)),
+                        key=lambda pair: (pair[0], pair[1].date or datetime.min, pair[1].event_id))
 
-        if not event:
-            return jsonify({"error": "Event not found"}), 404
+    return jsonify({"events": [{**serialize(event), "distance_km": round(distance, 3)}
+                               for distance, event in events]}), 200
 
-        # Ensure the logged-in user is the organizer of the event
-        # Ensure both are integers (or both strings)
-        if int(event.organizer_id) != int(user_id):
-            return jsonify({"error": "Unauthorized to delete this event"}), 403
+@event_bp.route('/events/<int:event_id>', methods=['GET'])
+@query_budget(1)
+@responses.cached('events')
+def view_event(event_id):
+    try:
+        serialize = event_schema.select(request.args.get('fields'), WITH_ORGANIZER)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    event = db.session.scalars(event_statement(event_id)).first()
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+
+    return jsonify(serialize(event)), 200
 
+@event_bp.route('/events/export', methods=['GET'])
+@jwt_required()
+@export_client_required
+def export_events():
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
+    try:
+        serialize = event_schema.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        db.session.delete(event)
-        db.session.commit()
+    # Select plain columns, only the requested ones, so rows stream without filling the ORM identity map
+    columns = [getattr(Event, event_schema.fields[key]) for key in serialize.fields]
+    statement = select(*columns).order_by(Event.event_id)
+    return stream_rows(statement, serialize, fmt)
 
-        return jsonify({"message": "Event deleted successfully"}), 200
+def remove_event(session, event_id, user_id, neighborhood):
+    """``writer.run`` job: delete one of ``user_id``'s events with its feed rows and RSVPs.
 
+    Raises ``LookupError`` if there is no such event and ``PermissionError``
+    if someone else organizes it.
+    """
+    event = session.get(Event, event_id)
+    if not event:
+        raise LookupError("Event not found")
+    if event.organizer_id != user_id:
+        raise PermissionError("Unauthorized to delete this event")
+
+    feed.remove('event', event.event_id)
+    trending.record('delete', 'event', event.event_id, neighborhood, session=session)
+    session.execute(db.delete(RSVP).where(RSVP.event_id == event.event_id))
+    session.delete(event)
+    responses.invalidate_after_commit(session, 'events', f'feed:{neighborhood}')
+
+@event_bp.route('/events/delete/<int:event_id>', methods=['DELETE'])
+@jwt_required()
+def delete_event(event_id):
+    try:
+        writer.run(remove_event, event_id, current_user.user_id, current_user.neighborhood)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({"message": "Event deleted successfully"}), 200
+
@@ -0,0 +1,48 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+import feed
+from httpcache import responses
+from instrumentation import query_budget
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from routes.event import WITH_ORGANIZER
+from serialization import event_schema, post_schema, serializers
+
+feed_bp = Blueprint('feed', __name__)
+
+@feed_bp.route('/feed', methods=['GET'])
+@jwt_required()
+@query_budget(4)
+# Every reader in a neighbourhood sees the same feed, so they share one cached copy
+@responses.cached('feed:{neighborhood}', 'events', private=True, neighborhood=lambda: current_user.neighborhood)
+def view_feed():
+    neighborhood = current_user.neighborhood
+    if not neighborhood:
+        return jsonify({"error": "Set a neighbourhood to see your feed"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        after = None
+        if request.args.get('cursor'):
+            after = decode_cursor(request.args['cursor'], datetime, str, int)
+        serialize_post, serialize_event = serializers(request.args.get('fields'), (post_schema, ()),
+                                                      (event_schema, WITH_ORGANIZER))
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    entries = feed.read_page(neighborhood, limit, after)
+    posts, events = feed.hydrate(entries)
+
+    items = []
+    for entry in entries:
+        if entry.kind == 'post' and entry.ref_id in posts:
+            items.append({"type": "post", **serialize_post(posts[entry.ref_id])})
+        elif entry.kind == 'event' and entry.ref_id in events:
+            items.append({"type": "event", **serialize_event(events[entry.ref_id])})
+
+    next_cursor = None
+    if len(entries) == limit:
+        last = entries[-1]
+        next_cursor = encode_cursor(last.created_at, last.kind, last.ref_id)
+
+    return jsonify({"neighborhood": neighborhood, "items": items, "next_cursor": next_cursor}), 200
@@ -0,0 +1,164 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+import messaging
+from instrumentation import query_budget
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from writer import WriterBusy, writer
+
+message_bp = Blueprint('message', __name__)
+
+
+def serialize_message(message):
+    """Serialize a Message (or a row selected with its columns) for the API."""
+    return {
+        "id": message.message_id,
+        "sender_id": message.sender_id,
+        "body": message.body,
+        "sent_at": message.sent_at
+    }
+
+
+def insert_message(session, sender_id, body, conversation_id=None, recipient_id=None):
+    """``writer.run`` job: send a message; returns ``(message_id, conversation_id)``.
+
+    Without ``conversation_id`` it goes to the one-to-one conversation with
+    ``recipient_id``, which is started on first contact. Raises
+    ``LookupError`` for an unknown recipient, ``PermissionError`` if the
+    sender is not in the conversation and ``ValueError`` for a message to
+    oneself.
+    """
+    if conversation_id is None:
+        conversation_id = messaging.direct_conversation(sender_id, recipient_id)
+    message = messaging.send(conversation_id, sender_id, body)
+    return message.message_id, message.conversation_id
+
+
+def insert_conversation(session, creator_id, participant_ids):
+    """``writer.run`` job: start a group conversation; returns its id."""
+    return messaging.start(creator_id, participant_ids)
+
+
+def read_conversation(session, conversation_id, user_id):
+    """``writer.run`` job: reset a participant's unread count."""
+    messaging.mark_read(conversation_id, user_id)
+
+
+@message_bp.route('/messages', methods=['POST'])
+@jwt_required()
+def send_message():
+    try:
+        data = request.get_json(silent=True) or {}
+        body = data.get('body')
+        conversation_id = data.get('conversation_id')
+        recipient_id = data.get('recipient_id')
+        if not body:
+            return jsonify({"error": "Message body is required"}), 400
+        if not isinstance(body, str):
+            return jsonify({"error": "Message body must be a string"}), 400
+        if (conversation_id is None) == (recipient_id is None):
+            return jsonify({"error": "Give either conversation_id or recipient_id"}), 400
+
+        try:
+            if conversation_id is not None:
+                conversation_id = int(conversation_id)
+            else:
+                recipient_id = int(recipient_id)
+            message_id, conversation_id = writer.run(insert_message, current_user.user_id, body, conversation_id,
+                                                     recipient_id)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except PermissionError as e:
+            return jsonify({"error": str(e)}), 403
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except WriterBusy:
+            return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+
+        return jsonify({"message_id": message_id, "conversation_id": conversation_id}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@message_bp.route('/conversations', methods=['POST'])
+@jwt_required()
+def start_conversation():
+    try:
+        data = request.get_json(silent=True) or {}
+        participant_ids = data.get('participant_ids')
+        if not isinstance(participant_ids, list):
+            return jsonify({"error": "participant_ids must be a list of user ids"}), 400
+
+        try:
+            conversation_id = writer.run(insert_conversation, current_user.user_id,
+                                         [int(i) for i in participant_ids])
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        except WriterBusy:
+            return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+
+        return jsonify({"conversation_id": conversation_id}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@message_bp.route('/conversations', methods=['GET'])
+@jwt_required()
+@query_budget(2)
+def view_inbox():
+    """The caller's conversations, most recently active first, with unread counts."""
+    try:
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+        after = None
+        if request.args.get('cursor'):
+            after = decode_cursor(request.args['cursor'], datetime, int)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows, members = messaging.inbox(current_user.user_id, limit, after)
+    conversations = [{
+        "id": row.conversation_id,
+        "last_activity": row.last_message_at,
+        "unread_count": row.unread_count,
+        "participants": members[row.conversation_id],
+        "last_message": serialize_message(row) if row.message_id is not None else None
+    } for row in rows]
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].last_message_at, rows[-1].conversation_id)
+    return jsonify({"conversations": conversations, "next_cursor": next_cursor}), 200
+
+@message_bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
+@jwt_required()
+@query_budget(2)
+def view_history(conversation_id):
+    """A conversation's messages, newest first; ``cursor`` pages back in time."""
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        before = decode_cursor(request.args['cursor'], int)[0] if request.args.get('cursor') else None
+        last_read, messages = messaging.history(conversation_id, current_user.user_id, limit, before)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+    next_cursor = encode_cursor(messages[-1].message_id) if len(messages) == limit else None
+    return jsonify({
+        "messages": [serialize_message(m) for m in messages],
+        "last_read_message_id": last_read,
+        "next_cursor": next_cursor
+    }), 200
+
+@message_bp.route('/conversations/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def mark_read(conversation_id):
+    try:
+        writer.run(read_conversation, conversation_id, current_user.user_id)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+    return jsonify({"message": "Conversation marked as read", "unread_count": 0}), 200
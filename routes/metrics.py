@@ -0,0 +1,51 @@
+from flask import Blueprint, Response
+from accounts import identities
+from httpcache import responses
+from instrumentation import instrumentation
+from jobs import jobs
+from pubsub import broker
+from revocation import revocations
+from trending import rankings
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    identity_stats = identities.stats()
+    pubsub_stats = broker.stats()
+    response_stats = responses.stats()
+    revocation_stats = revocations.stats()
+    trending_stats = rankings.stats()
+    job_stats = jobs.stats()
+    extra = [
+        ('identity_cache_hits_total', 'counter', 'JWT identity lookups served from cache.',
+         [({'endpoint': e}, s['hits']) for e, s in identity_stats.items()]),
+        ('identity_cache_misses_total', 'counter', 'JWT identity lookups that queried the database.',
+         [({'endpoint': e}, s['misses']) for e, s in identity_stats.items()]),
+        ('sse_subscribers', 'gauge', 'Open live-update streams.',
+         [({}, pubsub_stats['subscribers'])]),
+        ('sse_messages_published_total', 'counter', 'Messages published to live-update channels.',
+         [({}, pubsub_stats.get('published', 0))]),
+        ('sse_messages_delivered_total', 'counter', 'Messages queued for live-update subscribers.',
+         [({}, pubsub_stats.get('delivered', 0))]),
+        ('sse_subscribers_evicted_total', 'counter', 'Subscribers dropped for falling too far behind.',
+         [({}, pubsub_stats.get('evicted', 0))]),
+        ('response_cache_hits_total', 'counter', 'GET responses replayed from the response cache.',
+         [({'endpoint': e}, s['hits']) for e, s in response_stats.items()]),
+        ('response_cache_misses_total', 'counter', 'Cacheable GET responses that ran the view.',
+         [({'endpoint': e}, s['misses']) for e, s in response_stats.items()]),
+        ('response_cache_not_modified_total', 'counter', 'Conditional GETs answered with 304 Not Modified.',
+         [({'endpoint': e}, s['not_modified']) for e, s in response_stats.items()]),
+        ('response_cache_bytes_saved_total', 'counter', 'Response body bytes not sent thanks to 304s.',
+         [({'endpoint': e}, s['bytes_saved']) for e, s in response_stats.items()]),
+        ('revoked_tokens', 'gauge', 'Revoked, unexpired tokens in this worker\'s revocation filter.',
+         [({}, revocation_stats['entries'])]),
+        ('trending_items', 'gauge', 'Posts and events this worker is keeping trending scores for.',
+         [({}, trending_stats['items'])]),
+        ('job_queue_jobs', 'gauge', 'Background jobs by state; dead ones ran out of attempts.',
+         [({'state': state}, job_stats[state]) for state in ('queued', 'running', 'dead')]),
+        ('job_queue_jobs_enqueued_total', 'counter', 'Background jobs queued by this process.',
+         [({}, job_stats.get('enqueued', 0))]),
+    ]
+    body = instrumentation.render_prometheus(extra)
+    return Response(body, mimetype='text/plain; version=0.0.4')
@@ -1,29 +1,146 @@
-from flask import Blueprint, request, redirect, url_for, flash
-from flask_login import login_required, current_user
-from models import db, Post
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user, get_current_user
+from datetime import datetime
+from sqlalchemy import insert, select
+from models import db, Comment, Post
+import bulk
+import feed
+import trending
+from httpcache import responses
+from export import export_client_required, export_format, stream_rows
+from serialization import post_schema
+from writer import WriterBusy, writer
 
 post_bp = Blueprint('post', __name__)
 
+POST_EXPORT_COLUMNS = (Post.post_id, Post.content, Post.timestamp, Post.created_by_id)
+
+
+# Serializes a Post (or a row selected with its columns) for the API
+serialize_post = post_schema.compile()
+
+def publish_post(session, post, author):
+    """Queue a flushed new post's feed row, live update and cache invalidation on ``session``."""
+    # Fan out to the author's neighbourhood feed in the same transaction, and stream it once committed
+    feed.fan_out('post', post.post_id, author.neighborhood, post.timestamp, session=session)
+    feed.announce('post', serialize_post(post), author.neighborhood, session=session)
+    trending.record('post', 'post', post.post_id, author.neighborhood, session=session, created_at=post.timestamp)
+    responses.invalidate_after_commit(session, 'posts', f'feed:{author.neighborhood}')
+
+
+def post_fields(data):
+    """Validate a create-post payload into column values; raises ``ValueError`` with a client-facing message."""
+    if not isinstance(data, dict):
+        raise ValueError("Invalid request data")
+    content = data.get('content')
+    if not content:
+        raise ValueError("Content is required")
+    if not isinstance(content, str):
+        raise ValueError("Content must be a string")
+    return {"content": content}
+
+
+def insert_posts(session, rows, author):
+    """``writer.run`` job: insert validated posts with one multi-row INSERT and publish them; returns their ids."""
+    timestamp = datetime.utcnow()
+    # sort_by_parameter_order makes SQLAlchemy fall back to one INSERT per row on SQLite; a single multi-row
+    # INSERT assigns increasing ids in VALUES order, so sorting by id restores the input order
+    posts = sorted(session.execute(
+        insert(Post).returning(*POST_EXPORT_COLUMNS),
+        [{**row, "created_by_id": author.user_id, "timestamp": timestamp} for row in rows]
+    ).all(), key=lambda row: row.post_id)
+
+    refs = [(post.post_id, timestamp) for post in posts]
+    feed.fan_out_many('post', refs, author.neighborhood, session=session)
+    trending.record_many('post', 'post', refs, author.neighborhood, session=session)
+    if len(posts) <= bulk.ANNOUNCE_LIMIT:
+        for post in posts:
+            feed.announce('post', serialize_post(post), author.neighborhood, session=session)
+    else:
+        # One message instead of a burst that would overflow every subscriber's queue
+        feed.announce('post_batch', {"count": len(posts), "created_by_id": author.user_id},
+                      author.neighborhood, session=session)
+    responses.invalidate_after_commit(session, 'posts', f'feed:{author.neighborhood}')
+    return [post.post_id for post in posts]
+
+
+def insert_post(session, post, author):
+    """``writer.run`` job: insert a new post and publish it; returns its id."""
+    session.add(post)
+    session.flush()
+    publish_post(session, post, author)
+    return post.post_id
+
 @post_bp.route('/posts', methods=['POST'])
-@login_required
+@jwt_required()
 def create_post():
-    content = request.form.get('content')
-    new_post = Post(content=content, created_by_id=current_user.user_id)
-    db.session.add(new_post)
-    db.session.commit()
-    
-    flash('Post created successfully!', 'success')
-    return redirect(url_for('home'))
+    data = request.get_json(silent=True) or request.form
+    try:
+        new_post = Post(**post_fields(data), created_by_id=current_user.user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        post_id = writer.run(insert_post, new_post, get_current_user())
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+
+    return jsonify({"message": "Post created successfully!", "post_id": post_id}), 201
+
+@post_bp.route('/posts/batch', methods=['POST'])
+@jwt_required()
+def create_posts_batch():
+    """Create up to ``bulk.MAX_ITEMS`` posts from a JSON array, NDJSON or CSV upload, reporting a status per item."""
+    try:
+        items = bulk.read_items('posts')
+    except bulk.BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    valid, results = bulk.validate(items, post_fields)
+    results += bulk.insert_chunks(valid, insert_posts, 'post_id', get_current_user())
+    return bulk.batch_response(results)
+
+def remove_post(session, post_id, user_id, neighborhood):
+    """``writer.run`` job: delete one of ``user_id``'s posts with its feed rows and comments.
+
+    Raises ``PermissionError`` if there is no such post or someone else wrote it.
+    """
+    post = session.get(Post, post_id)
+    if not post or post.created_by_id != user_id:
+        raise PermissionError("You are not authorized to delete this post.")
+
+    feed.remove('post', post.post_id)
+    trending.record('delete', 'post', post.post_id, neighborhood, session=session)
+    session.execute(db.delete(Comment).where(Comment.post_id == post.post_id))
+    session.delete(post)
+    responses.invalidate_after_commit(session, 'posts', f'feed:{neighborhood}', f'comments:{post_id}')
 
 @post_bp.route('/posts/<int:post_id>/delete', methods=['POST'])
-@login_required
+@jwt_required()
 def delete_post(post_id):
-    post = Post.query.get(post_id)
-    if post and post.created_by_id == current_user.user_id:
-        db.session.delete(post)
-        db.session.commit()
-        flash('Post deleted successfully!', 'success')
-    else:
-        flash('You are not authorized to delete this post.', 'danger')
-    
-    return redirect(url_for('home'))
+    try:
+        writer.run(remove_post, post_id, current_user.user_id, current_user.neighborhood)
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+
+    return jsonify({"message": "Post deleted successfully!"}), 200
+
+@post_bp.route('/posts/export', methods=['GET'])
+@jwt_required()
+@export_client_required
+def export_posts():
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
+    try:
+        serialize = post_schema.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    columns = [getattr(Post, post_schema.fields[key]) for key in serialize.fields]
+    statement = select(*columns).order_by(Post.post_id)
+    return stream_rows(statement, serialize, fmt)
@@ -0,0 +1,98 @@
+import importlib
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy import select, update
+import trending
+from httpcache import responses
+from models import db, Event, RSVP
+from writer import WriterBusy, writer
+
+rsvp_bp = Blueprint('rsvp', __name__)
+
+# Dialect modules providing INSERT ... ON CONFLICT, imported on first use (postgresql alone is ~40ms)
+DIALECT_INSERTS = {'sqlite': 'sqlalchemy.dialects.sqlite', 'postgresql': 'sqlalchemy.dialects.postgresql'}
+
+
+def insert_ignoring_duplicates(model, **values):
+    """INSERT ... ON CONFLICT DO NOTHING; returns True if a row was actually inserted."""
+    insert = importlib.import_module(DIALECT_INSERTS[db.session.get_bind().dialect.name]).insert
+    result = db.session.execute(insert(model).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+
+def adjust_attendee_count(event_id, delta):
+    """Atomically add ``delta`` to an event's counter; returns the new count, or None if there is no such event."""
+    return db.session.execute(
+        update(Event)
+        .where(Event.event_id == event_id)
+        .values(attendee_count=Event.attendee_count + delta)
+        .returning(Event.attendee_count)
+    ).scalar()
+
+
+def current_attendee_count(event_id):
+    return db.session.scalar(select(Event.attendee_count).where(Event.event_id == event_id))
+
+def add_rsvp(session, event_id, user_id):
+    """``writer.run`` job: RSVP a user to an event; returns ``(created, attendee_count)``.
+
+    Idempotent: a repeated RSVP is a no-op and leaves the counter alone.
+    Raises ``LookupError`` if there is no such event.
+    """
+    if not insert_ignoring_duplicates(RSVP, event_id=event_id, user_id=user_id):
+        return False, current_attendee_count(event_id)
+
+    attendee_count = adjust_attendee_count(event_id, 1)
+    if attendee_count is None:
+        raise LookupError("Event not found")
+
+    trending.record_for('rsvp', 'event', event_id, session=session)
+    # Attendee counts are part of every cached event listing
+    responses.invalidate_after_commit(session, 'events')
+    return True, attendee_count
+
+
+def remove_rsvp(session, event_id, user_id):
+    """``writer.run`` job: cancel a user's RSVP; returns the new attendee count.
+
+    Raises ``LookupError`` if the user had not RSVPed.
+    """
+    deleted = session.execute(
+        db.delete(RSVP).where(RSVP.event_id == event_id, RSVP.user_id == user_id)
+    ).rowcount
+    if not deleted:
+        raise LookupError("No RSVP for this event")
+
+    attendee_count = adjust_attendee_count(event_id, -1)
+    responses.invalidate_after_commit(session, 'events')
+    return attendee_count
+
+@rsvp_bp.route('/events/<int:event_id>/rsvp', methods=['POST'])
+@jwt_required()
+def rsvp(event_id):
+    try:
+        created, attendee_count = writer.run(add_rsvp, event_id, current_user.user_id)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if not created:
+        return jsonify({"message": "Already attending", "attendee_count": attendee_count}), 200
+    return jsonify({"message": "RSVP confirmed", "attendee_count": attendee_count}), 201
+
+@rsvp_bp.route('/events/<int:event_id>/rsvp', methods=['DELETE'])
+@jwt_required()
+def cancel_rsvp(event_id):
+    try:
+        attendee_count = writer.run(remove_rsvp, event_id, current_user.user_id)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except WriterBusy:
+        return jsonify({"error": "Too many writes in progress, please retry shortly"}), 429, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"message": "RSVP cancelled", "attendee_count": attendee_count}), 200
@@ -0,0 +1,48 @@
+from flask import Blueprint, request, jsonify
+import feed
+import search
+from httpcache import responses
+from instrumentation import query_budget
+from pagination import InvalidCursor, parse_limit
+from routes.event import WITH_ORGANIZER
+from serialization import event_schema, post_schema, serializers
+
+search_bp = Blueprint('search', __name__)
+
+MAX_SEARCH_OFFSET = 1000
+
+@search_bp.route('/search', methods=['GET'])
+@query_budget(3)
+@responses.cached('events', 'posts')
+def search_content():
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type')
+    neighborhood = request.args.get('neighborhood')
+
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    if kind not in (None, 'post', 'event'):
+        return jsonify({"error": "type must be 'post' or 'event'"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+        offset = min(max(int(request.args.get('offset', 0)), 0), MAX_SEARCH_OFFSET)
+    except (InvalidCursor, ValueError):
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    try:
+        serialize_post, serialize_event = serializers(request.args.get('fields'), (post_schema, ()),
+                                                      (event_schema, WITH_ORGANIZER))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    hits = search.search(query, neighborhood=neighborhood, kind=kind, limit=limit, offset=offset)
+    posts, events = feed.hydrate(hits)
+
+    results = []
+    for hit in hits:
+        if hit.kind == 'post' and hit.ref_id in posts:
+            results.append({"type": "post", "score": hit.score, **serialize_post(posts[hit.ref_id])})
+        elif hit.kind == 'event' and hit.ref_id in events:
+            results.append({"type": "event", "score": hit.score, **serialize_event(events[hit.ref_id])})
+
+    return jsonify({"query": query, "results": results}), 200
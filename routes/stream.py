@@ -0,0 +1,53 @@
+import time
+
+from flask import Blueprint, Response, current_app, jsonify
+from flask_jwt_extended import current_user, get_jwt, jwt_required
+import feed
+from pubsub import broker
+
+stream_bp = Blueprint('stream', __name__)
+
+
+@stream_bp.route('/feed/stream', methods=['GET'])
+@jwt_required()
+def feed_stream():
+    """Server-Sent Events for new posts and events in the caller's neighbourhood, the live side of ``/feed``.
+
+    Each connection holds no database connection, only a bounded queue.
+    A comment line is sent every ``SSE_KEEPALIVE`` seconds so proxies keep
+    idle streams open; a client that falls too far behind gets an
+    ``evicted`` event and should reconnect (and catch up from ``/feed``).
+    The stream ends with an ``expired`` event once the access token
+    expires, so only a current token keeps listening.
+    """
+    neighborhood = current_user.neighborhood
+    if not neighborhood:
+        return jsonify({"error": "Set a neighbourhood to see your feed"}), 400
+    channel = feed.channel(neighborhood)
+    keepalive = float(current_app.config['SSE_KEEPALIVE'])
+    expires_at = get_jwt().get('exp')
+
+    def events():
+        # Subscribed only once streaming starts: a generator that never runs never reaches its finally
+        subscription = broker.subscribe(channel)
+        try:
+            # Flushes the headers so the client sees the stream open straight away
+            yield ': connected\n\n'
+            while True:
+                if expires_at is not None and time.time() >= expires_at:
+                    yield 'event: expired\ndata: {"reason": "token expired"}\n\n'
+                    return
+                message = subscription.get(keepalive)
+                if message is not None:
+                    message_id, event_name, data = message
+                    yield f'id: {message_id}\nevent: {event_name}\ndata: {data}\n\n'
+                elif subscription.evicted:
+                    yield 'event: evicted\ndata: {"reason": "slow consumer"}\n\n'
+                    return
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,44 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_current_user
+import feed
+from instrumentation import query_budget
+from pagination import InvalidCursor, parse_limit
+from routes.event import WITH_ORGANIZER
+from serialization import event_schema, post_schema, serializers
+from trending import KINDS, rankings
+
+trending_bp = Blueprint('trending', __name__)
+
+DEFAULT_TRENDING = 20
+
+@trending_bp.route('/trending', methods=['GET'])
+@jwt_required(optional=True)
+@query_budget(3)
+def view_trending():
+    """A neighbourhood's hottest posts and events; the caller's own unless ``neighborhood`` is given."""
+    user = get_current_user()
+    neighborhood = request.args.get('neighborhood') or (user.neighborhood if user is not None else None)
+    if not neighborhood:
+        return jsonify({"error": "Pass a neighborhood, or set your own, to see what is trending"}), 400
+
+    kind = request.args.get('kind')
+    if kind and kind not in KINDS:
+        return jsonify({"error": "kind must be 'post' or 'event'"}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), default=DEFAULT_TRENDING, maximum=rankings.size)
+        serialize_post, serialize_event = serializers(request.args.get('fields'), (post_schema, ()),
+                                                      (event_schema, WITH_ORGANIZER))
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    items = [item for k in ((kind,) if kind else KINDS) for item in rankings.top(neighborhood, k, limit)]
+    posts, events = feed.hydrate(items)
+
+    # Deleted posts and events may linger in the rankings until the next refresh; they are skipped
+    return jsonify({
+        "neighborhood": neighborhood,
+        "posts": [{**serialize_post(posts[item.ref_id]), "score": round(item.score, 4)}
+                  for item in items if item.kind == 'post' and item.ref_id in posts],
+        "events": [{**serialize_event(events[item.ref_id]), "score": round(item.score, 4)}
+                   for item in items if item.kind == 'event' and item.ref_id in events],
+    }), 200
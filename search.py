@@ -0,0 +1,168 @@
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+from models import db
+
+SearchHit = namedtuple('SearchHit', ['kind', 'ref_id', 'score'])
+
+# SQLite: one FTS5 row per post (rowid = 2 * post_id) or event (rowid = 2 * event_id + 1),
+# so the sync triggers address rows by rowid instead of scanning the index.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        neighborhood UNINDEXED, title, body,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO search_index (rowid, neighborhood, title, body)
+        VALUES (2 * new.post_id, (SELECT neighborhood FROM users WHERE user_id = new.created_by_id), '', new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_update AFTER UPDATE OF content ON posts BEGIN
+        UPDATE search_index SET body = new.content WHERE rowid = 2 * new.post_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_search_delete AFTER DELETE ON posts BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.post_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_insert AFTER INSERT ON events BEGIN
+        INSERT INTO search_index (rowid, neighborhood, title, body)
+        VALUES (2 * new.event_id + 1, (SELECT neighborhood FROM users WHERE user_id = new.organizer_id), new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_update AFTER UPDATE OF title, description ON events BEGIN
+        UPDATE search_index SET title = new.title, body = new.description WHERE rowid = 2 * new.event_id + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_search_delete AFTER DELETE ON events BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.event_id + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_neighborhood AFTER UPDATE OF neighborhood ON users BEGIN
+        UPDATE search_index SET neighborhood = new.neighborhood
+        WHERE rowid IN (SELECT 2 * post_id FROM posts WHERE created_by_id = new.user_id
+                        UNION ALL SELECT 2 * event_id + 1 FROM events WHERE organizer_id = new.user_id);
+    END""",
+]
+
+# PostgreSQL: stored generated tsvector columns stay in sync without triggers.
+POSTGRESQL_DDL = [
+    """ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+    """ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING GIN (search_vector)",
+]
+
+DDL = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}
+
+SQLITE_INSERT_TRIGGERS = ('posts_search_insert', 'events_search_insert')
+
+SQLITE_BULK_INDEX = [
+    """INSERT INTO search_index (rowid, neighborhood, title, body)
+        SELECT 2 * p.post_id, u.neighborhood, '', p.content FROM posts p
+        LEFT JOIN users u ON u.user_id = p.created_by_id WHERE p.post_id >= :first_post""",
+    """INSERT INTO search_index (rowid, neighborhood, title, body)
+        SELECT 2 * e.event_id + 1, u.neighborhood, e.title, e.description FROM events e
+        LEFT JOIN users u ON u.user_id = e.organizer_id WHERE e.event_id >= :first_event""",
+]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def install(target, connection, **kw):
+    """Create the search index alongside ``db.create_all()``."""
+    for statement in DDL.get(connection.dialect.name, ()):
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def uninstall(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+@contextmanager
+def deferred_indexing(first_post_id, first_event_id):
+    """Index rows inserted inside the block in one pass instead of row by row.
+
+    On SQLite the per-row insert triggers are dropped for the duration of a
+    bulk load and recreated afterwards; PostgreSQL's generated columns need
+    nothing special.
+    """
+    if db.session.get_bind().dialect.name != 'sqlite':
+        yield
+        return
+
+    for trigger in SQLITE_INSERT_TRIGGERS:
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    db.session.commit()
+    try:
+        yield
+    finally:
+        db.session.rollback()
+        params = {'first_post': first_post_id, 'first_event': first_event_id}
+        for statement in SQLITE_BULK_INDEX:
+            db.session.execute(text(statement), params)
+        for statement in SQLITE_DDL:
+            if any(trigger in statement for trigger in SQLITE_INSERT_TRIGGERS):
+                db.session.execute(text(statement))
+        db.session.commit()
+
+
+def _terms(query):
+    return [term for term in re.findall(r'\w+', query.lower()) if term][:16]
+
+
+def _sqlite_search(terms, neighborhood, kind, limit, offset):
+    # Every term is quoted (no FTS syntax injection) and prefix-matched
+    match = ' '.join(f'"{term}"*' for term in terms)
+    sql = "SELECT rowid, bm25(search_index, 0.0, 2.0, 1.0) AS score FROM search_index WHERE search_index MATCH :match"
+    if neighborhood:
+        sql += " AND neighborhood = :neighborhood"
+    if kind:
+        sql += " AND rowid % 2 = :parity"
+    sql += " ORDER BY score LIMIT :limit OFFSET :offset"
+    rows = db.session.execute(text(sql), {
+        'match': match, 'neighborhood': neighborhood,
+        'parity': 0 if kind == 'post' else 1, 'limit': limit, 'offset': offset
+    })
+    return [
+        SearchHit('post' if rowid % 2 == 0 else 'event', rowid // 2, -score)
+        for rowid, score in rows
+    ]
+
+
+def _postgresql_search(terms, neighborhood, kind, limit, offset):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    neighborhood_filter = " AND u.neighborhood = :neighborhood" if neighborhood else ""
+    parts = []
+    if kind in (None, 'post'):
+        parts.append(
+            "SELECT 'post' AS kind, p.post_id AS ref_id, ts_rank(p.search_vector, q) AS score "
+            "FROM posts p JOIN users u ON u.user_id = p.created_by_id, to_tsquery('english', :tsquery) q "
+            "WHERE p.search_vector @@ q" + neighborhood_filter
+        )
+    if kind in (None, 'event'):
+        parts.append(
+            "SELECT 'event' AS kind, e.event_id AS ref_id, ts_rank(e.search_vector, q) AS score "
+            "FROM events e JOIN users u ON u.user_id = e.organizer_id, to_tsquery('english', :tsquery) q "
+            "WHERE e.search_vector @@ q" + neighborhood_filter
+        )
+    sql = " UNION ALL ".join(parts) + " ORDER BY score DESC LIMIT :limit OFFSET :offset"
+    rows = db.session.execute(text(sql), {
+        'tsquery': tsquery, 'neighborhood': neighborhood, 'limit': limit, 'offset': offset
+    })
+    return [SearchHit(row.kind, row.ref_id, float(row.score)) for row in rows]
+
+
+def search(query, neighborhood=None, kind=None, limit=20, offset=0):
+    """Return ranked ``SearchHit`` rows for posts and events matching every term of ``query``."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return _sqlite_search(terms, neighborhood, kind, limit, offset)
+    if dialect == 'postgresql':
+        return _postgresql_search(terms, neighborhood, kind, limit, offset)
+    raise NotImplementedError(f'Search is not supported on {dialect}')
@@ -1,97 +1,402 @@
-from datetime import datetime
-from models import User, Event, Post, db
-from flask import Flask
-import os
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from models import User, Event, Post, Comment, Conversation, ConversationParticipant, Message, db
+import search  # Also registers the full-text index DDL with create_all()
+import geo  # Likewise for the proximity index
+import feed
+import trending
+import comments
+import messaging
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+import click
+import random
+import time
 import bcrypt  # Import bcrypt for password hashing
+from passwords import hash_password
 
-app = Flask(__name__)  # Creating Flask app
+WORDS = (
+    "community garden market park street festival music neighbors clean-up walk yoga "
+    "library school bake sale potluck bbq concert lake river hill trail kids dogs "
+    "volunteer meeting local fresh weekend morning evening family friends art craft"
+).split()
 
-# Set the correct database path
-base_dir = os.path.abspath(os.path.dirname(__file__))  # Directory of seed.py
-db_path = os.path.join(base_dir, "instance", "db.sqlite3")  # Path to app.db in instance/
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize the database
-db.init_app(app)
 
 def seed_data():
     """Seed the database with initial data."""
-    with app.app_context():
-        # Drop all tables and recreate them for a fresh start
-        db.drop_all()
-        db.create_all()
+    # Drop all tables and recreate them for a fresh start
+    db.drop_all()
+    db.create_all()
+
+    # Sample users (20 records)
+    users_data = [
+        {"name": "John Doe", "email": "john@example.com", "password": "password123", "neighborhood": "Sunnydale"},
+        {"name": "Jane Smith", "email": "jane@example.com", "password": "password123", "neighborhood": "Riverside"},
+        {"name": "Alice Brown", "email": "alice@example.com", "password": "password123", "neighborhood": "Lakeside"},
+        {"name": "Bob Johnson", "email": "bob@example.com", "password": "password123", "neighborhood": "Greenwich"},
+        {"name": "Charlie Davis", "email": "charlie@example.com", "password": "password123", "neighborhood": "Pinehill"},
+        {"name": "Diana Wilson", "email": "diana@example.com", "password": "password123", "neighborhood": "Birchwood"},
+        {"name": "Eva Martinez", "email": "eva@example.com", "password": "password123", "neighborhood": "Riverside"},
+        {"name": "Frank White", "email": "frank@example.com", "password": "password123", "neighborhood": "Lakeview"},
+        {"name": "Grace Lee", "email": "grace@example.com", "password": "password123", "neighborhood": "Parkway"},
+        {"name": "Henry Harris", "email": "henry@example.com", "password": "password123", "neighborhood": "Sunset"},
+        {"name": "Isla Thompson", "email": "isla@example.com", "password": "password123", "neighborhood": "Maplewood"},
+        {"name": "Jack King", "email": "jack@example.com", "password": "password123", "neighborhood": "Cottonwood"},
+        {"name": "Katherine Scott", "email": "katherine@example.com", "password": "password123", "neighborhood": "Hillcrest"},
+        {"name": "Liam Clark", "email": "liam@example.com", "password": "password123", "neighborhood": "Sunnydale"},
+        {"name": "Maya Rodriguez", "email": "maya@example.com", "password": "password123", "neighborhood": "Parkview"},
+        {"name": "Nina Perez", "email": "nina@example.com", "password": "password123", "neighborhood": "Willowbrook"},
+        {"name": "Oscar Martinez", "email": "oscar@example.com", "password": "password123", "neighborhood": "Greenfield"},
+        {"name": "Paul Walker", "email": "paul@example.com", "password": "password123", "neighborhood": "Riverside"},
+        {"name": "Quinn Robinson", "email": "quinn@example.com", "password": "password123", "neighborhood": "Riverside"},
+        {"name": "Rebecca Lewis", "email": "rebecca@example.com", "password": "password123", "neighborhood": "Sunshine"},
+    ]
+
+    # Adding users to the database with hashed passwords
+    for user in users_data:
+        hashed_password = bcrypt.hashpw(user["password"].encode("utf-8"), bcrypt.gensalt())  # Hash password
+        new_user = User(name=user["name"], email=user["email"], password=hashed_password.decode("utf-8"), neighborhood=user["neighborhood"])
+        db.session.add(new_user)
+
+    # Sample events (20 records)
+    events_data = [
+        {"title": "Community BBQ", "description": "Join us for a fun-filled BBQ with music and games!", "date": "2025-03-25", "location": "Sunnydale Park", "organizer_id": 1},
+        {"title": "Neighborhood Clean-Up", "description": "Help us keep our neighborhood clean by joining our clean-up event.", "date": "2025-04-10", "location": "Riverside Street", "organizer_id": 2},
+        {"title": "Farmers Market", "description": "Come shop for fresh local produce at the Riverside Farmers Market.", "date": "2025-04-12", "location": "Riverside Plaza", "organizer_id": 3},
+        {"title": "Community Walk", "description": "A group walk through the park to promote fitness and wellness.", "date": "2025-05-01", "location": "Lakeside Park", "organizer_id": 4},
+        {"title": "Summer Festival", "description": "Celebrate summer with music, food, and family fun!", "date": "2025-06-15", "location": "Lakeside Amphitheater", "organizer_id": 5},
+        {"title": "Neighborhood Potluck", "description": "Bring your favorite dish and share with your neighbors!", "date": "2025-07-04", "location": "Greenwich Community Center", "organizer_id": 6},
+    ]
+
+    # Adding events to the database
+    for event in events_data:
+        new_event = Event(
+            title=event["title"],
+            description=event["description"],
+            date=datetime.strptime(event["date"], "%Y-%m-%d"),
+            location=event["location"],
+            organizer_id=event["organizer_id"],
+        )
+        db.session.add(new_event)
+
+    # Sample posts (20 records)
+    posts_data = [
+        {"content": "Looking forward to the Community BBQ this weekend! Who's coming?", "created_by_id": 1},
+        {"content": "Don't forget to bring your sunscreen for the Summer Festival!", "created_by_id": 2},
+        {"content": "Had a great time at the Spring Carnival today!", "created_by_id": 3},
+        {"content": "Join us for the Holiday Tree Lighting ceremony this Friday!", "created_by_id": 4},
+        {"content": "Anyone up for the Neighborhood Walk on Saturday morning?", "created_by_id": 5},
+    ]
+
+    # Adding posts to the database
+    for post in posts_data:
+        new_post = Post(content=post["content"], created_by_id=post["created_by_id"])
+        db.session.add(new_post)
+
+    # Commit all changes to the database
+    db.session.commit()
+    feed.backfill()
+    trending.backfill(datetime.utcnow() - timedelta(days=trending.BACKFILL_DAYS))
+    db.session.commit()
+
+    print("Data seeded successfully.")
+
+
+def _zipf_weights(count, skew):
+    return list(accumulate(1.0 / (rank + 1) ** skew for rank in range(count)))
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _insert_batches(model, rows, batch_size):
+    """executemany ``rows`` into ``model``'s table, committing every ``batch_size`` rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+
+
+def seed_volume(users=0, events=0, posts=0, conversations=0, messages=0, neighborhoods=50, skew=1.0,
+                batch_size=10000, test_data=False, workers=None, password="password123",
+                random_seed=0, log=print, area=None):
+    """Bulk-generate synthetic users, events, posts and messages for load tests and benchmarks.
+
+    Neighbourhood sizes follow a Zipf distribution with exponent ``skew``.
+    With ``area`` (``(south, west, north, east)`` in degrees) users and
+    events get coordinates spread uniformly over it.
+    With ``test_data`` every user shares one precomputed password hash;
+    otherwise passwords are hashed on a process pool of ``workers``.
+    Rows are inserted with executemany in ``batch_size`` transactions and
+    get explicit ids, so repeated calls append to existing data.
+    Returns the ``(first, last)`` id range created for each table.
+    """
+    rng = random.Random(random_seed)
+    rounds = int(current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+    names = [f"Neighbourhood {i + 1}" for i in range(neighborhoods)]
+    weights = _zipf_weights(neighborhoods, skew)
+    now = datetime.utcnow()
+
+    def point():
+        south, west, north, east = area
+        return rng.uniform(south, north), rng.uniform(west, east)
+
+    def next_id(column):
+        return (db.session.query(func.max(column)).scalar() or 0) + 1
+
+    first_user, first_event, first_post = next_id(User.user_id), next_id(Event.event_id), next_id(Post.post_id)
+    last_user = first_user + users - 1
+
+    started = time.perf_counter()
+    if users:
+        user_ids = range(first_user, last_user + 1)
+        if test_data:
+            shared_hash = hash_password(password, rounds)
+            hashes = (shared_hash for _ in user_ids)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            hashes = pool.map(hash_password, (f"{password}{uid}" for uid in user_ids),
+                              (rounds for _ in user_ids), chunksize=256)
+
+        def user_rows():
+            for user_id, hashed in zip(user_ids, hashes):
+                neighborhood = rng.choices(names, cum_weights=weights)[0]
+                row = {"user_id": user_id, "name": f"User {user_id}", "email": f"user{user_id}@example.test",
+                       "password": hashed, "neighborhood": neighborhood}
+                if area:
+                    row["latitude"], row["longitude"] = point()
+                yield row
+
+        try:
+            _insert_batches(User, user_rows(), batch_size)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        log(f"Inserted {users} users in {time.perf_counter() - started:.1f}s")
+
+    author_low = 1 if not users else first_user
+    author_high = max(author_low, last_user if users else first_user - 1)
 
-        # Sample users (20 records)
-        users_data = [
-            {"name": "John Doe", "email": "john@example.com", "password": "password123", "neighborhood": "Sunnydale"},
-            {"name": "Jane Smith", "email": "jane@example.com", "password": "password123", "neighborhood": "Riverside"},
-            {"name": "Alice Brown", "email": "alice@example.com", "password": "password123", "neighborhood": "Lakeside"},
-            {"name": "Bob Johnson", "email": "bob@example.com", "password": "password123", "neighborhood": "Greenwich"},
-            {"name": "Charlie Davis", "email": "charlie@example.com", "password": "password123", "neighborhood": "Pinehill"},
-            {"name": "Diana Wilson", "email": "diana@example.com", "password": "password123", "neighborhood": "Birchwood"},
-            {"name": "Eva Martinez", "email": "eva@example.com", "password": "password123", "neighborhood": "Riverside"},
-            {"name": "Frank White", "email": "frank@example.com", "password": "password123", "neighborhood": "Lakeview"},
-            {"name": "Grace Lee", "email": "grace@example.com", "password": "password123", "neighborhood": "Parkway"},
-            {"name": "Henry Harris", "email": "henry@example.com", "password": "password123", "neighborhood": "Sunset"},
-            {"name": "Isla Thompson", "email": "isla@example.com", "password": "password123", "neighborhood": "Maplewood"},
-            {"name": "Jack King", "email": "jack@example.com", "password": "password123", "neighborhood": "Cottonwood"},
-            {"name": "Katherine Scott", "email": "katherine@example.com", "password": "password123", "neighborhood": "Hillcrest"},
-            {"name": "Liam Clark", "email": "liam@example.com", "password": "password123", "neighborhood": "Sunnydale"},
-            {"name": "Maya Rodriguez", "email": "maya@example.com", "password": "password123", "neighborhood": "Parkview"},
-            {"name": "Nina Perez", "email": "nina@example.com", "password": "password123", "neighborhood": "Willowbrook"},
-            {"name": "Oscar Martinez", "email": "oscar@example.com", "password": "password123", "neighborhood": "Greenfield"},
-            {"name": "Paul Walker", "email": "paul@example.com", "password": "password123", "neighborhood": "Riverside"},
-            {"name": "Quinn Robinson", "email": "quinn@example.com", "password": "password123", "neighborhood": "Riverside"},
-            {"name": "Rebecca Lewis", "email": "rebecca@example.com", "password": "password123", "neighborhood": "Sunshine"},
-        ]
-
-        # Adding users to the database with hashed passwords
-        for user in users_data:
-            hashed_password = bcrypt.hashpw(user["password"].encode("utf-8"), bcrypt.gensalt())  # Hash password
-            new_user = User(name=user["name"], email=user["email"], password=hashed_password.decode("utf-8"), neighborhood=user["neighborhood"])
-            db.session.add(new_user)
-
-        # Sample events (20 records)
-        events_data = [
-            {"title": "Community BBQ", "description": "Join us for a fun-filled BBQ with music and games!", "date": "2025-03-25", "location": "Sunnydale Park", "organizer_id": 1},
-            {"title": "Neighborhood Clean-Up", "description": "Help us keep our neighborhood clean by joining our clean-up event.", "date": "2025-04-10", "location": "Riverside Street", "organizer_id": 2},
-            {"title": "Farmers Market", "description": "Come shop for fresh local produce at the Riverside Farmers Market.", "date": "2025-04-12", "location": "Riverside Plaza", "organizer_id": 3},
-            {"title": "Community Walk", "description": "A group walk through the park to promote fitness and wellness.", "date": "2025-05-01", "location": "Lakeside Park", "organizer_id": 4},
-            {"title": "Summer Festival", "description": "Celebrate summer with music, food, and family fun!", "date": "2025-06-15", "location": "Lakeside Amphitheater", "organizer_id": 5},
-            {"title": "Neighborhood Potluck", "description": "Bring your favorite dish and share with your neighbors!", "date": "2025-07-04", "location": "Greenwich Community Center", "organizer_id": 6},
-        ]
-
-        # Adding events to the database
-        for event in events_data:
-            new_event = Event(
-                title=event["title"],
-                description=event["description"],
-                date=datetime.strptime(event["date"], "%Y-%m-%d"),
-                location=event["location"],
-                organizer_id=event["organizer_id"],
-            )
-            db.session.add(new_event)
-
-        # Sample posts (20 records)
-        posts_data = [
-            {"content": "Looking forward to the Community BBQ this weekend! Who's coming?", "created_by_id": 1},
-            {"content": "Don't forget to bring your sunscreen for the Summer Festival!", "created_by_id": 2},
-            {"content": "Had a great time at the Spring Carnival today!", "created_by_id": 3},
-            {"content": "Join us for the Holiday Tree Lighting ceremony this Friday!", "created_by_id": 4},
-            {"content": "Anyone up for the Neighborhood Walk on Saturday morning?", "created_by_id": 5},
-        ]
-
-        # Adding posts to the database
-        for post in posts_data:
-            new_post = Post(content=post["content"], created_by_id=post["created_by_id"])
-            db.session.add(new_post)
-
-        # Commit all changes to the database
+    def event_rows():
+        for event_id in range(first_event, first_event + events):
+            created_at = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+            row = {"event_id": event_id, "title": _sentence(rng, 2, 5), "description": _sentence(rng, 8, 20),
+                   "date": created_at + timedelta(days=rng.randint(1, 60)), "location": f"{rng.choice(WORDS).title()} Park",
+                   "created_at": created_at, "organizer_id": rng.randint(author_low, author_high)}
+            if area:
+                row["latitude"], row["longitude"] = point()
+                row["geohash"] = geo.geohash(row["latitude"], row["longitude"])
+            yield row
+
+    def post_rows():
+        for post_id in range(first_post, first_post + posts):
+            yield {"post_id": post_id, "content": _sentence(rng, 5, 30),
+                   "timestamp": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                   "created_by_id": rng.randint(author_low, author_high)}
+
+    with search.deferred_indexing(first_post, first_event), geo.deferred_indexing(first_event):
+        if events:
+            started = time.perf_counter()
+            _insert_batches(Event, event_rows(), batch_size)
+            log(f"Inserted {events} events in {time.perf_counter() - started:.1f}s")
+        if posts:
+            started = time.perf_counter()
+            _insert_batches(Post, post_rows(), batch_size)
+            log(f"Inserted {posts} posts in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+    if events or posts:
+        log(f"Indexed new rows for search and proximity in {time.perf_counter() - started:.1f}s")
+
+    if events or posts:
+        started = time.perf_counter()
+        feed.backfill(first_post, first_event)
+        db.session.commit()
+        log(f"Fanned out the neighbourhood feed in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        trending.backfill(now - timedelta(days=trending.BACKFILL_DAYS), first_post, first_event)
         db.session.commit()
+        log(f"Logged the last {trending.BACKFILL_DAYS} days of activity for trending in "
+            f"{time.perf_counter() - started:.1f}s")
+
+    ranges = {
+        "users": (first_user, first_user + users - 1),
+        "events": (first_event, first_event + events - 1),
+        "posts": (first_post, first_post + posts - 1),
+    }
+    if conversations:
+        ranges.update(seed_messages(conversations, messages, author_low, author_high, skew, batch_size,
+                                    random_seed, log))
+    return ranges
+
+
+def seed_messages(conversations, messages, first_user, last_user, skew=1.0, batch_size=10000,
+                  random_seed=0, log=print):
+    """Bulk-generate one-to-one conversations between existing users and the messages in them.
+
+    Both who talks and which conversations are busy follow a Zipf
+    distribution with exponent ``skew``: the lowest user ids have the
+    biggest inboxes and the lowest conversation ids the longest histories.
+    Unread counts and last-message pointers are computed exactly as
+    ``messaging.send`` would have maintained them.
+    """
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    population = last_user - first_user + 1
+    if population < 2:
+        raise ValueError('Messages need at least two users')
+    conversations = min(conversations, population * (population - 1) // 2)
+
+    def next_id(column):
+        return (db.session.query(func.max(column)).scalar() or 0) + 1
+
+    first_conversation, first_message = next_id(Conversation.conversation_id), next_id(Message.message_id)
+    user_weights = _zipf_weights(population, skew)
+
+    started = time.perf_counter()
+    pairs, keys = [], set()
+    while len(pairs) < conversations:
+        a = first_user + rng.choices(range(population), cum_weights=user_weights)[0]
+        b = rng.randint(first_user, last_user)
+        key = messaging.direct_key(a, b)
+        if a != b and key not in keys:
+            keys.add(key)
+            pairs.append((a, b))
+
+    # Per conversation: last message (id, time), and (unread, last read id) for each side
+    last = [None] * conversations
+    state = [[0, None, 0, None] for _ in range(conversations)]
+    conversation_weights = _zipf_weights(conversations, skew)
+    started_at = now - timedelta(seconds=messages + 86400)
+
+    def message_rows():
+        for offset in range(messages):
+            index = rng.choices(range(conversations), cum_weights=conversation_weights)[0]
+            message_id, sent_at = first_message + offset, started_at + timedelta(seconds=offset)
+            side = rng.randrange(2)
+            sides = state[index]
+            sides[2 * side], sides[2 * side + 1] = 0, message_id
+            sides[2 * (1 - side)] += 1
+            last[index] = (message_id, sent_at)
+            yield {"message_id": message_id, "conversation_id": first_conversation + index,
+                   "sender_id": pairs[index][side], "body": _sentence(rng, 2, 20), "sent_at": sent_at}
+
+    _insert_batches(Message, message_rows(), batch_size)
+    log(f"Inserted {messages} messages in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+
+    def conversation_rows():
+        for index, (a, b) in enumerate(pairs):
+            message_id, at = last[index] or (None, started_at)
+            yield {"conversation_id": first_conversation + index, "direct_key": messaging.direct_key(a, b),
+                   "created_at": started_at, "last_message_id": message_id, "last_message_at": at}
+
+    def participant_rows():
+        for index, pair in enumerate(pairs):
+            at = last[index][1] if last[index] else started_at
+            for side, user_id in enumerate(pair):
+                yield {"conversation_id": first_conversation + index, "user_id": user_id, "last_message_at": at,
+                       "unread_count": state[index][2 * side], "last_read_message_id": state[index][2 * side + 1]}
+
+    _insert_batches(Conversation, conversation_rows(), batch_size)
+    _insert_batches(ConversationParticipant, participant_rows(), batch_size)
+    log(f"Inserted {conversations} conversations in {time.perf_counter() - started:.1f}s")
+    return {
+        "conversations": (first_conversation, first_conversation + conversations - 1),
+        "messages": (first_message, first_message + messages - 1),
+    }
+
+
+def seed_thread(post_id, size, first_user, last_user, top_level=0.1, batch_size=10000,
+                random_seed=0, log=print):
+    """Bulk-generate one comment thread of ``size`` comments on ``post_id``.
+
+    A ``top_level`` fraction of comments start new threads; the rest reply
+    to a random earlier comment, so reply counts and depth vary like a busy
+    real discussion. Paths, positions and reply counts are computed up front
+    exactly as ``comments.add`` would have stored them.
+    """
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    first_id = (db.session.query(func.max(Comment.comment_id)).scalar() or 0) + 1
+    rows = []
+
+    started = time.perf_counter()
+    for comment_id in range(first_id, first_id + size):
+        parent = None
+        if rows and rng.random() >= top_level:
+            parent = rows[rng.randrange(len(rows))]
+            if parent["depth"] + 1 >= comments.MAX_DEPTH:
+                parent = rows[parent["parent_id"] - first_id]
+        row = {"comment_id": comment_id, "post_id": post_id, "author_id": rng.randint(first_user, last_user),
+               "content": _sentence(rng, 3, 25), "created_at": now - timedelta(seconds=size - comment_id + first_id),
+               "reply_count": 0, "parent_id": None, "depth": 0, "position": 0,
+               "path": comments.segment(comment_id)}
+        if parent is not None:
+            parent["reply_count"] += 1
+            row.update(parent_id=parent["comment_id"], depth=parent["depth"] + 1, position=parent["reply_count"],
+                       path=parent["path"] + comments.segment(comment_id))
+        rows.append(row)
+
+    _insert_batches(Comment, rows, batch_size)
+    log(f"Inserted a {size}-comment thread on post {post_id} in {time.perf_counter() - started:.1f}s")
+    return first_id, first_id + size - 1
+
+
+@click.command('seed')
+@click.option('--users', default=0, help='Number of synthetic users to generate.')
+@click.option('--events', default=0, help='Number of synthetic events to generate.')
+@click.option('--posts', default=0, help='Number of synthetic posts to generate.')
+@click.option('--neighborhoods', default=50, help='Number of neighbourhoods users are spread over.')
+@click.option('--skew', default=1.0, help='Zipf exponent of neighbourhood sizes (0 = uniform).')
+@click.option('--conversations', default=0, help='Number of synthetic one-to-one conversations to generate.')
+@click.option('--messages', default=0, help='Number of synthetic messages spread over those conversations.')
+@click.option('--thread', default=0, help='Comments in one synthetic thread on the newest post.')
+@click.option('--batch-size', default=10000, help='Rows per executemany batch and transaction.')
+@click.option('--test-data', is_flag=True, help='Reuse one precomputed password hash for every user.')
+@click.option('--workers', default=None, type=int, help='Processes used to hash passwords.')
+@click.option('--area', default=None, help='"south,west,north,east": give users and events coordinates within it.')
+@click.option('--reset', is_flag=True, help='Drop and recreate all tables first.')
+@with_appcontext
+def seed_command(users, events, posts, conversations, messages, neighborhoods, skew, thread, batch_size,
+                 test_data, workers, area, reset):
+    """Load the sample data set, or bulk-generate synthetic volumes."""
+    if not (users or events or posts or conversations or thread):
+        seed_data()
+        return
+    if reset:
+        db.drop_all()
+        db.create_all()
+    if area:
+        try:
+            area = tuple(float(value) for value in area.split(','))
+        except ValueError:
+            area = ()
+        if len(area) != 4:
+            raise click.UsageError('--area takes four comma-separated numbers: south,west,north,east')
+    seed_volume(users, events, posts, conversations, messages, neighborhoods, skew, batch_size, test_data, workers,
+                log=click.echo, area=area)
+    if thread:
+        post_id = db.session.query(func.max(Post.post_id)).scalar()
+        last_user = db.session.query(func.max(User.user_id)).scalar()
+        if post_id is None or last_user is None:
+            raise click.UsageError('--thread needs at least one post and one user')
+        seed_thread(post_id, thread, 1, last_user, batch_size=batch_size, log=click.echo)
 
-        print("Data seeded successfully.")
 
 # Run the seeding function
 if __name__ == "__main__":
-    seed_data()
+    from app import create_app
+
+    with create_app().app_context():
+        seed_data()
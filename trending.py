@@ -0,0 +1,341 @@
+import bisect
+import heapq
+import json
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select
+from models import db, Activity, Comment, Event, Post, RSVP, TrendingSnapshot, User
+from writer import writer
+
+TrendingItem = namedtuple('TrendingItem', ['kind', 'ref_id', 'score'])
+
+KINDS = ('post', 'event')
+# How much past activity a new deployment (or `flask seed`) logs, so /trending is not empty at first
+BACKFILL_DAYS = 7
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+# (id, author) columns of each kind; a post or event trends in its author's neighbourhood
+_OWNERS = {'post': (Post.post_id, Post.created_by_id), 'event': (Event.event_id, Event.organizer_id)}
+
+
+def _seconds(moment):
+    # Naive UTC datetimes throughout, as stored
+    return (moment - _UNIX_EPOCH).total_seconds()
+
+
+def _logaddexp(a, b):
+    """``log(exp(a) + exp(b))`` without overflowing."""
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def record(action, kind, ref_id, neighborhood, session=None, created_at=None):
+    """Log an interaction with a post or event in the current transaction (of ``session``, if given)."""
+    if not neighborhood:
+        return
+    (session or db.session).add(Activity(neighborhood=neighborhood, kind=kind, ref_id=ref_id, action=action,
+                                         created_at=created_at or datetime.utcnow()))
+
+
+def record_for(action, kind, ref_id, session=None):
+    """``record`` for a post or event by id: its neighbourhood is looked up by the INSERT ... SELECT itself."""
+    key, owner = _OWNERS[kind]
+    source = (
+        select(User.neighborhood, literal(kind), literal(ref_id), literal(action), literal(datetime.utcnow()))
+        .select_from(key.class_).join(User, owner == User.user_id)
+        .where(key == ref_id, User.neighborhood.isnot(None))
+    )
+    (session or db.session).execute(
+        insert(Activity).from_select(['neighborhood', 'kind', 'ref_id', 'action', 'created_at'], source)
+    )
+
+
+def record_many(action, kind, refs, neighborhood, session=None):
+    """``record`` for many posts or events, given as ``(ref_id, created_at)`` pairs, in one multi-row INSERT."""
+    if not refs or not neighborhood:
+        return
+    (session or db.session).execute(insert(Activity), [
+        {'neighborhood': neighborhood, 'kind': kind, 'ref_id': ref_id, 'action': action, 'created_at': created_at}
+        for ref_id, created_at in refs
+    ])
+
+
+def backfill(since, first_post_id=1, first_event_id=1, connection=None):
+    """Log the posts, events, comments and RSVPs created since ``since`` with INSERT ... SELECT statements.
+
+    Only activity on posts and events from the given ids upward is logged,
+    so repeated seeding does not count anything twice.
+    """
+    columns = ['neighborhood', 'kind', 'ref_id', 'action', 'created_at']
+    sources = (
+        select(User.neighborhood, literal('post'), Post.post_id, literal('post'), Post.timestamp)
+        .join(User, Post.created_by_id == User.user_id)
+        .where(Post.post_id >= first_post_id, Post.timestamp >= since),
+        select(User.neighborhood, literal('event'), Event.event_id, literal('event'), Event.created_at)
+        .join(User, Event.organizer_id == User.user_id)
+        .where(Event.event_id >= first_event_id, Event.created_at >= since),
+        select(User.neighborhood, literal('post'), Comment.post_id, literal('comment'), Comment.created_at)
+        .join(Post, Comment.post_id == Post.post_id).join(User, Post.created_by_id == User.user_id)
+        .where(Comment.post_id >= first_post_id, Comment.created_at >= since),
+        select(User.neighborhood, literal('event'), RSVP.event_id, literal('rsvp'), RSVP.created_at)
+        .join(Event, RSVP.event_id == Event.event_id).join(User, Event.organizer_id == User.user_id)
+        .where(RSVP.event_id >= first_event_id, RSVP.created_at >= since),
+    )
+    for source in sources:
+        source = source.where(User.neighborhood.isnot(None)).order_by(source.selected_columns[4])
+        (connection or db.session).execute(insert(Activity).from_select(columns, source))
+
+
+def save_snapshot(session, scores, last_activity_id, fresh_after):
+    """``writer.run`` job: store a snapshot and trim what the one before it made redundant.
+
+    Returns the new snapshot's id, or None if the latest one already covers
+    ``last_activity_id`` or was taken after ``fresh_after`` (by another worker).
+    """
+    latest = session.execute(
+        select(TrendingSnapshot.snapshot_id, TrendingSnapshot.last_activity_id, TrendingSnapshot.taken_at)
+        .order_by(TrendingSnapshot.snapshot_id.desc()).limit(1)
+    ).first()
+    if latest is not None and (latest.last_activity_id >= last_activity_id or latest.taken_at > fresh_after):
+        return None
+
+    snapshot = TrendingSnapshot(last_activity_id=last_activity_id, taken_at=datetime.utcnow(), scores=scores)
+    session.add(snapshot)
+    session.flush()
+    if latest is not None:
+        # The previous snapshot and the log after it stay, for workers still catching up to this one
+        session.execute(delete(TrendingSnapshot).where(TrendingSnapshot.snapshot_id < latest.snapshot_id))
+        session.execute(delete(Activity).where(Activity.activity_id <= latest.last_activity_id))
+    return snapshot.snapshot_id
+
+
+class Leaderboard:
+    """The scores of one neighbourhood's posts or of its events, with the best ``size`` kept in order.
+
+    ``scores`` maps every item still worth remembering to its log-score;
+    ``top`` holds ``(-score, ref_id)`` for the best ``size`` of them, sorted.
+    Scores only grow between rescales, so an item can only enter ``top``
+    when it is itself scored, and keeping ``top`` exact costs a bisect.
+    """
+
+    __slots__ = ('size', 'scores', 'top')
+
+    def __init__(self, size, scores=None):
+        self.size = size
+        self.scores = dict(scores or ())
+        self._rebuild()
+
+    def _rebuild(self):
+        self.top = heapq.nsmallest(self.size, ((-score, ref_id) for ref_id, score in self.scores.items()))
+
+    def add(self, ref_id, log_weight):
+        old = self.scores.get(ref_id)
+        new = log_weight if old is None else _logaddexp(old, log_weight)
+        self.scores[ref_id] = new
+        top = self.top
+        if old is not None and top and (-old, ref_id) <= top[-1]:
+            del top[bisect.bisect_left(top, (-old, ref_id))]
+        elif len(top) >= self.size:
+            if (-new, ref_id) >= top[-1]:
+                return
+            top.pop()
+        bisect.insort(top, (-new, ref_id))
+
+    def remove(self, ref_id):
+        score = self.scores.pop(ref_id, None)
+        if score is not None and self.top and (-score, ref_id) <= self.top[-1]:
+            # Rare (a deleted post or event), so the next best is found by a full pass
+            self._rebuild()
+
+    def rescale(self, shift, floor):
+        """Subtract ``shift`` from every score and forget the items left below ``floor``."""
+        self.scores = {ref_id: score - shift for ref_id, score in self.scores.items() if score - shift >= floor}
+        # Anything dropped from the top had outscored everything else, which was dropped too
+        self.top = [(key + shift, ref_id) for key, ref_id in self.top if ref_id in self.scores]
+
+
+class TrendingEngine:
+    """Ranks each neighbourhood's posts and events by recent, time-decayed activity.
+
+    Every post, event, comment, RSVP and deletion is logged to ``activity``
+    in the transaction that makes it. An interaction of weight ``w`` (per
+    ``TRENDING_WEIGHTS``) made at ``t`` is worth ``w * 2 ** -((now - t) /
+    TRENDING_HALF_LIFE)``. That decays every score alike, so rankings only
+    change when something happens: each item keeps the log of the sum of
+    ``w * 2 ** ((t - epoch) / half_life)``, which one interaction updates
+    with a logaddexp, and each neighbourhood's best ``TRENDING_TOP_K`` posts
+    and events are kept in order, so ``/trending`` only copies a list.
+    Every ``TRENDING_RESCALE_INTERVAL`` seconds the epoch moves to the
+    present, shifting the counters back down, and items whose score has
+    decayed below ``TRENDING_MIN_SCORE`` are forgotten.
+
+    A background thread per process applies the rows logged by any worker
+    (``activity_id`` above the last one seen) every ``TRENDING_REFRESH``
+    seconds. Every ``TRENDING_SNAPSHOT_INTERVAL`` seconds one worker saves
+    the scores to ``trending_snapshots`` and trims the log behind the
+    previous snapshot; a starting worker loads the latest snapshot and
+    replays only the activity logged after it.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._epoch = None
+        self._watermark = 0
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRENDING_HALF_LIFE', 6 * 3600)
+        app.config.setdefault('TRENDING_WEIGHTS', {'post': 1.0, 'event': 1.0, 'comment': 2.0, 'rsvp': 3.0})
+        app.config.setdefault('TRENDING_TOP_K', 100)
+        app.config.setdefault('TRENDING_MIN_SCORE', 0.05)
+        app.config.setdefault('TRENDING_REFRESH', 2)
+        app.config.setdefault('TRENDING_RESCALE_INTERVAL', 3600)
+        app.config.setdefault('TRENDING_SNAPSHOT_INTERVAL', 300)
+
+        self.decay = math.log(2) / float(app.config['TRENDING_HALF_LIFE'])
+        self.log_weights = {action: math.log(weight)
+                            for action, weight in app.config['TRENDING_WEIGHTS'].items() if weight > 0}
+        self.size = int(app.config['TRENDING_TOP_K'])
+        self.floor = math.log(float(app.config['TRENDING_MIN_SCORE']))
+        self.refresh_interval = float(app.config['TRENDING_REFRESH'])
+        self.rescale_interval = float(app.config['TRENDING_RESCALE_INTERVAL'])
+        self.snapshot_interval = float(app.config['TRENDING_SNAPSHOT_INTERVAL'])
+        with self._lock:
+            # A thread left over from an earlier init_app notices the new app and exits
+            self.app = app
+            self._boards = {}
+            self._epoch = None
+            self._watermark = 0
+            self._ready = threading.Event()
+            self._thread = None
+        app.extensions['trending'] = self
+
+    def _start(self):
+        # Started lazily so every forked server worker gets its own
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._maintain, args=(self.app,), name='trending-refresh',
+                                                daemon=True)
+                self._thread.start()
+
+    def _maintain(self, app):
+        rescaled_at = snapshotted_at = time.monotonic()
+        while self.app is app:
+            try:
+                with app.app_context():
+                    if self._epoch is None:
+                        self.load()
+                    else:
+                        self.refresh()
+                    if time.monotonic() - rescaled_at >= self.rescale_interval:
+                        self.rescale()
+                        rescaled_at = time.monotonic()
+                    if time.monotonic() - snapshotted_at >= self.snapshot_interval:
+                        self.snapshot()
+                        snapshotted_at = time.monotonic()
+            except Exception:
+                app.logger.exception('Refreshing trending scores failed')
+            time.sleep(self.refresh_interval)
+
+    def load(self):
+        """Start over from the latest snapshot, if any, and replay the activity logged after it."""
+        snapshot = db.session.scalar(select(TrendingSnapshot).order_by(TrendingSnapshot.snapshot_id.desc()).limit(1))
+        boards, epoch, watermark = {}, _seconds(datetime.utcnow()), 0
+        if snapshot is not None:
+            state = json.loads(snapshot.scores)
+            epoch, watermark = state['epoch'], snapshot.last_activity_id
+            boards = {(neighborhood, kind): Leaderboard(self.size, scores)
+                      for neighborhood, kind, scores in state['boards']}
+        with self._lock:
+            self._boards, self._epoch, self._watermark = boards, epoch, watermark
+        self.refresh()
+        if _seconds(datetime.utcnow()) - epoch >= self.rescale_interval:
+            self.rescale()
+        self._ready.set()
+
+    def refresh(self):
+        """Apply the activity logged since the last refresh, by this or any other worker; returns how many rows."""
+        rows = db.session.execute(
+            select(Activity.activity_id, Activity.neighborhood, Activity.kind, Activity.ref_id, Activity.action,
+                   Activity.created_at)
+            .where(Activity.activity_id > self._watermark)
+            .order_by(Activity.activity_id)
+            .execution_options(yield_per=10000)
+        )
+        return sum(self.apply(chunk) for chunk in rows.partitions())
+
+    def apply(self, rows):
+        """Fold ``(activity_id, neighborhood, kind, ref_id, action, created_at)`` rows into the scores."""
+        applied = 0
+        with self._lock:
+            boards, epoch, log_weights = self._boards, self._epoch, self.log_weights
+            for activity_id, neighborhood, kind, ref_id, action, created_at in rows:
+                board = boards.get((neighborhood, kind))
+                if action == 'delete':
+                    if board is not None:
+                        board.remove(ref_id)
+                elif action in log_weights:
+                    if board is None:
+                        board = boards[(neighborhood, kind)] = Leaderboard(self.size)
+                    board.add(ref_id, log_weights[action] + self.decay * (_seconds(created_at) - epoch))
+                if activity_id > self._watermark:
+                    self._watermark = activity_id
+                applied += 1
+        return applied
+
+    def rescale(self, now=None):
+        """Move the epoch to ``now`` and forget items that have decayed below ``TRENDING_MIN_SCORE``."""
+        now = _seconds(now or datetime.utcnow())
+        with self._lock:
+            shift = self.decay * (now - self._epoch)
+            for key, board in list(self._boards.items()):
+                board.rescale(shift, self.floor)
+                if not board.scores:
+                    del self._boards[key]
+            self._epoch = now
+
+    def snapshot(self):
+        """Save the scores unless another worker just did; returns the new snapshot's id or None."""
+        with self._lock:
+            boards = [[neighborhood, kind, list(board.scores.items())]
+                      for (neighborhood, kind), board in self._boards.items()]
+            epoch, watermark = self._epoch, self._watermark
+        fresh_after = datetime.utcnow() - timedelta(seconds=self.snapshot_interval / 2)
+        return writer.run(save_snapshot, json.dumps({'epoch': epoch, 'boards': boards}), watermark, fresh_after)
+
+    def top(self, neighborhood, kind, limit):
+        """The ``limit`` (at most ``TRENDING_TOP_K``) hottest posts or events of a neighbourhood, as TrendingItems."""
+        self._start()
+        if self._epoch is None:
+            # Only until this process has loaded its scores
+            self._ready.wait(self.refresh_interval)
+        with self._lock:
+            board = self._boards.get((neighborhood, kind))
+            entries = board.top[:limit] if board is not None else []
+            epoch = self._epoch
+        if not entries:
+            return []
+        # Reported as what the activity is worth now
+        age = self.decay * (_seconds(datetime.utcnow()) - epoch)
+        return [TrendingItem(kind, ref_id, math.exp(-key - age)) for key, ref_id in entries]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'boards': len(self._boards),
+                'items': sum(len(board.scores) for board in self._boards.values()),
+                'last_activity_id': self._watermark,
+            }
+
+
+rankings = TrendingEngine()
@@ -0,0 +1,162 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from sqlalchemy.engine import make_url
+
+
+class WriterBusy(Exception):
+    """Raised when the write queue is full; answered with a 429."""
+
+
+class WriteQueue:
+    """Funnels write transactions through one writer thread per process.
+
+    SQLite lets one connection write at a time. Instead of request threads
+    racing for that lock and sleeping in the busy handler, ``run`` queues
+    the write and blocks until the writer thread has committed it. The
+    writer takes the lock up front with ``BEGIN IMMEDIATE``, runs everything
+    queued at that moment (up to ``WRITE_QUEUE_BATCH`` jobs) in one
+    transaction with a SAVEPOINT per job, and commits once, so a burst of
+    writes shares a single commit and a failing job only undoes its own
+    changes. At most ``WRITE_QUEUE_MAX_PENDING`` jobs may wait; beyond that
+    ``WriterBusy`` is raised so the route can answer 429.
+
+    Every Flask route that writes goes through ``run``; the native async
+    routes (which commit on the asyncio engine) and CLI commands do not.
+
+    ``WRITE_QUEUE_ENABLED`` defaults to on for SQLite database files and
+    off otherwise. When off, ``run`` executes the job on the caller's
+    session and commits it there, so routes look the same either way.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_QUEUE_ENABLED', None)
+        app.config.setdefault('WRITE_QUEUE_MAX_PENDING', 256)
+        app.config.setdefault('WRITE_QUEUE_BATCH', 64)
+        app.config.setdefault('WRITE_QUEUE_TIMEOUT', 10)
+
+        enabled = app.config['WRITE_QUEUE_ENABLED']
+        if enabled is None:
+            url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+            enabled = url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+        self.app = app
+        self.enabled = bool(enabled)
+        self.batch_size = max(1, int(app.config['WRITE_QUEUE_BATCH']))
+        self.timeout = float(app.config['WRITE_QUEUE_TIMEOUT'])
+        with self._lock:
+            # A writer left over from an earlier init_app keeps draining its own (old) queue
+            self._queue = queue.Queue(max(1, int(app.config['WRITE_QUEUE_MAX_PENDING'])))
+            self._thread = None
+        app.extensions['write_queue'] = self
+
+    def _start(self):
+        # Started lazily so every forked server worker gets its own writer
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, args=(self._queue,), name='write-queue',
+                                                daemon=True)
+                self._thread.start()
+
+    def run(self, fn, *args):
+        """Run ``fn(session, *args)`` in a committed write transaction and return its result.
+
+        ``fn`` must not commit, and should return plain values (ids, not
+        ORM objects): on the writer thread its session is closed before the
+        caller sees the result. Exceptions raised by ``fn`` or by the commit
+        propagate to the caller.
+        """
+        from models import db
+
+        if not self.enabled:
+            try:
+                result = fn(db.session, *args)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args))
+        except queue.Full:
+            raise WriterBusy()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Only give up on a job that has not started; a running one is waited for so its outcome is known
+            if future.cancel():
+                raise WriterBusy()
+            return future.result()
+
+    def _work(self, jobs_queue):
+        while True:
+            jobs = [jobs_queue.get()]
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(jobs_queue.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [job for job in jobs if job[0].set_running_or_notify_cancel()]
+            if jobs:
+                self._commit_batch(jobs)
+
+    def _commit_batch(self, jobs):
+        from models import db
+
+        with self.app.app_context():
+            session = db.session
+            results = []
+            try:
+                if session.get_bind().dialect.name == 'sqlite':
+                    # Take the write lock now, so a job's reads and writes see one snapshot and never need an upgrade
+                    session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                for future, fn, args in jobs:
+                    # session.info carries after-commit work (live updates, cache invalidations); a failed job drops its own
+                    pending = {key: list(value) if isinstance(value, list) else value
+                               for key, value in session.info.items()}
+                    try:
+                        if len(jobs) == 1:
+                            # Nothing to protect from a failure: the whole transaction is this job
+                            result = fn(session, *args)
+                        else:
+                            with session.begin_nested():
+                                result = fn(session, *args)
+                    except Exception as e:
+                        if len(jobs) == 1:
+                            session.rollback()
+                        session.info.clear()
+                        session.info.update(pending)
+                        results.append((future, None, e))
+                    else:
+                        results.append((future, result, None))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                self.app.logger.exception('Write batch of %d jobs failed', len(jobs))
+                for future, _, _ in jobs:
+                    future.set_exception(e)
+                return
+            finally:
+                db.session.remove()
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+writer = WriteQueue()